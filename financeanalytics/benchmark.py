@@ -0,0 +1,79 @@
+import argparse
+import datetime
+import logging
+import tempfile
+import time
+
+from pathlib import Path
+from financeanalytics import FinanceAnalytics
+from syntheticstatements import SyntheticStatementGenerator
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark statement extraction on a synthetic RBC statement corpus")
+
+    # Corpus shape
+    parser.add_argument("-n", "--statements", required=False, type=int, default=24)
+    parser.add_argument("-t", "--transactions", required=False, type=int, default=30)
+    parser.add_argument("-p", "--pages", required=False, type=int, default=2, help="Transaction table pages per statement")
+    parser.add_argument("--legal-pages", required=False, type=int, default=1, help="Boilerplate pages per Visa statement")
+    parser.add_argument("--accounts", required=False, nargs="+", default=["Chequing", "Visa"],
+                        help="Accounts below the Bank folder, levels separated by '/', e.g. Personal/Chequing Joint/Visa")
+    parser.add_argument("--first-statement-end", required=False, type=datetime.date.fromisoformat, default=datetime.date(2019, 1, 11))
+    parser.add_argument("--seed", required=False, type=int, default=0)
+
+    # Corpus and output location, defaults to a temporary folder removed after the run
+    parser.add_argument("-d", "--corpus-directory", required=False, type=str)
+
+    # Run settings passed through to FinanceAnalytics.run()
+    parser.add_argument("-x", "--output_extension", required=False, default="csv", choices=["csv", "xlsx", "parquet"])
+    parser.add_argument("-w", "--workers", required=False, type=int, default=1)
+    parser.add_argument("--page-workers", required=False, type=int, default=1)
+    parser.add_argument("-r", "--repeat", required=False, type=int, default=1)
+    parser.add_argument("--stream", action="store_true")
+
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.page_workers < 1:
+        parser.error("--page-workers must be at least 1")
+
+    if args.stream and args.output_extension == "parquet":
+        parser.error("--stream is only supported with csv or xlsx output")
+
+    # Keep the report readable, the extraction logs every statement
+    logging.disable(logging.INFO)
+
+    temporary_directory = None
+    corpus_directory = args.corpus_directory
+    if corpus_directory is None:
+        temporary_directory = tempfile.TemporaryDirectory()
+        corpus_directory = temporary_directory.name
+
+    input_directory = corpus_directory + "/statements"
+    output_directory = corpus_directory + "/output"
+    Path(output_directory).mkdir(parents=True, exist_ok=True)
+
+    accounts = tuple(tuple(account.split("/")) for account in args.accounts)
+
+    start_time = time.perf_counter()
+    corpus = SyntheticStatementGenerator(seed=args.seed).build_statement_tree(
+        input_directory, statements=args.statements, accounts=accounts, first_statement_end=args.first_statement_end,
+        transactions=args.transactions, pages=args.pages, legal_pages=args.legal_pages)
+    print("Generated {} statements ({} pages) in {:.2f}s".format(corpus["statements"], corpus["pages"], time.perf_counter() - start_time))
+
+    # The cache is disabled so every repeat measures a full extraction
+    for repeat in range(args.repeat):
+        start_time = time.perf_counter()
+        FinanceAnalytics().run(input_dir=input_directory, output_dir=output_directory, output_fname="benchmark",
+                               output_format=args.output_extension, workers=args.workers, cache_dir=None,
+                               streaming=args.stream, page_workers=args.page_workers)
+        elapsed = time.perf_counter() - start_time
+
+        print("Run {}: {:.2f}s, {:.2f} statements/sec, {:.2f} pages/sec".format(
+            repeat + 1, elapsed, corpus["statements"] / elapsed, corpus["pages"] / elapsed))
+
+    if temporary_directory is not None:
+        temporary_directory.cleanup()
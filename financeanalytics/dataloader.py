@@ -1,8 +1,13 @@
+import json
 import logging
+import os
 import re
+import sqlite3
+import time
 
 import pandas as pd
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # TODO: Add graphical interface for root folder selection
@@ -12,7 +17,7 @@ class DataLoader:
     A class used to detect and do basic cleaning of the file and folder hierarchy the user points to.
     """
 
-    def load_data(self, root_folder):
+    def load_data(self, root_folder, scan_workers=1, catalog_path=None):
         """Detects and populates all relevant data for further analysis.
 
         Detects the entire file and folder hierarchy, and performs basic cleaning operations:
@@ -20,20 +25,40 @@ class DataLoader:
         - Remove empty file folders
         - Remove non-supported file formats (currently all formats except pdfs)
 
+        All three are applied while walking the tree, so folders of unsupported Banks are never listed. With a statement
+        catalog only the folders that changed since the previous scan are listed again.
+
         Data gets converted into a pandas dataframe format for more advanced Data Quality checking, which requires
         handling of folder hierarchy case sensitivity in this function
 
         :param root_folder:  root location where hierarchy and statement files begin
         :type root_folder: string
+        :param scan_workers: Number of threads walking the subtrees below the Bank folders in parallel
+        :param catalog_path: Location of the statement catalog (SQLite) remembering the folders between runs
         :return: DataFrame
         """
-        raw_list = self._detect_relevant_files(root_folder)
-        if not raw_list:
-            raise ValueError("No statements detected")
-        supported_bank_files = self._remove_unsupported_banks(raw_list)
-        if not supported_bank_files:
-            raise ValueError("No statements from supported banks detected\nIs there a folder for the Bank?")
-        cleaned_file_list = self._remove_files_missing_dates(supported_bank_files)
+        statement_catalog = None
+        if catalog_path is not None:
+            statement_catalog = StatementCatalog(catalog_path)
+            self.catalog_directories = statement_catalog.load(root_folder, self.supported_banks)
+            self.scanned_directories = {}
+            self.scan_start_ns = time.time_ns()
+
+        try:
+            bank_directories = self._detect_bank_directories(root_folder)
+            if not bank_directories:
+                raise ValueError("No statements from supported banks detected\nIs there a folder for the Bank?")
+            cleaned_file_list = self._scan_statement_files(root_folder, bank_directories, scan_workers)
+            if not cleaned_file_list:
+                raise ValueError("No statements detected")
+
+            if statement_catalog is not None:
+                statement_catalog.save(root_folder, self.supported_banks, self.scanned_directories)
+        finally:
+            if statement_catalog is not None:
+                statement_catalog.close()
+                self.catalog_directories = None
+
         structured_data = self._structure_cleaned_file_listing(cleaned_file_list, root_folder)
         return structured_data
 
@@ -46,7 +71,8 @@ class DataLoader:
         """
 
         # Convert directly to a DataFrame and drop the root folder (start) and filename (end)
-        df = pd.DataFrame([x.parts[len(Path(root_folder).parts):-1] for x in file_list])
+        root_parts = len(Path(root_folder).parts)
+        df = pd.DataFrame([x.parts[root_parts:-1] for x in file_list])
 
         # Set up proper column names starting with Bank and Hierarchy Levels
         number_of_hierarchy_levels = len(df.columns) - 1
@@ -67,55 +93,251 @@ class DataLoader:
 
         return df
 
-    def _remove_files_missing_dates(self, list_of_files):
-        """Removes files which do not contain a datestamp for structured handling
+    def _detect_bank_directories(self, root_folder):
+        """Lists the supported Bank folders directly below the root folder (case insensitive)
 
-        :param list_of_files: list of all files detected in locatoin specified by user
-        :return: list of Path files for only files which contain date stamps
+        :param root_folder: root location where hierarchy and statement files begin
+        :return: list of Path objects to the Bank folders
         """
+        supported_banks = {bank.lower() for bank in self.supported_banks}
 
-        datestamp_pattern = re.compile("[0-9]{4}-(0[1-9]|1[0-2])-(0[1-9]|[1-2][0-9]|3[0-1])")
+        return [Path(root_folder, entry.name) for entry in self._list_directory(root_folder)
+                if entry.name.lower() in supported_banks and self._is_directory(entry)]
 
-        return [x for x in list_of_files if re.search(datestamp_pattern, str(x))]
+    def _scan_statement_files(self, root_folder, bank_directories, scan_workers=1):
+        """Walks the Bank folders with os.scandir, keeping only pdf files with a datestamp in their path
 
-    def _remove_unsupported_banks(self, list_of_all_filepaths):
-        """Removes any PDF folders and files which are not supported downstream (based on Banks supported)
+        Produces the same files in the same order as globbing the Bank folders for '**/*.pdf' and filtering for
+        datestamps: the files of a folder come before its sub folders, folders are walked in directory listing order and
+        symlinked folders are not followed. With more than one scan worker the sub folders of each Bank folder are
+        walked in parallel threads, which mostly helps on network drives where listing a folder is slow.
 
-        :param raw_list: list of all files and folders detected in location specified by user
-        :return: list of Path files for only supported banks
+        :param root_folder: root location where hierarchy and statement files begin
+        :param bank_directories: list of the Bank folders to walk
+        :param scan_workers: Number of threads walking the sub folders in parallel
+        :return: list of Path objects to statement file locations
         """
-
-        list_of_all_supported_banks = self.supported_banks
-
-        # Converts all filepath folders into pieces for comparison against the supported bank whitelist
-        # All filepaths are converted to lowercase to make the Bank folder case insensitive
-
-        filtered_files = [file for file in list_of_all_filepaths if any(
-            whitelisted_bank in [path_folder.lower() for path_folder in list(file.parts)] for whitelisted_bank in
-            list_of_all_supported_banks)]
+        # A datestamp anywhere in the path counts, so folder names are only matched once for all the files below them
+        root_dated = self.datestamp_pattern.search(str(Path(root_folder))) is not None
+
+        executor = ThreadPoolExecutor(max_workers=scan_workers) if scan_workers > 1 else None
+        found_files = []
+        try:
+            for bank_directory in bank_directories:
+                bank_dated = root_dated or self.datestamp_pattern.search(bank_directory.name) is not None
+                bank_files, subtrees = self._scan_directory_level(bank_directory, bank_dated)
+                found_files.extend(bank_files)
+
+                if executor is None:
+                    subtree_results = (self._scan_directory(*subtree) for subtree in subtrees)
+                else:
+                    subtree_results = executor.map(lambda subtree: self._scan_directory(*subtree), subtrees)
+
+                for subtree_files in subtree_results:
+                    found_files.extend(subtree_files)
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
         # Output as info for user if needed
         logging.info("Files Detected:")
-        [logging.info(x) for x in filtered_files]
+        [logging.info(x) for x in found_files]
 
-        return filtered_files
+        return found_files
 
-    def _detect_relevant_files(self, root_folder):
-        """Identifies all relevant files for analysis.
+    def _scan_directory(self, directory, dated):
+        """Recursively lists the statement files in a folder and all its sub folders, see _scan_statement_files"""
+        found_files, subdirectories = self._scan_directory_level(directory, dated)
+        for subdirectory, subdirectory_dated in subdirectories:
+            found_files.extend(self._scan_directory(subdirectory, subdirectory_dated))
+        return found_files
 
-        Detects and lists all pdf files which will potentially be used in downstream files
+    def _scan_directory_level(self, directory, dated):
+        """Lists one folder
 
-        :param root_folder: root location where hierarchy and statement files begin
-        :type root_folder: string
-        :return: list of Path objects to file locations
+        :param directory: Path of the folder
+        :param dated: Whether the path of the folder already contains a datestamp
+        :return: Tuple of (list of statement file Paths, list of (sub folder Path, sub folder dated) tuples)
         """
-        found_files = [x for x in Path(root_folder).glob('**/*.pdf')]
+        pdf_names, subdirectory_names = self._read_directory_level(directory)
 
-        # Output as info for user if needed
-        logging.info("Files Detected:")
-        [logging.info(x) for x in found_files]
+        found_files = [directory / name for name in pdf_names if dated or self.datestamp_pattern.search(name)]
+        subdirectories = [(directory / name, dated or self.datestamp_pattern.search(name) is not None) for name in subdirectory_names]
 
-        return found_files
+        # Statements of re-listed folders are written to the catalog
+        catalogued_directory = self.scanned_directories.get(str(directory))
+        if catalogued_directory is not None and catalogued_directory["changed"]:
+            catalogued_directory["statements"] = list(found_files)
+
+        return found_files, subdirectories
+
+    def _read_directory_level(self, directory):
+        """Names of the pdf files and sub folders of one folder
+
+        With a statement catalog the folder is only listed if its modification time changed since the previous scan,
+        otherwise the names are taken from the catalog.
+
+        :param directory: Path of the folder
+        :return: Tuple of (list of pdf file names, list of sub folder names)
+        """
+        if self.catalog_directories is None:
+            pdf_names = []
+            subdirectory_names = []
+            for entry in self._list_directory(directory):
+                if self._is_directory(entry):
+                    subdirectory_names.append(entry.name)
+                elif self._is_pdf_name(entry.name):
+                    pdf_names.append(entry.name)
+            return pdf_names, subdirectory_names
+
+        try:
+            directory_mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return [], []
+
+        catalogued_directory = self.catalog_directories.get(str(directory))
+        if catalogued_directory is None or catalogued_directory["mtime_ns"] != directory_mtime:
+            pdf_files = []
+            subdirectory_names = []
+            for entry in self._list_directory(directory):
+                if self._is_directory(entry):
+                    subdirectory_names.append(entry.name)
+                elif self._is_pdf_name(entry.name):
+                    try:
+                        file_stat = entry.stat()
+                    except OSError:
+                        continue
+                    pdf_files.append([entry.name, file_stat.st_size, file_stat.st_mtime_ns])
+
+            # A folder modified just before the scan could be modified again without its modification time changing
+            # (coarse timestamps on network drives), so it is listed again on the next scan
+            if directory_mtime > self.scan_start_ns - self.catalog_racy_window_ns:
+                directory_mtime = None
+
+            catalogued_directory = {"mtime_ns": directory_mtime, "pdf_files": pdf_files,
+                                    "subdirectories": subdirectory_names, "changed": True}
+
+        self.scanned_directories[str(directory)] = catalogued_directory
+
+        return [pdf_file[0] for pdf_file in catalogued_directory["pdf_files"]], catalogued_directory["subdirectories"]
+
+    def _is_pdf_name(self, name):
+        """Whether a file name has the pdf extension, case insensitive only where the file system is"""
+        return os.path.normcase(name).endswith(".pdf")
+
+    def _list_directory(self, directory):
+        """Lists the entries of a folder, folders that cannot be read are treated as empty like glob does"""
+        try:
+            with os.scandir(directory) as entries:
+                return list(entries)
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            return []
+
+    def _is_directory(self, entry):
+        """Whether a directory entry is a folder, without following symlinks"""
+        try:
+            return entry.is_dir(follow_symlinks=False)
+        except OSError:
+            return False
 
     def __init__(self, supported_banks=["rbc"]):
         self.supported_banks = supported_banks
+        self.datestamp_pattern = re.compile("[0-9]{4}-(0[1-9]|1[0-2])-(0[1-9]|[1-2][0-9]|3[0-1])")
+
+        # Folders from the statement catalog, and the folders seen by the current scan, while scanning with a catalog
+        self.catalog_directories = None
+        self.scanned_directories = {}
+        self.scan_start_ns = None
+
+        # Folders modified this close to the start of a scan are listed again on the next scan
+        self.catalog_racy_window_ns = 2 * 1000 * 1000 * 1000
+
+class StatementCatalog:
+    """
+    A class used to remember the statement folders of a tree between runs in an SQLite database, so a rescan only lists
+    the folders whose modification time changed since the previous scan.
+
+    Every folder is stored with its modification time and the pdf files and sub folders it contains. Every discovered
+    statement is stored with its size, modification time, hierarchy and datestamp.
+    """
+
+    def load(self, root_folder, supported_banks):
+        """Reads the catalogued folders, discarding the catalog if it was built for another root folder or Bank list
+
+        :param root_folder: root location where hierarchy and statement files begin
+        :param supported_banks: list of the supported Banks
+        :return: Dictionary of folder path to dictionary of its modification time, pdf files and sub folders
+        """
+        catalog_settings = dict(self.connection.execute("SELECT key, value FROM catalog_settings"))
+        if catalog_settings != self._catalog_settings(root_folder, supported_banks):
+            with self.connection:
+                self.connection.execute("DELETE FROM directories")
+                self.connection.execute("DELETE FROM statements")
+
+        catalogued_directories = {}
+        for path, mtime_ns, pdf_files, subdirectories in self.connection.execute(
+                "SELECT path, mtime_ns, pdf_files, subdirectories FROM directories"):
+            catalogued_directories[path] = {"mtime_ns": mtime_ns, "pdf_files": json.loads(pdf_files),
+                                            "subdirectories": json.loads(subdirectories), "changed": False}
+
+        self.catalogued_paths = set(catalogued_directories)
+        return catalogued_directories
+
+    def save(self, root_folder, supported_banks, scanned_directories):
+        """Writes the folders of the latest scan, replacing the ones that were listed again and removing the ones gone
+
+        :param root_folder: root location where hierarchy and statement files begin
+        :param supported_banks: list of the supported Banks
+        :param scanned_directories: Dictionary of folder path to folder, as read and listed by the DataLoader
+        :return:
+        """
+        root_parts = len(Path(root_folder).parts)
+        removed_paths = [(path,) for path in self.catalogued_paths - set(scanned_directories)]
+        changed_directories = {path: directory for path, directory in scanned_directories.items() if directory["changed"]}
+
+        statement_rows = []
+        for path, directory in changed_directories.items():
+            pdf_file_stats = {name: (size, mtime_ns) for name, size, mtime_ns in directory["pdf_files"]}
+            for statement in directory.get("statements", []):
+                size, mtime_ns = pdf_file_stats[statement.name]
+                statement_rows.append((str(statement), path, size, mtime_ns, json.dumps(statement.parts[root_parts:-1]),
+                                       re.search(self.datestamp_pattern, str(statement)).group(0)))
+
+        with self.connection:
+            self.connection.execute("DELETE FROM catalog_settings")
+            self.connection.executemany("INSERT INTO catalog_settings VALUES (?, ?)",
+                                        self._catalog_settings(root_folder, supported_banks).items())
+
+            self.connection.executemany("DELETE FROM directories WHERE path = ?", removed_paths)
+            self.connection.executemany("DELETE FROM statements WHERE directory = ?", removed_paths)
+
+            self.connection.executemany("INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?)",
+                                        [(path, directory["mtime_ns"], json.dumps(directory["pdf_files"]),
+                                          json.dumps(directory["subdirectories"])) for path, directory in changed_directories.items()])
+            self.connection.executemany("DELETE FROM statements WHERE directory = ?", [(path,) for path in changed_directories])
+            self.connection.executemany("INSERT OR REPLACE INTO statements VALUES (?, ?, ?, ?, ?, ?)", statement_rows)
+
+        self.catalogued_paths = set(scanned_directories)
+
+    def close(self):
+        self.connection.close()
+
+    def _catalog_settings(self, root_folder, supported_banks):
+        """Settings the catalog is only valid for"""
+        return {"catalog_version": str(self.catalog_version), "root_folder": os.path.abspath(root_folder),
+                "supported_banks": json.dumps(sorted(bank.lower() for bank in supported_banks))}
+
+    def __init__(self, catalog_path):
+        self.catalog_version = 1
+        self.catalog_path = Path(catalog_path)
+        self.datestamp_pattern = re.compile("[0-9]{4}-(0[1-9]|1[0-2])-(0[1-9]|[1-2][0-9]|3[0-1])")
+        self.catalogued_paths = set()
+
+        self.connection = sqlite3.connect(str(self.catalog_path))
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS catalog_settings (key TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS directories "
+                                    "(path TEXT PRIMARY KEY, mtime_ns INTEGER, pdf_files TEXT, subdirectories TEXT)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS statements "
+                                    "(filepath TEXT PRIMARY KEY, directory TEXT, size INTEGER, mtime_ns INTEGER, hierarchy TEXT, datestamp TEXT)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS statements_directory ON statements (directory)")
@@ -1,6 +1,7 @@
 import logging
 import re
 
+import numpy as np
 import pandas as pd
 
 class DataQuality:
@@ -24,6 +25,38 @@ class DataQuality:
 
         return data_gaps
 
+    def analyze_balance_continuity(self, statement_metadata):
+        """Checks that every statement opens with the balance the previous statement of its hierarchy closed with
+
+        A break means a statement in between is missing or one of the balances was not read correctly, which is found
+        from the first page of every statement without extracting any transactions. A statement whose opening balance or
+        previous closing balance could not be read is of unknown continuity, reported with a missing Difference rather
+        than passed as continuous.
+
+        :param statement_metadata:DataFrame of hierarchy, Filepath, Year, Opening Balance and Closing Balance for every statement
+        :return:DataFrame of the balance breaks and statements of unknown continuity (missing Difference) with the
+            hierarchy, Filepath, Previous Closing Balance, Opening Balance and Difference
+        """
+
+        hierarchy_columns = list(statement_metadata.columns[:list(statement_metadata.columns).index("Filepath")])
+
+        ordered_metadata = self._extract_month_year_stamps(statement_metadata.copy())
+        ordered_metadata = ordered_metadata.sort_values(hierarchy_columns + ["MonthStamp"], kind="stable")
+
+        ordered_metadata["Previous Closing Balance"] = ordered_metadata.groupby(hierarchy_columns)["Closing Balance"].shift()
+        ordered_metadata["Difference"] = (ordered_metadata["Opening Balance"] - ordered_metadata["Previous Closing Balance"]).round(2)
+
+        # The first statement of a hierarchy has no previous statement to continue from
+        has_previous_statement = ordered_metadata.groupby(hierarchy_columns).cumcount() > 0
+        unknown_continuity = has_previous_statement & ordered_metadata["Difference"].isna()
+
+        balance_breaks = ordered_metadata[(ordered_metadata["Difference"].fillna(0) != 0) | unknown_continuity]
+        balance_breaks = balance_breaks[hierarchy_columns + ["Filepath", "Previous Closing Balance", "Opening Balance", "Difference"]].reset_index(drop=True)
+
+        self._print_balance_diagnostics(balance_breaks, ordered_metadata.shape[0])
+
+        return balance_breaks
+
     def _compress_structured_data(self, structured_file_listing):
         """Gets the start date and end date for each hierarchy in the detected structure
 
@@ -70,15 +103,45 @@ class DataQuality:
     def _identify_data_gaps(self, compressed_data):
         """Identifies the data gaps from windowed data
 
+        Every month between the start and end date of all hierarchies is laid out in one array of month numbers
+        (year * 12 + month), the months found are removed and what is left is split back into one list per hierarchy
+
         :param compressed_data:Aggregated DataFrame with hierarchies, start date (month beginning), end date (month beginning), and collection of all dates (month beginning)
         :return: DataFrame listing all the missing gaps of information needed for every hierarchy detected
         """
 
-        compressed_data["all_gaps"] = compressed_data.apply(
-            lambda x: self.__find_missing_dates(x.min_date, x.max_date, x.all_dates), axis=1)
+        first_months = self._month_numbers(compressed_data["min_date"])
+        month_counts = np.maximum(self._month_numbers(compressed_data["max_date"]) - first_months + 1, 0)
+
+        # Each hierarchy's months counted up from its first month
+        window_rows = np.repeat(np.arange(len(compressed_data)), month_counts)
+        window_offsets = np.arange(month_counts.sum()) - np.repeat(np.cumsum(month_counts) - month_counts, month_counts)
+        window_months = first_months[window_rows] + window_offsets
+
+        found_dates = compressed_data["all_dates"].reset_index(drop=True).explode().dropna()
+        found_keys = found_dates.index.to_numpy() * self.month_key_stride + self._month_numbers(found_dates)
+        missing = ~np.isin(window_rows * self.month_key_stride + window_months, found_keys)
+
+        missing_rows = window_rows[missing]
+        missing_dates = self._month_beginnings(window_months[missing])
+
+        # Rows are in order, so the gaps of each hierarchy are contiguous and ascending
+        gap_counts = np.bincount(missing_rows, minlength=len(compressed_data))
+        compressed_data["all_gaps"] = [gaps.tolist() for gaps in np.split(missing_dates, np.cumsum(gap_counts)[:-1])]
 
         return compressed_data
 
+    def _month_numbers(self, month_stamps):
+        """Converts YYYY-MM-DD datestamps to month numbers (year * 12 + month - 1)"""
+        month_stamps = pd.Series(month_stamps, dtype=object).astype(str)
+        return (month_stamps.str[:4].astype(np.int64) * 12 + month_stamps.str[5:7].astype(np.int64) - 1).to_numpy()
+
+    def _month_beginnings(self, month_numbers):
+        """Converts month numbers back to YYYY-MM-01 datestamps"""
+        years = pd.Series(month_numbers // 12, dtype=np.int64).astype(str).str.zfill(4)
+        months = pd.Series(month_numbers % 12 + 1, dtype=np.int64).astype(str).str.zfill(2)
+        return (years + "-" + months + "-01").to_numpy(dtype=object)
+
     def _remove_duplicate_references(self, structured_data_with_monthstamp):
         """Removes duplicate monthstamps from a hierarchy if folder type insensitivity causes case to exist
 
@@ -91,11 +154,6 @@ class DataQuality:
 
         return structured_data_with_monthstamp.drop_duplicates(subset=column_names, keep='first').reset_index(drop=True)
 
-    def __find_missing_dates(self, start_date, end_date, all_dates):
-        missing_daily_dates = list(pd.date_range(start_date, end_date).difference(pd.to_datetime(all_dates)).strftime('%Y-%m-%d'))
-        missing_monthly_dates = [x for x in missing_daily_dates if x[-2:] == "01"]
-        return missing_monthly_dates
-
     def _print_diagnostics(self, data_gaps):
         """Prints to console the basic data quality analysis for user determination to continue or not
 
@@ -106,6 +164,30 @@ class DataQuality:
         data_gaps.apply(lambda x: self.__data_quality_record_diagnostics(x), axis=1)
 
         return 0
+
+    def _print_balance_diagnostics(self, balance_breaks, statement_count):
+        """Prints to console the statements whose opening balance does not continue from the previous statement, and
+        those whose continuity is unknown as a balance could not be read
+
+        :param balance_breaks: DataFrame of the balance breaks from analyze_balance_continuity
+        :param statement_count: Number of statements checked
+        :return:
+        """
+
+        unknown_continuity = balance_breaks["Difference"].isna()
+
+        print("\n")
+        print("Balance continuity: {} break(s) and {} statement(s) of unknown continuity across {} statement(s)".format(
+            (~unknown_continuity).sum(), unknown_continuity.sum(), statement_count))
+        for balance_break in balance_breaks[~unknown_continuity].itertuples(index=False):
+            print("Statement: {} opens at {} after previous closing balance of {} (difference {})".format(
+                balance_break.Filepath, balance_break[-2], balance_break[-3], balance_break[-1]))
+        for balance_break in balance_breaks[unknown_continuity].itertuples(index=False):
+            print("Statement: {} of unknown continuity, opens at {} after previous closing balance of {}".format(
+                balance_break.Filepath, balance_break[-2], balance_break[-3]))
+
+        return 0
+
     def __data_quality_record_diagnostics(self, x):
         print("\n")
         print("Hierarchy: {}".format(list(x.index[:-4])))
@@ -113,4 +195,8 @@ class DataQuality:
         print("Last Month-Year of Data: {}".format(x["max_date"]))
         print("Detected Month(s)-Year(s) of Data: {}".format(x["all_dates"]))
         print("Missing Month(s)-Year(s) of Data: {}".format(x["all_gaps"]))
-        return 0
\ No newline at end of file
+        return 0
+
+    def __init__(self):
+        # Larger than any month number, keys hierarchy row and month together
+        self.month_key_stride = 12 * 10000
@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import os
+import uuid
+
+import pandas as pd
+
+from pathlib import Path
+
+class ExtractionCache:
+    """
+    A class used to persist standardized statement extractions on disk so unchanged statements are not parsed again.
+
+    Entries are addressed by the content hash of the PDF, the Bank and statement type, and the parser fingerprint of
+    the StatementProcessor, so a changed statement or a changed parser configuration never hits a stale entry. The
+    cache is bounded in size and evicts the least recently used entries first. It only holds paths and settings, so it
+    can be handed to worker processes.
+
+    Every process keeps a running estimate of the cache size (in cache_size_estimates) and only scans the cache folder
+    once the estimate passes the size limit, or every scan_interval stores to pick up the entries of other workers,
+    so storing an entry does not stat the whole cache.
+    """
+
+    def load(self, cache_key):
+        """Loads a cached extraction
+
+        :param cache_key: Key from cache_key()
+        :return: Tuple of (transactions DataFrame, metadata tuple), or None if the statement is not cached
+        """
+        if self.rebuild:
+            return None
+
+        entry_path = self._entry_path(cache_key)
+        try:
+            cached_entry = pd.read_pickle(entry_path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Unreadable entries (e.g. written by an incompatible pandas version) are treated as misses
+            logging.warning("Discarding unreadable cache entry {}".format(entry_path))
+            self._remove_entry(entry_path)
+            return None
+
+        # Refresh the modification time so eviction sees this entry as recently used
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            pass
+
+        return cached_entry["transactions"], tuple(cached_entry["metadata"])
+
+    def store(self, cache_key, transactions, metadata):
+        """Stores an extraction and evicts the least recently used entries if the cache grew past its size limit
+
+        :param cache_key: Key from cache_key()
+        :param transactions: Standardized transaction DataFrame for the statement
+        :param metadata: Tuple of (year, starting_balance, ending_balance) for the statement
+        :return:
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = self._entry_path(cache_key)
+
+        # Write to a temporary file first so concurrent workers never read a partially written entry
+        temporary_path = entry_path.with_name("{}.{}.tmp".format(entry_path.name, uuid.uuid4().hex))
+        pd.to_pickle({"transactions": transactions, "metadata": tuple(metadata)}, temporary_path)
+        entry_size = os.stat(temporary_path).st_size
+        os.replace(temporary_path, entry_path)
+
+        self._track_size(entry_size)
+
+    def cache_key(self, pdf_filepath, bank, statement_type, parser_fingerprint):
+        """Builds the cache key of a statement from its content, Bank, statement type and parser fingerprint
+
+        :param pdf_filepath: Path to the statement, or its contents as an open binary file
+        :param bank: The Bank the statement comes from
+        :param statement_type: The type of statement (Chequing, Visa)
+        :param parser_fingerprint: Fingerprint of the StatementProcessor configuration
+        :return: Hex digest string
+        """
+        key = hashlib.sha256()
+        for component in (self._content_hash(pdf_filepath), bank, statement_type, parser_fingerprint):
+            key.update(str(component).encode("utf-8"))
+            key.update(b"\0")
+        return key.hexdigest()
+
+    def clear(self):
+        """Removes every cached extraction"""
+        for entry_path in self.cache_dir.glob("*" + self.entry_suffix):
+            self._remove_entry(entry_path)
+
+    def _track_size(self, entry_size):
+        """Adds a stored entry to the size estimate of this process, scanning and evicting once it passes the limit"""
+        size_estimate = cache_size_estimates.get(self.cache_dir)
+        if size_estimate is None or size_estimate[1] >= self.scan_interval:
+            # First store of this process, or time to pick up the entries stored by other workers
+            self._evict()
+            return
+
+        cache_size, stores_since_scan = size_estimate
+        cache_size += entry_size
+        if cache_size > self.max_size_bytes:
+            self._evict()
+        else:
+            cache_size_estimates[self.cache_dir] = (cache_size, stores_since_scan + 1)
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache fits in its size limit, and resets the size estimate
+        of this process to the scanned size"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(self.entry_suffix):
+                try:
+                    entry_stat = entry.stat()
+                except FileNotFoundError:
+                    # Already evicted by another worker
+                    continue
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+
+        cache_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if cache_size <= self.max_size_bytes:
+                break
+            self._remove_entry(entry_path)
+            cache_size -= size
+
+        cache_size_estimates[self.cache_dir] = (cache_size, 0)
+
+    def _remove_entry(self, entry_path):
+        """Deletes an entry, tolerating entries already removed by another worker"""
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+
+    def _content_hash(self, pdf_filepath):
+        """SHA-256 of the statement file contents, read from the path or from an already open binary file"""
+        content_hash = hashlib.sha256()
+        if hasattr(pdf_filepath, "read"):
+            pdf_filepath.seek(0)
+            for block in iter(lambda: pdf_filepath.read(1024 * 1024), b""):
+                content_hash.update(block)
+            pdf_filepath.seek(0)
+            return content_hash.hexdigest()
+
+        with open(pdf_filepath, "rb") as pdf_file:
+            for block in iter(lambda: pdf_file.read(1024 * 1024), b""):
+                content_hash.update(block)
+        return content_hash.hexdigest()
+
+    def _entry_path(self, cache_key):
+        return self.cache_dir / (cache_key + self.entry_suffix)
+
+    def __init__(self, cache_dir, max_size_bytes=1024 * 1024 * 1024, rebuild=False):
+        """
+        :param cache_dir: Folder holding the cache entries, created on first store
+        :param max_size_bytes: Size limit of the cache folder before least recently used entries are evicted
+        :param rebuild: Ignore existing entries and overwrite them with fresh extractions
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self.rebuild = rebuild
+        self.entry_suffix = ".pkl"
+        self.scan_interval = 64
+
+# Estimated size of every cache folder stored to by this process and the stores since the folder was last scanned.
+# Kept per process rather than on the ExtractionCache, as a fresh copy of it is pickled to a worker with every statement
+cache_size_estimates = {}
@@ -1,9 +1,26 @@
 from dataloader import DataLoader
 from dataquality import DataQuality
+from extractioncache import ExtractionCache
+from outputmanifest import OutputManifest
+from outputwriter import CsvStatementSink, ShardedOutputWriter, XlsxStatementSink
+from runprofiler import RunProfiler
+from statementpipeline import StatementPipeline
 from statementprocessor import StatementProcessor
+from statementreconciliation import StatementReconciliation
+from transactionframe import TransactionFrame
 
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
+import contextlib
+import functools
+import io
+import itertools
+import logging
+import os
+import shutil
+import time
+import numpy as np
 import pandas as pd
 
 class FinanceAnalytics:
@@ -17,82 +34,748 @@ class FinanceAnalytics:
         else:
             raise NameError('Filepath does not specify chequing or visa statement type explicitly, please include')
 
-    def extract_statement_data(self, df_record):
-        """Extract the transactions from the statement"""
+    def extract_statement_data(self, df_record, statement_processor=None):
+        """Extract the transactions from the statement, with the given StatementProcessor if one is reused across
+        statements"""
         pdf_filepath = df_record["Filepath"]
         bank = df_record["Bank"]
         statement_type = self.determine_statement_type(pdf_filepath)
-        return StatementProcessor().extract_with_validation(pdf_filepath, bank, statement_type)
+        if statement_processor is None:
+            statement_processor = StatementProcessor()
+        return statement_processor.extract_with_validation(pdf_filepath, bank, statement_type)
 
-    def extract_all_statements(self, structured_data, gui_object=None):
-        """Loops through all statements in the dataframe to extract transactions"""
+    def extract_all_statements(self, structured_data, gui_object=None, workers=1, extraction_cache=None,
+                               statement_sink=None, run_profiler=None, page_workers=1, memory_ceiling_bytes=None,
+                               statement_reconciliation=None, table_extraction_engines=None):
+        """Loops through all statements in the dataframe to extract transactions
+
+        With more than one worker the statements are sent to a process pool. Results are placed back in the order of
+        the structured data so the output is identical to the serial path. Statements found in the extraction cache
+        (if given) are loaded from it instead of being parsed.
+
+        With a statement sink every statement is written to the sink (in structured data order) as soon as it is
+        extracted and nothing is returned, so memory does not grow with the number of statements. Otherwise the
+        statements are merged into one compact TransactionFrame (categorical hierarchy columns, amounts in cents).
+
+        With a run profiler the extraction of every statement is timed and recorded in the profiler.
+
+        With more than one page worker the pages of long statements are extracted in parallel as well (see
+        StatementProcessor._extract_statement_pages).
+
+        With a memory ceiling the statements are always extracted in worker processes, which are replaced whenever one
+        of them is left holding more memory than the ceiling (see _iterate_statement_results).
+
+        With a statement reconciliation the transactions are reconciled against the balances of their statement, all
+        statements at once once merged (or one at a time before writing with a statement sink), and the statements
+        that do not reconcile are handled by its policy.
+
+        The tables are extracted with the table extraction engine of each Bank-Product in table_extraction_engines (see
+        StatementProcessor), pdfplumber for the Bank-Products not given.
+        """
         total_records = structured_data.shape[0]
-        column_names = list(structured_data.columns)
 
-        df_all_statements = []
+        if statement_sink is not None:
+            statement_results = self._iterate_statement_results(structured_data, workers, extraction_cache, ordered=True,
+                                                                run_profiler=run_profiler, page_workers=page_workers,
+                                                                memory_ceiling_bytes=memory_ceiling_bytes,
+                                                                table_extraction_engines=table_extraction_engines)
+            for position, (statement_df, metadata) in self._track_progress(statement_results, total_records, gui_object):
+                self._write_statement(statement_sink, statement_df, metadata, structured_data.iloc[[position]], statement_reconciliation)
+            return None
+
+        df_all_statements = [None] * total_records
+        all_metadata = [None] * total_records
+
+        statement_results = self._iterate_statement_results(structured_data, workers, extraction_cache,
+                                                            run_profiler=run_profiler, page_workers=page_workers,
+                                                            memory_ceiling_bytes=memory_ceiling_bytes,
+                                                            table_extraction_engines=table_extraction_engines)
+        for position, (statement_df, metadata) in self._track_progress(statement_results, total_records, gui_object):
+            df_all_statements[position] = statement_df
+            all_metadata[position] = metadata
+
+        # Merge statements into one dataframe, tagged with the hierarchy of their statement
+        all_statements = TransactionFrame().tag_statements(df_all_statements, structured_data)
+        return self._reconcile_statements(statement_reconciliation, all_statements, structured_data, all_metadata)
+
+    def extract_all_metadata(self, structured_data, gui_object=None, workers=1):
+        """Reads the metadata (year of last transaction, opening balance, closing balance) of every statement from its
+        first page only, without extracting any transactions
+
+        With more than one worker the statements are read on a process pool. Statements whose metadata can not be read
+        are logged and kept with empty balances so the rest of the scan still completes.
+
+        :return: DataFrame of the structured data with Year, Opening Balance and Closing Balance columns added
+        """
+        records = [row for index, row in structured_data.iterrows()]
+        extract_metadata = functools.partial(self._extract_single_metadata, statement_processor=StatementProcessor())
+
+        if workers is None or workers < 2:
+            metadata_results = map(extract_metadata, records)
+            all_metadata = list(self._track_progress(metadata_results, len(records), gui_object))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                metadata_results = executor.map(extract_metadata, records,
+                                                chunksize=max(1, len(records) // (workers * 16)))
+                all_metadata = list(self._track_progress(metadata_results, len(records), gui_object))
+
+        return self._statement_metadata_frame(structured_data, all_metadata)
+
+    def _statement_metadata_frame(self, structured_data, all_metadata):
+        """Adds the metadata tuples of the statements (in structured data order) to the structured data as Year,
+        Opening Balance and Closing Balance columns"""
+        statement_metadata = structured_data.copy()
+        statement_metadata[["Year", "Opening Balance", "Closing Balance"]] = pd.DataFrame(all_metadata, index=statement_metadata.index,
+                                                                                         dtype="float64")
+        statement_metadata["Year"] = statement_metadata["Year"].astype("Int64")
+
+        return statement_metadata
+
+    def _reconcile_statements(self, statement_reconciliation, all_statements, structured_data, all_metadata):
+        """Reconciles the merged transactions of the statements against their balances if a statement reconciliation
+        is given
+
+        :return: The transactions kept by the reconciliation policy
+        """
+        if statement_reconciliation is None:
+            return all_statements
+
+        statement_balances = self._statement_metadata_frame(structured_data, all_metadata)
+        return statement_reconciliation.reconcile(all_statements, statement_balances)
+
+    def _extract_single_metadata(self, record, statement_processor=None):
+        """Reads the metadata of a single Bank statement from its first page
+
+        Runs in the worker processes when reading in parallel, so it only depends on its arguments
+        :return: Tuple of (year, starting_balance, ending_balance), all None if the metadata could not be read
+        """
+        pdf_filepath = record["Filepath"]
+        if statement_processor is None:
+            statement_processor = StatementProcessor()
+        try:
+            statement_type = self.determine_statement_type(pdf_filepath)
+            return statement_processor.extract_statement_metadata(pdf_filepath, record["Bank"], statement_type)
+        except Exception as error:
+            logging.warning("Could not read the metadata of {}: {}".format(pdf_filepath, error))
+            return (None, None, None)
+
+    def extract_all_statements_pipelined(self, structured_data, gui_object=None, workers=1, extraction_cache=None,
+                                         statement_sink=None, run_profiler=None, page_workers=1, queue_depth=8,
+                                         statement_reconciliation=None, table_extraction_engines=None):
+        """Extracts all statements like extract_all_statements, through a StatementPipeline overlapping the reading of
+        the statement files, the parsing (on workers processes if workers > 1) and the writing of the results
+
+        With a statement sink memory stays bounded by the queue depth, otherwise the transactions are collected and
+        returned. The queue occupancy and stage utilization are logged, and recorded in the run profiler if given.
+        Progress is reported on the tqdm (command line) or GUI progress bar as in extract_all_statements.
+        Statements are reconciled with the statement reconciliation if given, as in extract_all_statements.
+
+        :return: DataFrame of all transactions, or None with a statement sink
+        """
+        records = [row for index, row in structured_data.iterrows()]
+        parse_statement = functools.partial(self._extract_statement_contents, extraction_cache=extraction_cache,
+                                            statement_processor=StatementProcessor(page_workers, table_extraction_engines),
+                                            profile=run_profiler is not None)
+
+        df_all_statements = [None] * len(records)
+        all_metadata = [None] * len(records)
+
+        def write_statement(position, result):
+            statement_df, metadata = self._statement_result(result, run_profiler)
+            if statement_sink is not None:
+                self._write_statement(statement_sink, statement_df, metadata, structured_data.iloc[[position]],
+                                      statement_reconciliation)
+            else:
+                df_all_statements[position] = statement_df
+                all_metadata[position] = metadata
+
+        # Progress is advanced by the pipeline itself rather than the write thread, as the GUI may only be updated from
+        # the thread running it
+        with self._progress_reporter(len(records), gui_object) as advance_progress:
+            pipeline_report = StatementPipeline(workers, queue_depth).run(records, parse_statement, write_statement,
+                                                                          advance_progress)
+
+        self._log_pipeline_report(pipeline_report)
+        if run_profiler is not None:
+            run_profiler.record_pipeline(pipeline_report)
+
+        if statement_sink is not None:
+            return None
 
-        """Start of CMD LINE processing method"""
+        all_statements = TransactionFrame().tag_statements(df_all_statements, structured_data)
+        return self._reconcile_statements(statement_reconciliation, all_statements, structured_data, all_metadata)
+
+    def _extract_statement_contents(self, record, pdf_contents, extraction_cache=None, statement_processor=None, profile=False):
+        """Extracts a single Bank statement from the contents already read by the pipeline, profiled if requested
+
+        Runs in the worker processes when parsing in parallel, so it only depends on its arguments
+        """
+        extract_statement = self._profile_single_statement if profile else self._extract_single_statement
+        return extract_statement(record, extraction_cache, statement_processor, pdf_contents)
+
+    def _write_statement(self, statement_sink, statement_df, metadata, statement_hierarchy, statement_reconciliation=None):
+        """Writes the compact transactions of one statement to a statement sink, tagged with its hierarchy and
+        reconciled with the statement reconciliation if given
+
+        :param metadata: Metadata tuple of the statement (year, starting_balance, ending_balance)
+        :param statement_hierarchy: Single row DataFrame of the structured data of the statement
+        """
+        statement_df = TransactionFrame().tag_statements([statement_df], statement_hierarchy)
+        statement_df = self._reconcile_statements(statement_reconciliation, statement_df, statement_hierarchy, [metadata])
+        statement_sink.write(TransactionFrame().to_output(statement_df))
+
+    def _log_pipeline_report(self, pipeline_report):
+        """Logs how full each pipeline queue was and how busy each stage was"""
+        for queue_name, queue in pipeline_report["queues"].items():
+            logging.info("Pipeline {} queue: {:.1f} of {} statements on average, {} at most".format(
+                queue_name, queue["average_occupancy"], queue["depth"], queue["max_occupancy"]))
+        for stage_name, stage in pipeline_report["stages"].items():
+            logging.info("Pipeline {} stage ({} worker(s)): {:.0%} busy".format(stage_name, stage["workers"], stage["utilization"]))
+
+    def _iterate_statement_results(self, structured_data, workers=1, extraction_cache=None, ordered=False,
+                                   run_profiler=None, page_workers=1, memory_ceiling_bytes=None, table_extraction_engines=None):
+        """Yields (position, (compact statement DataFrame, metadata tuple)) pairs
+
+        On a process pool the pairs come in completion order, or in structured data order if ordered. Only a few
+        statements per worker are in flight at a time, which bounds the results waiting to be consumed. With a run
+        profiler the statements are extracted through _profile_single_statement and their profiles recorded.
+
+        With a memory ceiling (bytes of resident memory per worker process) the statements are extracted on a process
+        pool even with a single worker. Once a worker reports more memory than the ceiling after a statement, no more
+        statements are submitted until the ones in flight are collected, and the workers are then replaced by new ones.
+        The peak memory of every statement (and the memory its worker holds after it) is logged, followed by a summary
+        of the statements with the highest peaks.
+        """
+        records = [row for index, row in structured_data.iterrows()]
+        extract_statement = self._extract_single_statement if run_profiler is None else self._profile_single_statement
+        statement_processor = StatementProcessor(page_workers, table_extraction_engines)
+
+        if (workers is None or workers < 2) and memory_ceiling_bytes is None:
+            for position, record in enumerate(records):
+                yield position, self._statement_result(extract_statement(record, extraction_cache, statement_processor),
+                                                       run_profiler)
+            return
+
+        workers = max(workers or 1, 1)
+        if memory_ceiling_bytes is not None:
+            extract_statement = functools.partial(self._extract_measuring_memory, extract_statement)
+
+        max_in_flight = workers * 4
+        unsubmitted_records = enumerate(records)
+
+        # Peak memory (bytes) of every statement extracted under the memory ceiling, by position
+        statement_peak_memory = {}
+
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # Futures in submission order, mapped to the position of their statement
+        in_flight = {}
+        recycle_workers = False
+        try:
+            while True:
+                if recycle_workers and not in_flight:
+                    # Every statement of the old workers has been collected, so they can be replaced
+                    executor.shutdown()
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                    recycle_workers = False
+
+                if not recycle_workers:
+                    for position, record in itertools.islice(unsubmitted_records, max_in_flight - len(in_flight)):
+                        in_flight[executor.submit(extract_statement, record, extraction_cache, statement_processor)] = position
+                if not in_flight:
+                    break
+
+                if ordered:
+                    completed = [next(iter(in_flight))]
+                else:
+                    completed = [future for future in wait(in_flight, return_when=FIRST_COMPLETED).done]
+
+                for future in completed:
+                    result = future.result()
+                    if memory_ceiling_bytes is not None:
+                        result, worker_memory_bytes, peak_memory_bytes = result
+                        statement_peak_memory[in_flight[future]] = peak_memory_bytes
+                        self._log_statement_memory(records[in_flight[future]]["Filepath"], peak_memory_bytes, worker_memory_bytes)
+                        if worker_memory_bytes is not None and worker_memory_bytes > memory_ceiling_bytes and not recycle_workers:
+                            logging.info("Extraction worker holds {:.0f} MB, over the {:.0f} MB ceiling, recycling the workers".format(
+                                worker_memory_bytes / 2**20, memory_ceiling_bytes / 2**20))
+                            recycle_workers = True
+                    yield in_flight.pop(future), self._statement_result(result, run_profiler)
+
+            if memory_ceiling_bytes is not None:
+                self._log_peak_memory_summary(records, statement_peak_memory)
+        finally:
+            # Do not keep parsing the remaining statements if a statement failed or the caller stopped early
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown()
+
+    def _extract_measuring_memory(self, extract_statement, record, extraction_cache=None, statement_processor=None):
+        """Extracts a single Bank statement with extract_statement, reporting the peak memory of the worker while
+        extracting it and the memory the worker holds afterwards
+
+        Runs in the worker processes, so it only depends on its arguments
+        :return: Tuple of (extraction result, resident memory of the worker process in bytes, peak resident memory of
+            the worker process during the statement in bytes, or its peak so far where the peak cannot be reset)
+        """
+        run_profiler = RunProfiler()
+        run_profiler.reset_peak_memory()
+        result = extract_statement(record, extraction_cache, statement_processor)
+        return result, run_profiler.current_memory_bytes(), run_profiler.peak_memory_bytes()
+
+    def _log_statement_memory(self, pdf_filepath, peak_memory_bytes, worker_memory_bytes):
+        """Logs the peak memory of a statement and the memory its worker holds after it, either may be unknown (None)"""
+        logging.info("Extracted {} with a peak of {} MB, worker holding {} MB".format(
+            pdf_filepath, *("{:.0f}".format(x / 2**20) if x is not None else "unknown" for x in (peak_memory_bytes, worker_memory_bytes))))
+
+    def _log_peak_memory_summary(self, records, statement_peak_memory):
+        """Logs the median and highest peak memory of the statements, and the statements with the highest peaks"""
+        known_peaks = {position: x for position, x in statement_peak_memory.items() if x is not None}
+        if not known_peaks:
+            return
+
+        highest_peaks = sorted(known_peaks, key=known_peaks.get, reverse=True)[:5]
+        logging.info("Peak memory of {} statements: median {:.0f} MB, highest {}".format(
+            len(known_peaks), np.median(list(known_peaks.values())) / 2**20,
+            ", ".join("{} ({:.0f} MB)".format(records[x]["Filepath"], known_peaks[x] / 2**20) for x in highest_peaks)))
+
+    def _statement_result(self, result, run_profiler=None):
+        """Unpacks a statement result, recording its profile when profiling"""
+        if run_profiler is None:
+            return result
+
+        statement_result, statement_profile = result
+        run_profiler.record_statement(statement_profile)
+        return statement_result
+
+    def _track_progress(self, statement_results, total_records, gui_object=None):
+        """Passes the statement results through while updating the tqdm (command line) or GUI progress bar"""
+        with self._progress_reporter(total_records, gui_object) as advance_progress:
+            for statement_result in statement_results:
+                yield statement_result
+                advance_progress()
+
+    @contextlib.contextmanager
+    def _progress_reporter(self, total_records, gui_object=None):
+        """Yields a function advancing the tqdm (command line) or GUI progress bar by one statement"""
+
+        """Start of CMD LINE progress method"""
         if gui_object == None:
             from tqdm import tqdm
-            for index, row in tqdm(structured_data.iterrows(), total=structured_data.shape[0]):
-                self._process_single_statement(row, df_all_statements, column_names)
+            with tqdm(total=total_records) as progress_bar:
+                yield progress_bar.update
 
         else:
-            """ Start of GUI processing method"""
+            """ Start of GUI progress method"""
             # Set the GUI progress bar
-            gui_object.progress_bar["maximum"] = structured_data.shape[0]
-            files_processed = 0
-
-            # Iteratively process financial statements
-            for index, row in structured_data.iterrows():
-                self._process_single_statement(row, df_all_statements, column_names)
+            gui_object.progress_bar["maximum"] = total_records
+            files_processed = itertools.count(1)
 
+            def advance_progress():
                 # Update the progress bar
-                files_processed += 1
-                gui_object.progress_bar["value"] = files_processed
+                gui_object.progress_bar["value"] = next(files_processed)
                 gui_object.progress_bar.update()
 
-        # Merge statements into one dataframe
-        return pd.concat(df_all_statements, axis=0).reset_index(drop=True)
+            yield advance_progress
 
-    def _process_single_statement(self, record, processed_record_collection, column_names):
-        """Function for extracting transactions from a single Bank statement in the run loop"""
+    def _extract_single_statement(self, record, extraction_cache=None, statement_processor=None, pdf_contents=None):
+        """Extracts the transactions from a single Bank statement in the compact layout of TransactionFrame
+
+        Runs in the worker processes when extracting in parallel, so it only depends on its arguments. The statement is
+        read from its Filepath, or parsed from pdf_contents if the file was already read. The transactions are tagged
+        with the statement hierarchy once all statements are merged (see TransactionFrame.tag_statements), so each
+        statement does not carry its own copy of the hierarchy.
+
+        :return: Tuple of (compact DataFrame of the statement transactions, metadata tuple of the statement)
+        """
         pdf_filepath = record["Filepath"]
         bank = record["Bank"]
         statement_type = self.determine_statement_type(pdf_filepath)
 
-        statement_df = StatementProcessor().extract_with_validation(pdf_filepath, bank, statement_type)
+        pdf_source = pdf_filepath if pdf_contents is None else io.BytesIO(pdf_contents)
+        statement_df, metadata = self._extract_with_cache(pdf_source, bank, statement_type, extraction_cache, statement_processor)
+
+        return TransactionFrame().compact(statement_df), metadata
+
 
-        # Append the hierarchy onto the results
-        statement_df[column_names] = record.values
+    def _profile_single_statement(self, record, extraction_cache=None, statement_processor=None, pdf_contents=None):
+        """Extracts a single Bank statement like _extract_single_statement, timing the extraction and its stages
 
-        # Add the statement with hierarchy to the complete dataset
-        return processed_record_collection.append(statement_df)
+        :return: Tuple of ((statement DataFrame, metadata tuple), dictionary profile of the statement)
+        """
+        if statement_processor is None:
+            statement_processor = StatementProcessor()
 
+        # Cleared so a statement loaded from the cache does not report the stages of the previous statement
+        statement_processor.stage_timings = {}
+        statement_processor.page_screening = dict.fromkeys(statement_processor.page_screening, 0)
 
-    def write_output_to_location(self, all_statements, output_dir, output_fname="extracted_transactions", output_format="xlsx"):
-        """Outputs the structured transaction data to the users designated output location"""
-        output_path = Path(output_dir + '/' + output_fname + '.' + output_format)
+        memory_profiler = RunProfiler()
+        peak_reset = memory_profiler.reset_peak_memory()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        statement_result = self._extract_single_statement(record, extraction_cache, statement_processor, pdf_contents)
+
+        statement_profile = {
+            "Filepath": str(record["Filepath"]),
+            "wall_seconds": time.perf_counter() - wall_start,
+            "cpu_seconds": time.process_time() - cpu_start,
+            "transactions": statement_result[0].shape[0],
+            # Statements loaded from the extraction cache are not parsed, so have no extraction stages
+            "cached": not statement_processor.stage_timings,
+            "stages": statement_processor.stage_timings,
+            "page_screening": statement_processor.page_screening,
+            # Peak of the process extracting the statement, only specific to the statement where it can be reset
+            "peak_memory_bytes": memory_profiler.peak_memory_bytes(),
+            "peak_memory_scope": "statement" if peak_reset else "process",
+            "process_id": os.getpid(),
+        }
+
+        return statement_result, statement_profile
+
+    def _extract_with_cache(self, pdf_filepath, bank, statement_type, extraction_cache=None, statement_processor=None):
+        """Extracts a statement through the extraction cache, parsing and caching it on a miss
+
+        :return: Tuple of (transactions DataFrame, metadata tuple)
+        """
+        if statement_processor is None:
+            statement_processor = StatementProcessor()
+
+        if extraction_cache is None:
+            return statement_processor.extract_with_metadata(pdf_filepath, bank, statement_type)
+
+        cache_key = extraction_cache.cache_key(pdf_filepath, bank, statement_type, statement_processor.parser_fingerprint())
+        cached_extraction = extraction_cache.load(cache_key)
+        if cached_extraction is not None:
+            return cached_extraction
+
+        transactions, metadata = statement_processor.extract_with_metadata(pdf_filepath, bank, statement_type)
+        extraction_cache.store(cache_key, transactions, metadata)
+
+        return transactions, metadata
+
+    def extract_new_statements(self, structured_data, output_path, output_format, output_manifest, gui_object=None,
+                               workers=1, extraction_cache=None, run_profiler=None, page_workers=1, memory_ceiling_bytes=None,
+                               statement_reconciliation=None, reconciliation_path=None, table_extraction_engines=None):
+        """Extracts only the statements added or changed since the output was written and merges them into it
+
+        Rows of changed or removed statements are dropped from the existing output, the new extractions are added and
+        the result is put in the same row order a full run would produce. Only the new extractions are reconciled, the
+        reconciliation of the other statements is carried over from the report at reconciliation_path if given.
+
+        :return: DataFrame of all transactions, or None if no statement was added, changed or removed
+        """
+        new_or_changed, removed = output_manifest.compare(structured_data["Filepath"])
+        if not new_or_changed and not removed:
+            logging.info("No new or changed statements since {}".format(output_path))
+            return None
+
+        logging.info("Extracting {} new or changed statements, dropping {} removed statements".format(len(new_or_changed), len(removed)))
+
+        column_names = list(structured_data.columns)
+        filepaths = structured_data["Filepath"].astype(str)
+
+        if statement_reconciliation is not None and reconciliation_path is not None:
+            statement_reconciliation.carry_over(reconciliation_path, filepaths[~filepaths.isin(set(new_or_changed))])
+
+        existing_statements = self._read_existing_output(output_path, output_format, column_names)
+        existing_statements = existing_statements[~existing_statements["Filepath"].isin(set(new_or_changed) | set(removed))]
+
+        all_statements = [TransactionFrame().from_output(existing_statements, column_names)]
+        new_statements = structured_data[filepaths.isin(set(new_or_changed))]
+        if not new_statements.empty:
+            all_statements.append(self.extract_all_statements(new_statements, gui_object, workers, extraction_cache,
+                                                              run_profiler=run_profiler, page_workers=page_workers,
+                                                              memory_ceiling_bytes=memory_ceiling_bytes,
+                                                              statement_reconciliation=statement_reconciliation,
+                                                              table_extraction_engines=table_extraction_engines))
+        merged_statements = TransactionFrame().concat(all_statements)
+
+        # Hierarchy levels added since the last run are filled the same way the DataLoader fills shorter hierarchies
+        output_columns = [column for column in merged_statements.columns if column not in column_names] + column_names
+        merged_statements = merged_statements.reindex(columns=output_columns)
+        merged_statements = TransactionFrame().fill_missing(merged_statements, column_names, "NONE")
+
+        # Statements in structured data order, transactions within a statement keep their order
+        statement_position = merged_statements["Filepath"].astype(str).map(dict(zip(filepaths, range(len(filepaths)))))
+        return merged_statements.iloc[np.argsort(statement_position.values, kind="stable")].reset_index(drop=True)
+
+    def _read_existing_output(self, output_path, output_format, column_names):
+        """Reads a previously written output (or every shard of a sharded output) back with the hierarchy and Filepath
+        columns as text"""
+        sharded_output = ShardedOutputWriter(output_path, output_format)
+        if sharded_output.is_sharded():
+            return pd.concat([self._read_output_file(shard_path, output_format, column_names)
+                              for shard_path in sharded_output.shard_paths()], axis=0).reset_index(drop=True)
+        return self._read_output_file(output_path, output_format, column_names)
+
+    def _read_output_file(self, output_path, output_format, column_names):
+        """Reads an output file back with the hierarchy and Filepath columns as text"""
+        text_columns = {column: str for column in column_names}
         if output_format == "xlsx":
-            all_statements.to_excel(output_path, index=False)
+            # Every sheet, as large outputs roll over to further sheets or are split into a sheet per hierarchy branch
+            return pd.concat(pd.read_excel(output_path, dtype=text_columns, sheet_name=None).values(), axis=0).reset_index(drop=True)
+        elif output_format == "csv":
+            return pd.read_csv(output_path, dtype=text_columns, parse_dates=["Date"])
+        elif output_format == "parquet":
+            existing_statements = pd.read_parquet(output_path)
+            text_columns = [column for column in column_names if column in existing_statements.columns]
+            existing_statements[text_columns] = existing_statements[text_columns].astype(str)
+            return existing_statements
+        else:
+            raise ValueError('Import write format specified')
+
+    def _output_path(self, output_dir, output_fname, output_format):
+        return Path(output_dir + '/' + output_fname + '.' + output_format)
+
+    def _reconciliation_path(self, output_dir, output_fname):
+        return Path(output_dir + '/' + output_fname + '.reconciliation.csv')
+
+    def _open_statement_sink(self, output_path, output_format, partition_cols=None):
+        """Opens a sink streaming statements to the output as they are extracted"""
+        if output_format == "csv":
+            return CsvStatementSink(output_path)
+        elif output_format == "xlsx":
+            return XlsxStatementSink(output_path, sheet_by=partition_cols)
+        else:
+            raise ValueError('Streaming output is not supported for {} format'.format(output_format))
+
+    def write_output_to_location(self, all_statements, output_dir, output_fname="extracted_transactions", output_format="xlsx",
+                                 partition_cols=None, shard_cols=None, shard_writers=1):
+        """Outputs the structured transaction data (a compact TransactionFrame) to the users designated output location
+
+        Parquet output can be partitioned by hierarchy columns (e.g. ["Bank", "Level 1"]), in which case the output is
+        a folder with one sub folder per hierarchy value so a single account can be read without scanning the rest.
+        Excel output is written row chunk by row chunk, with one sheet per hierarchy value if partitioned.
+
+        With shard_cols (e.g. ["Bank", "Level 1"]) the output is instead a folder with one file of the output format per
+        hierarchy branch, written by shard_writers processes, and an index of the shards with their row counts and
+        date ranges.
+        """
+        output_path = self._output_path(output_dir, output_fname, output_format)
+        all_statements = TransactionFrame().to_output(all_statements)
+        if shard_cols:
+            if output_format == "parquet":
+                all_statements = self._typed_parquet_frame(all_statements)
+            ShardedOutputWriter(output_path, output_format, shard_cols, shard_writers).write(all_statements)
+        elif output_format == "xlsx":
+            with XlsxStatementSink(output_path, sheet_by=partition_cols) as statement_sink:
+                statement_sink.write(all_statements)
         elif output_format == "csv":
             all_statements.to_csv(output_path, index=False)
+        elif output_format == "parquet":
+            self._write_parquet(self._typed_parquet_frame(all_statements), output_path, partition_cols)
         else:
             raise ValueError('Import write format specified')
 
-    def run(self, input_dir, output_dir, output_fname="extracted_transactions", output_format="xlsx", gui_object=None):
+    def _typed_parquet_frame(self, all_statements):
+        """Sets an explicit column type for every Parquet column: datetime dates, float amounts, text descriptions and
+        dictionary encoded hierarchy and Filepath columns"""
+        typed_statements = all_statements.copy(deep=False)
+        for column in typed_statements.columns:
+            if column == "Date":
+                typed_statements[column] = pd.to_datetime(typed_statements[column])
+            elif column == "Amount":
+                typed_statements[column] = typed_statements[column].astype("float64")
+            elif column == "Description":
+                typed_statements[column] = typed_statements[column].astype("string")
+            elif isinstance(typed_statements[column].dtype, pd.CategoricalDtype):
+                # Already dictionary encoded, only the categories are made text and sorted
+                text_categories = typed_statements[column].cat.categories.astype(str)
+                typed_statements[column] = typed_statements[column].cat.rename_categories(text_categories).cat.reorder_categories(text_categories.sort_values())
+            else:
+                typed_statements[column] = typed_statements[column].astype(str).astype("category")
+        return typed_statements
+
+    def _write_parquet(self, typed_statements, output_path, partition_cols=None):
+        """Writes a Parquet file (or a partitioned Parquet folder), replacing any previous output only once written"""
+        if partition_cols:
+            missing_columns = [column for column in partition_cols if column not in typed_statements.columns]
+            if missing_columns:
+                raise ValueError('Partition columns {} are not in the output'.format(missing_columns))
+
+        partial_path = output_path.with_name(output_path.name + ".partial")
+        self._remove_output(partial_path)
+        typed_statements.to_parquet(partial_path, index=False, partition_cols=partition_cols or None)
+
+        self._remove_output(output_path)
+        os.replace(partial_path, output_path)
+
+    def _remove_output(self, output_path):
+        """Removes an output file or partitioned output folder if it exists"""
+        if output_path.is_dir():
+            shutil.rmtree(output_path)
+        elif output_path.exists():
+            output_path.unlink()
+
+    def run(self, input_dir, output_dir, output_fname="extracted_transactions", output_format="xlsx", gui_object=None,
+            workers=1, cache_dir=None, cache_size_bytes=1024 * 1024 * 1024, rebuild_cache=False, incremental=False,
+            streaming=False, partition_cols=None, profile_path=None, pstats_path=None, scan_workers=1,
+            catalog_path=None, page_workers=1, pipeline=False, queue_depth=8, memory_ceiling_bytes=None,
+            reconciliation_policy="warn", shard_cols=None, shard_writers=1, table_extraction_engines=None):
         """Runs the complete Finance Analytics process, including:
-        1) Detect statements
+        1) Detect statements (walking the Bank folders with scan_workers threads, only re-listing the folders changed
+           since the previous run if a statement catalog_path is given)
         2) Metadata DQ analysis
-        3) Extract transactions
-        4) Write output"""
+        3) Extract transactions (in parallel across worker processes if workers > 1, the pages of long statements in
+           parallel across page_workers processes if page_workers > 1, reusing the extraction cache in
+           cache_dir if given, and only for new or changed statements if incremental)
+        4) Write output (streamed statement by statement while extracting if streaming) and the manifest of the
+           statements it contains, Parquet output optionally partitioned by the hierarchy columns in partition_cols
+           (Excel output split into one sheet per hierarchy value), or sharded into one file per value of the hierarchy
+           columns in shard_cols written by shard_writers processes
+
+        With pipeline the statements are read, parsed and written by a StatementPipeline, overlapping file I/O with the
+        parsing through queues holding up to queue_depth statements.
+
+        With memory_ceiling_bytes the statements are extracted in worker processes that are replaced whenever one holds
+        more resident memory than the ceiling after a statement (not available with pipeline).
+
+        The transactions extracted are reconciled against the opening and closing balance of their statement, and the
+        reconciliation table of those statements written to <output_fname>.reconciliation.csv. Statements that do not
+        reconcile are logged and, depending on reconciliation_policy, kept ("warn"), dropped from the output ("drop")
+        or stop the run before any output is written ("abort").
+
+        The page tables of each Bank-Product are extracted with its engine in table_extraction_engines (e.g.
+        {"RBC": {"Visa": "explicit_columns"}}, see StatementProcessor), pdfplumber for the Bank-Products not given.
+
+        If profile_path is given the wall time, CPU time and peak memory of every stage, and the extraction stages of
+        every statement, are written there as a JSON report, along with a pstats dump to pstats_path if given."""
+
+        run_profiler = None
+        if profile_path is not None:
+            run_profiler = RunProfiler(function_profile=pstats_path is not None)
+            run_profiler.start()
+
+        statement_reconciliation = StatementReconciliation(reconciliation_policy)
+
+        try:
+            self._run_stages(input_dir, output_dir, output_fname, output_format, gui_object, workers, cache_dir,
+                             cache_size_bytes, rebuild_cache, incremental, streaming, partition_cols, run_profiler,
+                             scan_workers, catalog_path, page_workers, pipeline, queue_depth, memory_ceiling_bytes,
+                             statement_reconciliation, shard_cols, shard_writers, table_extraction_engines)
+        finally:
+            # Also written when the run is aborted, to show which statements did not reconcile
+            if statement_reconciliation.reconciliations:
+                reconciliation_path = self._reconciliation_path(output_dir, output_fname)
+                statement_reconciliation.save(reconciliation_path)
+                logging.info("Wrote the reconciliation of {} statements to {}".format(
+                    statement_reconciliation.report().shape[0], reconciliation_path))
+            if run_profiler is not None:
+                run_profiler.stop()
+                run_profiler.save(profile_path, pstats_path)
+                logging.info("Wrote run profile to {}".format(profile_path))
+
+    def run_metadata_scan(self, input_dir, output_dir, output_fname="extracted_transactions", gui_object=None, workers=1,
+                          scan_workers=1, catalog_path=None):
+        """Runs the metadata only data quality pass, reading just the first page of every statement:
+        1) Detect statements
+        2) Metadata DQ analysis (range and gaps of the statement months)
+        3) Read the period and balances of every statement (in parallel across worker processes if workers > 1)
+        4) Report the statements whose opening balance does not continue from the previous statement, and write the
+           statement metadata to <output_fname>.metadata.csv
+
+        :return: Tuple of (DataFrame of the statement metadata, DataFrame of the balance breaks)
+        """
+        structured_data = DataLoader().load_data(input_dir, scan_workers, catalog_path)
+
+        DataQuality().analyze_data_quality(structured_data)
+
+        statement_metadata = self.extract_all_metadata(structured_data, gui_object, workers)
+        balance_breaks = DataQuality().analyze_balance_continuity(statement_metadata)
+
+        metadata_path = Path(output_dir + '/' + output_fname + '.metadata.csv')
+        statement_metadata.to_csv(metadata_path, index=False)
+        logging.info("Wrote the metadata of {} statements to {}".format(statement_metadata.shape[0], metadata_path))
+
+        return statement_metadata, balance_breaks
+
+    def _run_stages(self, input_dir, output_dir, output_fname, output_format, gui_object, workers, cache_dir,
+                    cache_size_bytes, rebuild_cache, incremental, streaming, partition_cols, run_profiler=None,
+                    scan_workers=1, catalog_path=None, page_workers=1, pipeline=False, queue_depth=8,
+                    memory_ceiling_bytes=None, statement_reconciliation=None, shard_cols=None, shard_writers=1,
+                    table_extraction_engines=None):
+        """Runs the stages of run(), each one profiled if a run profiler is given"""
+
+        extraction_cache = None
+        if cache_dir is not None:
+            extraction_cache = ExtractionCache(cache_dir, cache_size_bytes, rebuild_cache)
 
         # Load the data
-        structured_data = DataLoader().load_data(input_dir)
+        with self._profile_stage(run_profiler, "load_data"):
+            structured_data = DataLoader().load_data(input_dir, scan_workers, catalog_path)
 
         # Run the DQ analysis
-        DataQuality().analyze_data_quality(structured_data)
+        with self._profile_stage(run_profiler, "analyze_data_quality"):
+            DataQuality().analyze_data_quality(structured_data)
+
+        output_path = self._output_path(output_dir, output_fname, output_format)
+        output_manifest = OutputManifest(str(output_path) + ".manifest.json")
+
+        if streaming and incremental:
+            raise ValueError('Streaming output cannot be merged into an existing output, choose streaming or incremental')
+
+        if streaming and shard_cols:
+            raise ValueError('Sharded output is written once every statement is extracted, choose streaming or sharding')
+
+        if partition_cols and shard_cols:
+            raise ValueError('Output is either partitioned or sharded, choose partition_cols or shard_cols')
+
+        if pipeline and incremental:
+            raise ValueError('The statement pipeline only runs full extractions, choose pipeline or incremental')
+
+        if pipeline and memory_ceiling_bytes is not None:
+            raise ValueError('The statement pipeline does not recycle its workers, choose pipeline or a memory ceiling')
+
+        # Extract the statements, falling back to a full extraction if there is no previous output to merge into
+        if streaming:
+            with self._profile_stage(run_profiler, "extract_and_write_statements"):
+                with self._open_statement_sink(output_path, output_format, partition_cols) as statement_sink:
+                    if pipeline:
+                        self.extract_all_statements_pipelined(structured_data, gui_object, workers, extraction_cache,
+                                                              statement_sink, run_profiler, page_workers, queue_depth,
+                                                              statement_reconciliation, table_extraction_engines)
+                    else:
+                        self.extract_all_statements(structured_data, gui_object, workers, extraction_cache, statement_sink,
+                                                    run_profiler, page_workers, memory_ceiling_bytes, statement_reconciliation,
+                                                    table_extraction_engines)
+        else:
+            with self._profile_stage(run_profiler, "extract_statements"):
+                if incremental and output_manifest.matches(output_path, output_format):
+                    all_statements = self.extract_new_statements(structured_data, output_path, output_format, output_manifest,
+                                                                 gui_object, workers, extraction_cache, run_profiler, page_workers,
+                                                                 memory_ceiling_bytes, statement_reconciliation,
+                                                                 self._reconciliation_path(output_dir, output_fname),
+                                                                 table_extraction_engines)
+                elif pipeline:
+                    all_statements = self.extract_all_statements_pipelined(structured_data, gui_object, workers, extraction_cache,
+                                                                           run_profiler=run_profiler, page_workers=page_workers,
+                                                                           queue_depth=queue_depth,
+                                                                           statement_reconciliation=statement_reconciliation,
+                                                                           table_extraction_engines=table_extraction_engines)
+                else:
+                    all_statements = self.extract_all_statements(structured_data, gui_object, workers, extraction_cache,
+                                                                 run_profiler=run_profiler, page_workers=page_workers,
+                                                                 memory_ceiling_bytes=memory_ceiling_bytes,
+                                                                 statement_reconciliation=statement_reconciliation,
+                                                                 table_extraction_engines=table_extraction_engines)
+            if all_statements is None:
+                return
+
+            # Write the statements
+            with self._profile_stage(run_profiler, "write_output"):
+                self.write_output_to_location(all_statements, output_dir, output_fname, output_format, partition_cols,
+                                              shard_cols, shard_writers)
 
-        # Extract the statements and write
-        self.write_output_to_location(self.extract_all_statements(structured_data, gui_object), output_dir, output_fname, output_format)
+        # Remember which statements the output now contains, leaving out those dropped as they did not reconcile so a
+        # later incremental run extracts them again
+        written_filepaths = structured_data["Filepath"]
+        if statement_reconciliation is not None:
+            written_filepaths = written_filepaths[~written_filepaths.astype(str).isin(statement_reconciliation.dropped_filepaths)]
+        output_manifest.record(written_filepaths, output_format)
+        output_manifest.save()
 
+    def _profile_stage(self, run_profiler, stage_name):
+        """Profiles a run stage if a run profiler is given"""
+        if run_profiler is None:
+            return contextlib.nullcontext()
+        return run_profiler.stage(stage_name)
@@ -1,6 +1,9 @@
 import argparse
+import re
+import sys
 
 from financeanalytics import FinanceAnalytics
+from statementprocessor import StatementProcessor
 
 if __name__ == "__main__":
 
@@ -14,7 +17,63 @@ if __name__ == "__main__":
 
     parser.add_argument("-f", "--output_filename", required=False, type=str, default="output_table")
 
-    parser.add_argument("-x", "--output_extension", required=False, default="xlsx", choices=["csv", "xlsx"])
+    parser.add_argument("-x", "--output_extension", required=False, default="xlsx", choices=["csv", "xlsx", "parquet"])
+
+    # Number of processes extracting statements in parallel, 1 keeps the serial extraction
+    parser.add_argument("-w", "--workers", required=False, type=int, default=1)
+
+    # Processes extracting the pages of a single long statement, helps when a few very long statements hold up a run
+    parser.add_argument("--page-workers", required=False, type=int, default=1)
+
+    # Threads walking the statement folders, more than 1 mostly helps on network drives
+    parser.add_argument("--scan-threads", required=False, type=int, default=1)
+
+    # Statement catalog remembering the statement folders between runs, defaults to a file in the output directory
+    catalog_mode = parser.add_mutually_exclusive_group()
+    catalog_mode.add_argument("--catalog", required=False, type=str)
+    catalog_mode.add_argument("--no-catalog", action="store_true", help="Walk every statement folder without reading or writing the catalog")
+
+    # Extraction cache, defaults to a folder in the output directory
+    parser.add_argument("--cache-dir", required=False, type=str)
+    parser.add_argument("--cache-size-mb", required=False, type=int, default=1024)
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument("--no-cache", action="store_true", help="Parse every statement without reading or writing the extraction cache")
+    cache_mode.add_argument("--rebuild-cache", action="store_true", help="Parse every statement and overwrite its cache entry")
+
+    # Only extract statements added or changed since the output was last written
+    parser.add_argument("--incremental", action="store_true")
+
+    # Write each statement to the output as soon as it is extracted instead of holding all transactions in memory
+    parser.add_argument("--stream", action="store_true")
+
+    # Resident memory (MB) a worker process may hold after a statement before the extraction workers are replaced
+    parser.add_argument("--max-rss-mb", required=False, type=int, default=None)
+
+    # What to do with statements whose transactions do not add up from the opening to the closing balance
+    parser.add_argument("--unreconciled", required=False, choices=["warn", "drop", "abort"], default="warn",
+                        help="Keep (warn), leave out (drop) or stop the run (abort) on statements that do not reconcile")
+
+    # Table extraction engine of a Bank-Product, repeated for each one, e.g. --table-engine RBC/Visa=explicit_columns
+    parser.add_argument("--table-engine", required=False, action="append", default=[], metavar="BANK/PRODUCT=ENGINE",
+                        help="Extract the page tables of a Bank-Product with pdfplumber (default), explicit_columns or compare")
+
+    # Read, parse and write statements in an asyncio pipeline, overlapping slow (network) file I/O with the parsing
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--queue-depth", required=False, type=int, default=8, help="Statements held by each pipeline queue")
+
+    # Parquet (one folder per value) or Excel (one sheet per value) output only, e.g. --partition-by Bank "Level 1"
+    parser.add_argument("--partition-by", required=False, nargs="+", default=None)
+
+    # One file per hierarchy branch written by a pool of writer processes, with an index.json of the shards, e.g. --shard-by Bank "Level 1"
+    parser.add_argument("--shard-by", required=False, nargs="+", default=None)
+    parser.add_argument("--shard-writers", required=False, type=int, default=4, help="Processes writing shards in parallel")
+
+    # Only read the period and balances from the first page of every statement and report balance breaks, no transactions are extracted
+    parser.add_argument("--metadata-only", action="store_true")
+
+    # Record per stage and per statement timings and peak memory to <output_filename>.profile.json in the output directory
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--profile-stats", action="store_true", help="With --profile, also dump the function level profile (pstats)")
 
     args = parser.parse_args()
 
@@ -25,9 +84,102 @@ if __name__ == "__main__":
     output_directory = args.output_directory
     output_filename = args.output_filename
     output_extension = args.output_extension
+    workers = args.workers
+    cache_dir = args.cache_dir
 
     # If output is None, default to input location and default filename
     if output_directory is None:
         output_directory = input_directory
 
-    FinanceAnalytics().run(input_dir=input_directory, output_dir=output_directory, output_fname=output_filename, output_format=output_extension)
\ No newline at end of file
+    if cache_dir is None:
+        cache_dir = output_directory + "/.extraction_cache"
+
+    if args.no_cache:
+        cache_dir = None
+
+    catalog_path = args.catalog
+    if catalog_path is None:
+        catalog_path = output_directory + "/.statement_catalog.sqlite"
+
+    if args.no_catalog:
+        catalog_path = None
+
+    if workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.page_workers < 1:
+        parser.error("--page-workers must be at least 1")
+
+    if args.scan_threads < 1:
+        parser.error("--scan-threads must be at least 1")
+
+    if args.partition_by and output_extension not in ("parquet", "xlsx"):
+        parser.error("--partition-by is only supported with parquet or xlsx output")
+
+    if args.shard_by and (args.partition_by or args.stream):
+        parser.error("--shard-by cannot be combined with --partition-by or --stream")
+
+    if args.shard_writers < 1:
+        parser.error("--shard-writers must be at least 1")
+
+    if args.stream and output_extension == "parquet":
+        parser.error("--stream is only supported with csv or xlsx output")
+
+    if args.stream and args.incremental:
+        parser.error("--stream cannot be combined with --incremental")
+
+    if args.pipeline and args.incremental:
+        parser.error("--pipeline cannot be combined with --incremental")
+
+    if args.max_rss_mb is not None and args.max_rss_mb < 1:
+        parser.error("--max-rss-mb must be at least 1")
+
+    if args.pipeline and args.max_rss_mb is not None:
+        parser.error("--pipeline cannot be combined with --max-rss-mb")
+
+    if args.queue_depth < 1:
+        parser.error("--queue-depth must be at least 1")
+
+    if args.profile_stats and not args.profile:
+        parser.error("--profile-stats requires --profile")
+
+    table_extraction_engines = {}
+    for table_engine in args.table_engine:
+        table_engine_match = re.fullmatch(r"([^/=]+)/([^/=]+)=(\w+)", table_engine)
+        if table_engine_match is None:
+            parser.error("--table-engine takes BANK/PRODUCT=ENGINE, got {}".format(table_engine))
+        bank, statement_type, engine = table_engine_match.groups()
+        table_extraction_engines.setdefault(bank, {})[statement_type] = engine
+
+    try:
+        StatementProcessor(table_extraction_engines=table_extraction_engines)
+    except ValueError as error:
+        parser.error("--table-engine: {}".format(error))
+
+    if args.metadata_only and (args.stream or args.incremental or args.profile):
+        parser.error("--metadata-only cannot be combined with --stream, --incremental or --profile")
+
+    if args.metadata_only:
+        FinanceAnalytics().run_metadata_scan(input_dir=input_directory, output_dir=output_directory, output_fname=output_filename,
+                                             workers=workers, scan_workers=args.scan_threads, catalog_path=catalog_path)
+        sys.exit(0)
+
+    memory_ceiling_bytes = None
+    if args.max_rss_mb is not None:
+        memory_ceiling_bytes = args.max_rss_mb * 1024 * 1024
+
+    profile_path = None
+    pstats_path = None
+    if args.profile:
+        profile_path = output_directory + "/" + output_filename + ".profile.json"
+        if args.profile_stats:
+            pstats_path = output_directory + "/" + output_filename + ".pstats"
+
+    FinanceAnalytics().run(input_dir=input_directory, output_dir=output_directory, output_fname=output_filename, output_format=output_extension, workers=workers,
+                           cache_dir=cache_dir, cache_size_bytes=args.cache_size_mb * 1024 * 1024, rebuild_cache=args.rebuild_cache,
+                           incremental=args.incremental, streaming=args.stream,
+                           partition_cols=args.partition_by, profile_path=profile_path, pstats_path=pstats_path,
+                           scan_workers=args.scan_threads, catalog_path=catalog_path, page_workers=args.page_workers,
+                           pipeline=args.pipeline, queue_depth=args.queue_depth, memory_ceiling_bytes=memory_ceiling_bytes,
+                           reconciliation_policy=args.unreconciled, shard_cols=args.shard_by, shard_writers=args.shard_writers,
+                           table_extraction_engines=table_extraction_engines)
\ No newline at end of file
@@ -1,4 +1,6 @@
-from tkinter import Tk, Button, Entry, Frame, Label, ttk
+import os
+
+from tkinter import Tk, Button, Entry, Frame, Label, Spinbox, ttk
 from tkinter.filedialog import askdirectory
 
 from financeanalytics import FinanceAnalytics
@@ -10,7 +12,8 @@ class FinanceAnalyticsGUI:
         # Update status note
         self.status_label.config(text="Processing financial statements, please wait...")
 
-        FinanceAnalytics().run(input_dir=self.root_dir, output_dir=self.output_dir, gui_object=self)
+        FinanceAnalytics().run(input_dir=self.root_dir, output_dir=self.output_dir, gui_object=self,
+                               workers=int(self.spinbox_workers.get()))
 
         # Update status note
         self.status_label.config(text="Processing complete!")
@@ -79,12 +82,16 @@ class FinanceAnalyticsGUI:
         self.button_choose_out = Button(self.parametersframe, text="Choose Output Location", command=self.get_output, state="disabled", padx=7)
         self.label_root_folder = Label(self.parametersframe, text="Root Folder: ")
         self.label_output_location = Label(self.parametersframe, text="Output Location: ")
+        self.label_workers = Label(self.parametersframe, text="Worker Processes")
+        self.spinbox_workers = Spinbox(self.parametersframe, from_=1, to=os.cpu_count() or 1, width=5, state="readonly")
 
         # Place Parameters Widgets
         self.button_choose_root.grid(row=0, column=0)
         self.button_choose_out.grid(row=1, column=0)
         self.label_root_folder.grid(row=0, column=2, sticky="w")
         self.label_output_location.grid(row=1, column=2, sticky="w")
+        self.label_workers.grid(row=2, column=0)
+        self.spinbox_workers.grid(row=2, column=2, sticky="w")
 
     def _ui_startstop_setup(self):
         """Sets up the components for the user to run the processing and exit the program, including the status bar"""
@@ -0,0 +1,57 @@
+import json
+import os
+
+from pathlib import Path
+
+class OutputManifest:
+    """
+    A class used to remember which statements (and which version of each file) are already in an output file, so an
+    incremental run only extracts statements that were added or changed since the output was written.
+
+    Statements are identified by their filepath and versioned by file size and modification time.
+    """
+
+    def compare(self, filepaths):
+        """Compares the current statements against the ones recorded in the manifest
+
+        :param filepaths: Iterable of the filepaths of every statement currently in the tree
+        :return: Tuple of (list of new or changed filepaths, list of recorded filepaths no longer in the tree)
+        """
+        current_statements = {str(filepath): self._file_version(filepath) for filepath in filepaths}
+
+        new_or_changed = [filepath for filepath, version in current_statements.items()
+                          if self.statements.get(filepath) != version]
+        removed = [filepath for filepath in self.statements if filepath not in current_statements]
+
+        return new_or_changed, removed
+
+    def record(self, filepaths, output_format):
+        """Replaces the recorded statements with the given statements as written to an output of output_format"""
+        self.statements = {str(filepath): self._file_version(filepath) for filepath in filepaths}
+        self.output_format = output_format
+
+    def matches(self, output_path, output_format):
+        """Whether the manifest describes an existing output written in output_format"""
+        return self.output_format == output_format and Path(output_path).exists()
+
+    def save(self):
+        """Writes the manifest next to the output file"""
+        manifest = {"output_format": self.output_format, "statements": self.statements}
+        temporary_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        temporary_path.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+        os.replace(temporary_path, self.manifest_path)
+
+    def _file_version(self, filepath):
+        """[size, modification time] of a statement file, stored as a list to compare equal after a JSON round trip"""
+        file_stat = os.stat(filepath)
+        return [file_stat.st_size, file_stat.st_mtime_ns]
+
+    def __init__(self, manifest_path):
+        self.manifest_path = Path(manifest_path)
+        self.output_format = None
+        self.statements = {}
+
+        if self.manifest_path.exists():
+            manifest = json.loads(self.manifest_path.read_text())
+            self.output_format = manifest.get("output_format")
+            self.statements = manifest.get("statements", {})
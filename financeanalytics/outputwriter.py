@@ -0,0 +1,316 @@
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+import openpyxl
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+class CsvStatementSink:
+    """
+    A class used to stream extracted statements to a CSV file as soon as each one is validated, so the complete
+    transaction history never has to be held in memory.
+
+    Rows are written to a partial file that only replaces the output once the sink is closed successfully, so an
+    interrupted run never leaves a truncated output behind.
+    """
+
+    def write(self, statement_df):
+        """Appends the transactions of one statement, writing the header with the first statement
+
+        :param statement_df: DataFrame of the transactions of one statement tagged with its hierarchy
+        :return:
+        """
+        if self.columns is None:
+            self.columns = list(statement_df.columns)
+        elif list(statement_df.columns) != self.columns:
+            raise ValueError("Statement columns {} do not match the output columns {}".format(list(statement_df.columns), self.columns))
+
+        statement_df.to_csv(self.output_file, index=False, header=not self.header_written)
+        self.header_written = True
+        self.rows_written += statement_df.shape[0]
+
+    def close(self):
+        """Finishes the output file, replacing any previous output"""
+        self.output_file.close()
+        os.replace(self.partial_path, self.output_path)
+
+    def abort(self):
+        """Discards the partial output, keeping any previous output"""
+        self.output_file.close()
+        os.remove(self.partial_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __init__(self, output_path):
+        self.output_path = Path(output_path)
+        self.partial_path = self.output_path.with_name(self.output_path.name + ".partial")
+        self.output_file = open(self.partial_path, "w", newline="", encoding="utf-8")
+        self.columns = None
+        self.header_written = False
+        self.rows_written = 0
+
+class XlsxStatementSink:
+    """
+    A class used to stream extracted statements to an Excel workbook in constant memory.
+
+    The workbook is written with openpyxl in write only mode, so rows are streamed to the sheet files instead of being
+    held as cells of the whole workbook, and are appended in chunks of chunk_rows. A sheet holds at most
+    max_rows_per_sheet rows (the Excel limit, header included), further rows roll over to a new sheet with the same
+    header. With sheet_by columns (e.g. ["Bank", "Level 1"]) every hierarchy branch gets its own sheet(s).
+
+    Like the CsvStatementSink the workbook is written to a partial file that only replaces the output once the sink is
+    closed successfully. The rows written per second are logged when closed.
+    """
+
+    def write(self, statement_df):
+        """Appends the transactions of one statement (or any number of statements)
+
+        :param statement_df: DataFrame of the transactions tagged with their hierarchy
+        :return:
+        """
+        if self.columns is None:
+            missing_columns = [column for column in self.sheet_by or [] if column not in statement_df.columns]
+            if missing_columns:
+                raise ValueError('Sheet columns {} are not in the output'.format(missing_columns))
+            self.columns = list(statement_df.columns)
+        elif list(statement_df.columns) != self.columns:
+            raise ValueError("Statement columns {} do not match the output columns {}".format(list(statement_df.columns), self.columns))
+
+        write_start = time.perf_counter()
+
+        if self.sheet_by:
+            for sheet_key, sheet_rows in statement_df.groupby(self.sheet_by, sort=False, observed=True):
+                sheet_key = sheet_key if isinstance(sheet_key, tuple) else (sheet_key,)
+                self._append_rows(" - ".join(str(x) for x in sheet_key), sheet_rows)
+        else:
+            self._append_rows(self.default_sheet_name, statement_df)
+
+        self.rows_written += statement_df.shape[0]
+        self.write_seconds += time.perf_counter() - write_start
+
+    def close(self):
+        """Finishes the workbook, replacing any previous output"""
+        write_start = time.perf_counter()
+
+        if not self.sheets:
+            self._new_sheet(self.default_sheet_name)
+        self.workbook.save(self.partial_path)
+        os.replace(self.partial_path, self.output_path)
+
+        self.write_seconds += time.perf_counter() - write_start
+        logging.info("Wrote {} rows to {} sheet(s) of {} in {:.1f}s ({:.0f} rows/sec)".format(
+            self.rows_written, len(self.sheet_rows), self.output_path, self.write_seconds,
+            self.rows_written / max(self.write_seconds, 1e-9)))
+
+    def abort(self):
+        """Discards the partial output, keeping any previous output"""
+        self.workbook.close()
+        if self.partial_path.exists():
+            os.remove(self.partial_path)
+
+    def _append_rows(self, sheet_base_name, rows_df):
+        """Appends rows to the current sheet of a sheet name, rolling over to a new sheet once it is full"""
+        position = 0
+        while position < rows_df.shape[0]:
+            if sheet_base_name not in self.sheets or self.sheet_rows[self.sheets[sheet_base_name].title] >= self.max_rows_per_sheet:
+                self.sheets[sheet_base_name] = self._new_sheet(sheet_base_name)
+            sheet = self.sheets[sheet_base_name]
+
+            chunk = rows_df.iloc[position:position + min(self.chunk_rows, self.max_rows_per_sheet - self.sheet_rows[sheet.title])]
+            for row in self._cell_values(chunk):
+                sheet.append(row)
+
+            self.sheet_rows[sheet.title] += chunk.shape[0]
+            position += chunk.shape[0]
+
+    def _new_sheet(self, sheet_base_name):
+        """Adds a sheet with the header row, named after the base name (numbered from the second one on)"""
+        # Excel sheet names are at most 31 characters, without []:*?/\
+        sheet_base_name = re.sub(r"[\[\]:*?/\\]", "_", sheet_base_name)
+        sheet_title = sheet_base_name[:31]
+        sheet_number = 1
+        while sheet_title in self.sheet_rows:
+            sheet_number += 1
+            suffix = " ({})".format(sheet_number)
+            sheet_title = sheet_base_name[:31 - len(suffix)] + suffix
+
+        sheet = self.workbook.create_sheet(sheet_title)
+        if self.columns is not None:
+            sheet.append(self.columns)
+        self.sheet_rows[sheet_title] = 1
+
+        return sheet
+
+    def _cell_values(self, chunk):
+        """Rows of a chunk as tuples of plain cell values, missing values as empty cells"""
+        cell_values = chunk.astype(object)
+        return cell_values.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __init__(self, output_path, sheet_by=None, max_rows_per_sheet=1048576, chunk_rows=10000):
+        """
+        :param output_path: Location of the workbook
+        :param sheet_by: Columns whose values split the rows into sheets (e.g. ["Bank", "Level 1"]), one sheet if None
+        :param max_rows_per_sheet: Rows of a sheet including the header, the Excel limit by default
+        :param chunk_rows: Rows converted to cell values at a time
+        """
+        self.output_path = Path(output_path)
+        self.partial_path = self.output_path.with_name(self.output_path.name + ".partial")
+        self.sheet_by = list(sheet_by) if sheet_by else None
+        self.max_rows_per_sheet = max_rows_per_sheet
+        self.chunk_rows = chunk_rows
+        self.default_sheet_name = "Sheet1"
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.columns = None
+        # Current sheet of every sheet name, and the rows (header included) of every sheet title
+        self.sheets = {}
+        self.sheet_rows = {}
+        self.rows_written = 0
+        self.write_seconds = 0.0
+
+class ShardedOutputWriter:
+    """
+    A class used to write the transactions as one file per hierarchy branch, so every reader can open only the
+    accounts they need instead of the whole output.
+
+    The output is a folder holding a shard per combination of the shard_by column values, e.g. with ["Bank", "Level 1"]
+    the CHEQUING transactions of RBC are written to <output folder>/RBC/CHEQUING/<output name>. The shards are written
+    by a pool of writer processes (formatting rows as CSV or Excel cells is CPU bound). An index file lists every
+    shard with its hierarchy values, row count and first and last transaction date.
+
+    Like the statement sinks the folder is written next to the output and only replaces it once every shard and the
+    index are written.
+    """
+
+    def write(self, statements_df):
+        """Writes the transactions to their shards and the index
+
+        :param statements_df: DataFrame of the transactions in the output layout (amounts in dollars), typed for
+            Parquet if the output is Parquet
+        :return: List of the shard records of the index
+        """
+        missing_columns = [column for column in self.shard_by if column not in statements_df.columns]
+        if not self.shard_by:
+            raise ValueError('No shard columns given')
+        if missing_columns:
+            raise ValueError('Shard columns {} are not in the output'.format(missing_columns))
+
+        write_start = time.perf_counter()
+        self._remove_output(self.partial_path)
+        self.partial_path.mkdir(parents=True)
+
+        # Shards in the order their first transaction appears, keeping the order of the transactions within a shard
+        shard_records = []
+        shard_jobs = []
+        for shard_key, shard_df in statements_df.groupby(self.shard_by, sort=False, observed=True, dropna=False):
+            shard_record = self._shard_record(shard_key, shard_df)
+            shard_records.append(shard_record)
+            shard_jobs.append((shard_df.reset_index(drop=True), self.partial_path / shard_record["path"]))
+
+        try:
+            if self.writers > 1 and len(shard_jobs) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.writers, len(shard_jobs))) as executor:
+                    for shard_future in [executor.submit(self._write_shard, *shard_job) for shard_job in shard_jobs]:
+                        shard_future.result()
+            else:
+                for shard_job in shard_jobs:
+                    self._write_shard(*shard_job)
+
+            index = {"output_format": self.output_format, "shard_by": self.shard_by, "shards": shard_records}
+            (self.partial_path / self.index_name).write_text(json.dumps(index, indent=1))
+        except BaseException:
+            self._remove_output(self.partial_path)
+            raise
+
+        self._remove_output(self.output_path)
+        os.replace(self.partial_path, self.output_path)
+
+        write_seconds = time.perf_counter() - write_start
+        logging.info("Wrote {} rows to {} shard(s) of {} in {:.1f}s ({:.0f} rows/sec)".format(
+            statements_df.shape[0], len(shard_records), self.output_path, write_seconds,
+            statements_df.shape[0] / max(write_seconds, 1e-9)))
+
+        return shard_records
+
+    def shard_paths(self):
+        """Paths of every shard listed in the index of an existing sharded output"""
+        index = json.loads((self.output_path / self.index_name).read_text())
+        return [self.output_path / shard_record["path"] for shard_record in index["shards"]]
+
+    def is_sharded(self):
+        """Whether the output is an existing sharded output"""
+        return (self.output_path / self.index_name).exists()
+
+    def _shard_record(self, shard_key, shard_df):
+        """Index record of a shard: its path relative to the output folder, hierarchy values, row count and date range"""
+        shard_key = shard_key if isinstance(shard_key, tuple) else (shard_key,)
+        shard_values = [str(x) for x in shard_key]
+        shard_dates = pd.to_datetime(shard_df[self.date_column])
+
+        return {
+            "path": "/".join(shard_values + [self.output_path.name]),
+            "values": dict(zip(self.shard_by, shard_values)),
+            "rows": shard_df.shape[0],
+            "first_date": self._iso_date(shard_dates.min()),
+            "last_date": self._iso_date(shard_dates.max()),
+        }
+
+    def _write_shard(self, shard_df, shard_path):
+        """Writes the transactions of one shard (run in a writer process)"""
+        shard_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.output_format == "xlsx":
+            with XlsxStatementSink(shard_path) as statement_sink:
+                statement_sink.write(shard_df)
+        elif self.output_format == "csv":
+            shard_df.to_csv(shard_path, index=False)
+        elif self.output_format == "parquet":
+            shard_df.to_parquet(shard_path, index=False)
+        else:
+            raise ValueError('Import write format specified')
+
+    def _iso_date(self, date):
+        """ISO date of a timestamp, None if there is no date"""
+        return None if pd.isna(date) else date.strftime('%Y-%m-%d')
+
+    def _remove_output(self, output_path):
+        """Removes an output file or folder if it exists"""
+        if output_path.is_dir():
+            shutil.rmtree(output_path)
+        elif output_path.exists():
+            output_path.unlink()
+
+    def __init__(self, output_path, output_format, shard_by=None, writers=1):
+        """
+        :param output_path: Location of the output folder, shards are named after it
+        :param output_format: Format of the shards: "csv", "xlsx" or "parquet"
+        :param shard_by: Columns whose values split the transactions into shards (e.g. ["Bank", "Level 1"])
+        :param writers: Writer processes writing shards in parallel
+        """
+        self.output_path = Path(output_path)
+        self.partial_path = self.output_path.with_name(self.output_path.name + ".partial")
+        self.output_format = output_format
+        self.shard_by = list(shard_by) if shard_by else []
+        self.writers = writers
+        self.index_name = "index.json"
+        self.date_column = "Date"
@@ -0,0 +1,164 @@
+import contextlib
+import cProfile
+import json
+import os
+import re
+import time
+
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, worker CPU time and the peak memory fallback are then not reported
+    resource = None
+
+class RunProfiler:
+    """
+    A class used to profile a Finance Analytics run, recording the wall time, CPU time and peak memory of every stage
+    and the time each statement spends in metadata parsing, table extraction and standardization, along with the
+    pages skipped by the page screen before table extraction.
+
+    CPU time covers the main process plus any worker processes that finished during the stage. Peak memory is the
+    peak resident set size of the main process during the stage (Linux), or the peak of the whole process so far
+    elsewhere. Every statement also reports the peak memory of the process that extracted it, and the statements with
+    the highest peaks are listed. The report is written as JSON, optionally along with a pstats dump of the main process.
+    """
+
+    @contextlib.contextmanager
+    def stage(self, stage_name):
+        """Context manager recording the wall time, CPU time and peak memory of a run stage"""
+        peak_reset = self.reset_peak_memory()
+        statement_start = len(self.statements)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        worker_cpu_start = self._worker_cpu_seconds()
+
+        try:
+            yield
+        finally:
+            # Statements extracted in this process reset the peak for their own reading, so their peaks count too
+            peak_memory = [self.peak_memory_bytes()] + [x.get("peak_memory_bytes") for x in self.statements[statement_start:]
+                                                        if x.get("process_id") == os.getpid()]
+            stage_profile = {
+                "stage": stage_name,
+                "wall_seconds": time.perf_counter() - wall_start,
+                "cpu_seconds": time.process_time() - cpu_start,
+                "peak_memory_bytes": max((x for x in peak_memory if x is not None), default=None),
+                "peak_memory_scope": "stage" if peak_reset else "process",
+            }
+            worker_cpu_end = self._worker_cpu_seconds()
+            if worker_cpu_start is not None and worker_cpu_end is not None:
+                stage_profile["worker_cpu_seconds"] = worker_cpu_end - worker_cpu_start
+            self.stages.append(stage_profile)
+
+    def record_statement(self, statement_profile):
+        """Adds the profile of one extracted statement (see FinanceAnalytics._profile_single_statement)"""
+        self.statements.append(statement_profile)
+
+    def record_pipeline(self, pipeline_report):
+        """Adds the queue occupancy and stage utilization of the statement pipeline (see StatementPipeline.run)"""
+        self.pipeline = pipeline_report
+
+    def start(self):
+        """Starts the run clock, and the function level profiler if a pstats dump was requested"""
+        self.run_start = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        """Stops the run clock and the function level profiler"""
+        self.run_seconds = time.perf_counter() - self.run_start
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def report(self):
+        """Builds the report: the run stages, every statement and the slowest statements
+
+        :return: Dictionary ready to be serialized as JSON
+        """
+        stage_totals = {}
+        for statement_profile in self.statements:
+            for stage_name, timings in statement_profile["stages"].items():
+                totals = stage_totals.setdefault(stage_name, {"wall_seconds": 0.0, "cpu_seconds": 0.0})
+                totals["wall_seconds"] += timings["wall_seconds"]
+                totals["cpu_seconds"] += timings["cpu_seconds"]
+
+        # Pages skipped before table extraction and pages only dropped after it, see StatementProcessor.page_screening
+        page_screening_totals = {}
+        for statement_profile in self.statements:
+            for count_name, count in statement_profile.get("page_screening", {}).items():
+                page_screening_totals[count_name] = page_screening_totals.get(count_name, 0) + count
+
+        slowest_statements = sorted(self.statements, key=lambda x: x["wall_seconds"], reverse=True)[:self.slowest_statements]
+        largest_statements = sorted(self.statements, key=lambda x: x.get("peak_memory_bytes") or 0, reverse=True)[:self.slowest_statements]
+
+        return {
+            "run_seconds": self.run_seconds,
+            "stages": self.stages,
+            "statement_stage_totals": stage_totals,
+            "page_screening_totals": page_screening_totals,
+            "slowest_statements": [statement_profile["Filepath"] for statement_profile in slowest_statements],
+            "highest_peak_memory_statements": [statement_profile["Filepath"] for statement_profile in largest_statements],
+            "pipeline": self.pipeline,
+            "statements": self.statements,
+        }
+
+    def save(self, report_path, pstats_path=None):
+        """Writes the JSON report, and the pstats dump if the function level profiler was enabled"""
+        Path(report_path).write_text(json.dumps(self.report(), indent=1))
+        if self.profiler is not None and pstats_path is not None:
+            self.profiler.dump_stats(pstats_path)
+
+    def reset_peak_memory(self):
+        """Resets the peak resident set size of the process so it can be read per stage, only possible on Linux"""
+        try:
+            with open("/proc/self/clear_refs", "w") as clear_refs:
+                clear_refs.write("5")
+            return True
+        except OSError:
+            return False
+
+    def peak_memory_bytes(self):
+        """Peak resident set size of the process since the last reset (Linux) or since it started"""
+        peak_memory = self._process_status_bytes("VmHWM")
+        if peak_memory is not None:
+            return peak_memory
+
+        if resource is None:
+            return None
+
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+
+    def current_memory_bytes(self):
+        """Current resident set size of the process (Linux), or its peak so far where it can not be read"""
+        current_memory = self._process_status_bytes("VmRSS")
+        if current_memory is not None:
+            return current_memory
+        return self.peak_memory_bytes()
+
+    def _process_status_bytes(self, field_name):
+        """Memory field (in kB) of /proc/self/status in bytes, None where it is not available"""
+        try:
+            with open("/proc/self/status") as status:
+                return int(re.search(field_name + r":\s+(\d+) kB", status.read()).group(1)) * 1024
+        except (OSError, AttributeError):
+            return None
+
+    def _worker_cpu_seconds(self):
+        """CPU time of all finished worker processes"""
+        if resource is None:
+            return None
+        worker_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return worker_usage.ru_utime + worker_usage.ru_stime
+
+    def __init__(self, function_profile=False):
+        self.stages = []
+        self.statements = []
+        self.run_start = None
+        self.run_seconds = None
+        self.slowest_statements = 10
+        self.pipeline = None
+        self.profiler = cProfile.Profile() if function_profile else None
@@ -0,0 +1,169 @@
+import asyncio
+import contextlib
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+class StatementPipeline:
+    """
+    A class used to extract statements through an asyncio producer/consumer pipeline, overlapping the reading of the
+    statement files, the parsing and the writing of the output.
+
+    A read stage loads the statement files on a thread, a parse stage extracts them on a process pool (or a thread
+    with a single worker) and a write stage hands the results to the output in statement order on its own thread. The
+    stages are connected by bounded queues, and at most queue_depth statements per queue plus one per parser are in
+    flight at a time (including results waiting for an earlier statement), so memory is bounded by the queue depth and
+    not by the number of statements.
+
+    The occupancy of every queue and the utilization of every stage are reported once the pipeline is done.
+    """
+
+    def run(self, records, parse_statement, write_statement, statement_written=None):
+        """Runs every statement through the pipeline
+
+        :param records: Statement records (with a Filepath) in output order
+        :param parse_statement: Picklable function (record, pdf_contents) returning the extraction result
+        :param write_statement: Function (position, extraction result) writing a result, called in record order
+        :param statement_written: Function called without arguments once each statement is written, on the thread
+            running the pipeline (e.g. to update a progress bar)
+        :return: Dictionary report of the queue occupancy and stage utilization
+        """
+        return asyncio.run(self._run_pipeline(list(records), parse_statement, write_statement, statement_written))
+
+    async def _run_pipeline(self, records, parse_statement, write_statement, statement_written=None):
+        self.read_queue = self._monitored_queue("read")
+        self.parsed_queue = self._monitored_queue("parsed")
+        self.in_flight = asyncio.Semaphore(2 * self.queue_depth + self.workers)
+
+        read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="statement-read")
+        write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="statement-write")
+        if self.workers > 1:
+            parse_executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            parse_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="statement-parse")
+
+        pipeline_start = time.perf_counter()
+        stages = [self._read_stage(records, read_executor)]
+        stages += [self._parse_stage(parse_statement, parse_executor) for _ in range(self.workers)]
+        stages += [self._write_stage(len(records), write_statement, write_executor, statement_written)]
+        stage_tasks = [asyncio.ensure_future(stage) for stage in stages]
+
+        try:
+            # The first failing stage stops the others, so a failed statement does not leave the pipeline waiting
+            await asyncio.gather(*stage_tasks)
+        finally:
+            for stage_task in stage_tasks:
+                stage_task.cancel()
+            await asyncio.gather(*stage_tasks, return_exceptions=True)
+            for executor in (read_executor, parse_executor, write_executor):
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        return self._report(time.perf_counter() - pipeline_start)
+
+    async def _read_stage(self, records, read_executor):
+        """Reads the statement files ahead of the parsers, as far as the in flight limit allows"""
+        loop = asyncio.get_running_loop()
+        for position, record in enumerate(records):
+            await self.in_flight.acquire()
+            with self._busy("read"):
+                pdf_contents = await loop.run_in_executor(read_executor, Path(record["Filepath"]).read_bytes)
+            await self._put(self.read_queue, (position, record, pdf_contents))
+
+        # One end marker per parser
+        for _ in range(self.workers):
+            await self._put(self.read_queue, None)
+
+    async def _parse_stage(self, parse_statement, parse_executor):
+        """Parses statements from the read queue until the end marker"""
+        loop = asyncio.get_running_loop()
+        while True:
+            read_statement = await self._get(self.read_queue)
+            if read_statement is None:
+                break
+
+            position, record, pdf_contents = read_statement
+            with self._busy("parse"):
+                result = await loop.run_in_executor(parse_executor, parse_statement, record, pdf_contents)
+            await self._put(self.parsed_queue, (position, result))
+
+    async def _write_stage(self, statement_count, write_statement, write_executor, statement_written=None):
+        """Writes the parsed statements in record order, holding back those parsed before an earlier statement"""
+        loop = asyncio.get_running_loop()
+        waiting_results = {}
+        next_position = 0
+        while next_position < statement_count:
+            position, result = await self._get(self.parsed_queue)
+            waiting_results[position] = result
+
+            while next_position in waiting_results:
+                with self._busy("write"):
+                    await loop.run_in_executor(write_executor, write_statement, next_position, waiting_results.pop(next_position))
+                next_position += 1
+                self.in_flight.release()
+                if statement_written is not None:
+                    statement_written()
+
+    def _monitored_queue(self, queue_name):
+        """Bounded queue whose occupancy is tracked over time"""
+        queue = asyncio.Queue(maxsize=self.queue_depth)
+        queue.name = queue_name
+        self.queue_occupancy[queue_name] = {"depth": self.queue_depth, "occupied_seconds": 0.0, "max_occupancy": 0,
+                                            "last_change": time.perf_counter()}
+        return queue
+
+    async def _put(self, queue, item):
+        await queue.put(item)
+        self._record_occupancy(queue, -1)
+
+    async def _get(self, queue):
+        item = await queue.get()
+        self._record_occupancy(queue, +1)
+        return item
+
+    def _record_occupancy(self, queue, change):
+        """Accumulates the time weighted occupancy of a queue, the size before the last change was (size + change)"""
+        occupancy = self.queue_occupancy[queue.name]
+        now = time.perf_counter()
+        occupancy["occupied_seconds"] += (queue.qsize() + change) * (now - occupancy["last_change"])
+        occupancy["max_occupancy"] = max(occupancy["max_occupancy"], queue.qsize())
+        occupancy["last_change"] = now
+
+    @contextlib.contextmanager
+    def _busy(self, stage_name):
+        """Context manager adding the time spent inside it to the busy time of a stage"""
+        busy_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_busy_seconds[stage_name] = self.stage_busy_seconds.get(stage_name, 0.0) + time.perf_counter() - busy_start
+
+    def _report(self, pipeline_seconds):
+        """Average and maximum occupancy of every queue, and the share of the run every stage was busy"""
+        stage_workers = {"read": 1, "parse": self.workers, "write": 1}
+
+        return {
+            "pipeline_seconds": pipeline_seconds,
+            "queues": {queue_name: {"depth": occupancy["depth"],
+                                    "average_occupancy": occupancy["occupied_seconds"] / pipeline_seconds if pipeline_seconds else 0.0,
+                                    "max_occupancy": occupancy["max_occupancy"]}
+                       for queue_name, occupancy in self.queue_occupancy.items()},
+            "stages": {stage_name: {"workers": stage_workers[stage_name],
+                                    "busy_seconds": self.stage_busy_seconds.get(stage_name, 0.0),
+                                    "utilization": (self.stage_busy_seconds.get(stage_name, 0.0) / (pipeline_seconds * stage_workers[stage_name])
+                                                    if pipeline_seconds else 0.0)}
+                       for stage_name in stage_workers},
+        }
+
+    def __init__(self, workers=1, queue_depth=8):
+        """
+        :param workers: Parsers running in parallel, on a process pool when more than 1
+        :param queue_depth: Statements each queue holds before the stage feeding it waits
+        """
+        if workers < 1 or queue_depth < 1:
+            raise ValueError("A statement pipeline needs at least 1 worker and a queue depth of at least 1")
+
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.queue_occupancy = {}
+        self.stage_busy_seconds = {}
@@ -1,10 +1,432 @@
+import bisect
+import contextlib
 import datetime
+import hashlib
+import itertools
+import json
 import logging
 import pdfplumber
 import re
+import time
+import types
 import numpy as np
 import pandas as pd
 
+from concurrent.futures import ProcessPoolExecutor
+from pdfplumber import utils as pdfplumber_utils
+
+class StatementDocument:
+    """
+    A Bank statement PDF opened once and shared by every extraction step (metadata and transactions) for the statement.
+
+    pdfplumber caches the parsed layout on each page, so the first page parsed for the metadata is reused by the table
+    extraction. Pages are released (see release_page) once their table has been taken, and the document is used as a
+    context manager so the file handle and remaining parsed pages are released as soon as the statement is done.
+    """
+
+    def first_page_text(self):
+        """Text of the first page, extracted once per document"""
+        if self._first_page_text is None:
+            self._first_page_text = self.pages[0].extract_text()
+        return self._first_page_text
+
+    @property
+    def pages(self):
+        return self.pdf.pages
+
+    def release_page(self, page_index):
+        """Drops the parsed layout and objects cached on a page, so a long statement holds one parsed page at a time"""
+        self.pages[page_index].flush_cache()
+
+    def close(self):
+        """Releases the parsed pages and the underlying file handle
+
+        Page.extract_text caches the text layout of the last 128 pages of any document (an lru_cache on the Page
+        class), which would keep those pages and their parsed objects alive long after their statement is closed.
+        """
+        self.pdf.close()
+        pdfplumber.page.Page.get_text_layout.cache_clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __init__(self, pdf_filepath):
+        self.pdf_filepath = pdf_filepath
+        self.pdf = pdfplumber.open(pdf_filepath)
+        self._first_page_text = None
+
+class ExplicitColumnTableExtractor:
+    """
+    A table extractor for pages whose columns are given as explicit vertical lines, bucketing the words of the page
+    into the fixed columns and into the rows bounded by the page lines (horizontal_strategy "lines") or by the rows of
+    words (horizontal_strategy "text").
+
+    Only the edges and words of the page are used, not pdfplumber's table finder. For the statement templates the rows
+    are the same as pdfplumber's Page.extract_table with the same table settings (see the "compare" table extraction
+    engine), without its search for the cells between every intersection of the page.
+    """
+
+    def extract_table(self, page):
+        """Extracts the table of the page between the explicit column lines
+
+        :param page: pdfplumber page (or cropped page)
+        :return: List of rows, each a list of cell texts ("" for an empty cell), or None if the page has no table rows
+        """
+
+        words = page.extract_words(x_tolerance=self.text_x_tolerance, y_tolerance=self.text_y_tolerance,
+                                   keep_blank_chars=self.keep_blank_chars)
+
+        if self.horizontal_strategy == "lines":
+            row_lines = self._row_lines_from_edges(page.horizontal_edges)
+        else:
+            row_lines = self._row_lines_from_words(words)
+
+        if len(row_lines) < 2:
+            return None
+
+        # Every word goes to the row and column holding its midpoint
+        cells = [[[] for _ in self.column_lines[1:]] for _ in row_lines[1:]]
+        for word in words:
+            column_idx = bisect.bisect_right(self.column_lines, (word["x0"] + word["x1"]) / 2) - 1
+            row_idx = bisect.bisect_right(row_lines, (word["top"] + word["bottom"]) / 2) - 1
+            if 0 <= column_idx < len(self.column_lines) - 1 and 0 <= row_idx < len(row_lines) - 1:
+                cells[row_idx][column_idx].append(word)
+
+        return [[self._cell_text(cell_words) for cell_words in row] for row in cells]
+
+    def _row_lines_from_edges(self, h_edges):
+        """Tops of the horizontal page lines crossing at least two column lines (bounding a row of cells)"""
+        tolerance = self.intersection_x_tolerance
+        return self._snap([edge["top"] for edge in h_edges
+                           if sum(edge["x0"] - tolerance <= x <= edge["x1"] + tolerance for x in self.column_lines) >= 2])
+
+    def _row_lines_from_words(self, words):
+        """Top and bottom of every row of words, words whose tops are within word_row_tolerance being on the same row"""
+        word_rows = []
+        for word in sorted(words, key=lambda x: x["top"]):
+            if word_rows and word["top"] - word_rows[-1][-1]["top"] <= self.word_row_tolerance:
+                word_rows[-1].append(word)
+            else:
+                word_rows.append([word])
+
+        return self._snap([bound for row in word_rows
+                           for bound in (min(word["top"] for word in row), max(word["bottom"] for word in row))])
+
+    def _snap(self, row_lines):
+        """Sorted row lines, lines within snap_y_tolerance of each other merged into their mean"""
+        clusters = []
+        for row_line in sorted(row_lines):
+            if clusters and row_line - clusters[-1][-1] <= self.snap_y_tolerance:
+                clusters[-1].append(row_line)
+            else:
+                clusters.append([row_line])
+
+        return [sum(cluster) / len(cluster) for cluster in clusters]
+
+    def _cell_text(self, words):
+        """Words of a cell joined by spaces into lines (tops within text_y_tolerance), the lines joined by newlines"""
+        lines = []
+        for word in sorted(words, key=lambda x: x["top"]):
+            if lines and word["top"] - lines[-1][-1]["top"] <= self.text_y_tolerance:
+                lines[-1].append(word)
+            else:
+                lines.append([word])
+
+        return "\n".join(" ".join(word["text"] for word in sorted(line, key=lambda x: x["x0"])) for line in lines)
+
+    def __init__(self, table_settings):
+        """
+        :param table_settings: pdfplumber table settings with explicit vertical lines, tolerances missing from them
+            take pdfplumber's defaults
+        """
+        self.horizontal_strategy = table_settings.get("horizontal_strategy", "lines")
+
+        if table_settings.get("vertical_strategy", "lines") != "explicit" or self.horizontal_strategy not in ("lines", "text"):
+            raise ValueError("Explicit column extraction needs explicit vertical lines and lines or text rows, got {}"
+                             .format(dict(table_settings)))
+
+        column_lines = table_settings.get("explicit_vertical_lines", [])
+        if not all(isinstance(x, (int, float)) for x in column_lines):
+            raise ValueError("Explicit column extraction needs the vertical lines as x positions, got {}"
+                             .format(column_lines))
+
+        self.column_lines = sorted(column_lines)
+
+        # Row lines this close (points) are merged, and page lines must reach this close to a column line to cross it
+        self.snap_y_tolerance = table_settings.get("snap_y_tolerance", table_settings.get("snap_tolerance", 3))
+        self.intersection_x_tolerance = table_settings.get("intersection_x_tolerance",
+                                                           table_settings.get("intersection_tolerance", 3))
+
+        # Characters are grouped into words (and words into lines) within these distances (points)
+        self.text_x_tolerance = table_settings.get("text_x_tolerance", 3)
+        self.text_y_tolerance = table_settings.get("text_y_tolerance", 3)
+        self.keep_blank_chars = table_settings.get("keep_blank_chars", False)
+
+        # Words whose tops are within this distance (points) are on the same row of the "text" strategy
+        self.word_row_tolerance = 1
+
+class PageLayoutCalibration:
+    """
+    Checks the explicit column lines of a page table against the table header of the page, and moves them when the
+    header no longer fits between them.
+
+    Every header word, along with the words following it on the header row (e.g. "Withdrawals ($)"), spans the header
+    of its column. Column lines bracketing every column header (no line crossing a header, each header between the
+    lines of its own column) are used as they are, so the hand tuned settings only change for pages they no longer fit.
+    Otherwise (e.g. the Bank moving the table a few points) the column lines are moved together, to the middle of the
+    range of shifts bracketing the header again, with a warning. A header no shift can bracket keeps the settings as
+    they are, also with a warning.
+    """
+
+    def table_settings(self, page, table_settings, calibrations):
+        """Table settings for the layout of a page, calibrated only if their column lines do not bracket its header
+
+        :param page: pdfplumber page (or cropped page) holding the table
+        :param table_settings: Table settings chosen for the page by the template
+        :param calibrations: Dictionary of calibrated column lines (None when left as they are) by header layout and
+            column lines, owned by the caller so every layout is only checked (and warned about) once per process
+        :return: Table settings, the given ones if the page has no table header to check
+        """
+        fingerprint = self.fingerprint(page)
+        if fingerprint is None:
+            return table_settings
+
+        column_lines = tuple(table_settings["explicit_vertical_lines"])
+        if (fingerprint, column_lines) not in calibrations:
+            calibrations[(fingerprint, column_lines)] = self._calibrate(fingerprint, column_lines)
+
+        calibrated_lines = calibrations[(fingerprint, column_lines)]
+        if calibrated_lines is None:
+            return table_settings
+
+        return dict(table_settings, explicit_vertical_lines=list(calibrated_lines))
+
+    def fingerprint(self, page):
+        """Extent (x0, x1 rounded to the point) of every column header of the page table, in header_words order
+
+        The header row is found from the occurrences of the first header word in the page text, only the characters on
+        the same line are grouped into words. A column header runs from its header word to the last word before the
+        next header word.
+
+        :return: Tuple of (x0, x1) tuples, or None if no line of the page holds every header word
+        """
+        chars = page.chars
+        page_text = "".join(char["text"] for char in chars)
+        if len(page_text) != len(chars):
+            # Multi character glyphs (ligatures), the text positions no longer match the characters
+            return None
+
+        header_start = page_text.find(self.header_words[0])
+        while header_start >= 0:
+            header_top = chars[header_start]["top"]
+            header_chars = [char for char in chars if abs(char["top"] - header_top) <= self.row_tolerance]
+
+            column_headers = {}
+            current_header = None
+            for word in sorted(pdfplumber_utils.extract_words(header_chars), key=lambda x: x["x0"]):
+                if word["text"] in self.header_words and word["text"] not in column_headers:
+                    current_header = word["text"]
+                    column_headers[current_header] = [word["x0"], word["x1"]]
+                elif current_header is not None:
+                    column_headers[current_header][1] = max(column_headers[current_header][1], word["x1"])
+
+            if all(header_word in column_headers for header_word in self.header_words):
+                return tuple((round(column_headers[header_word][0]), round(column_headers[header_word][1]))
+                             for header_word in self.header_words)
+
+            header_start = page_text.find(self.header_words[0], header_start + 1)
+
+        return None
+
+    def settings(self):
+        """Header words, in plain JSON types"""
+        return {"header_words": list(self.header_words)}
+
+    def _calibrate(self, fingerprint, column_lines):
+        """Column lines moved to bracket the column headers of a page layout
+
+        :return: Tuple of the moved column lines, or None if the lines already bracket the headers (or cannot)
+        """
+        if len(column_lines) != len(fingerprint) + 1:
+            logging.warning("{} column lines cannot bracket {} column headers, table settings left as they are".format(
+                len(column_lines), len(fingerprint)))
+            return None
+
+        header_edges = np.array(fingerprint, dtype=float)
+        lines = np.array(column_lines, dtype=float)
+
+        # Every column line must be right of the column header before it and left of the column header after it
+        lowest_shift = (np.append(-np.inf, header_edges[:, 1]) - lines).max()
+        highest_shift = (np.append(header_edges[:, 0], np.inf) - lines).min()
+
+        if lowest_shift <= 0 <= highest_shift:
+            return None
+
+        if lowest_shift > highest_shift:
+            logging.warning("Column lines {} cannot be moved to bracket the page table header {}, table settings left "
+                            "as they are".format(list(column_lines), fingerprint))
+            return None
+
+        calibrated_lines = tuple((lines + (lowest_shift + highest_shift) / 2).tolist())
+        logging.warning("Column lines {} do not bracket the page table header {}, calibrated to {}".format(
+            list(column_lines), fingerprint, list(calibrated_lines)))
+
+        return calibrated_lines
+
+    def __init__(self, header_words):
+        """
+        :param header_words: Words of the table header row, one per column in column order
+        """
+        self.header_words = tuple(header_words)
+
+        # Characters within this distance (points) of the top of the first header word are on the header row
+        self.row_tolerance = 1
+
+class StatementTemplate:
+    """
+    The parsing settings of one Bank-Product statement layout: the metadata regexes (compiled once), the raw table
+    columns and their mapping to the standard columns, the page crop bounds and table settings, and the functions
+    extracting and standardizing its transactions.
+
+    Templates are built once per process in a StatementTemplateRegistry and shared by every StatementProcessor, so
+    their settings are frozen (read only mappings and tuples). Templates whose page layout can move are given a
+    PageLayoutCalibration, checking the table settings of each page against its header. The functions take the
+    StatementProcessor as their first argument, so its methods can be used directly:
+    - extract_transactions(statement_processor, document, statement_template): raw transaction DataFrame of the statement
+    - extract_page(statement_processor, page, page_index, statement_template): raw DataFrame of a page table, or None
+    - standardize_transactions(statement_processor, raw_transactions, year_of_last_transaction, statement_template):
+      standard DataFrame
+    Every function is given the template it is called for and reads its settings from it, so a template of another
+    Bank-Product can reuse the functions with its own settings.
+    """
+
+    def extract_metadata(self, first_page_text):
+        """Extracts the ending transaction year, starting balance, and ending balance from the first page text
+
+        A statement without a starting balance is likely the opening of a new account, its starting balance is 0
+
+        :param first_page_text: Text of the first page of the statement
+        :return: Tuple of (year, starting_balance, ending_balance)
+        """
+
+        year_of_last_transaction = int(self.metadata_patterns['last_transaction_date'].search(first_page_text).groups()[-1])
+
+        try:
+            starting_balance = self._parse_balance(self.metadata_patterns['starting_balance'].search(first_page_text))
+        except (AttributeError, ValueError):
+            starting_balance = float(0)
+
+        ending_balance = self._parse_balance(self.metadata_patterns['ending_balance'].search(first_page_text))
+
+        return (year_of_last_transaction, starting_balance, ending_balance)
+
+    def settings(self):
+        """Every setting of the template that affects the extracted output, in plain JSON types"""
+        return {
+            "metadata_patterns": {name: pattern.pattern for name, pattern in self.metadata_patterns.items()},
+            "column_mapping": dict(self.column_mapping),
+            "columns": list(self.columns),
+            "page_settings": {name: self._thaw(value) for name, value in self.page_settings.items()},
+            "layout_calibration": None if self.layout_calibration is None else self.layout_calibration.settings(),
+        }
+
+    def _parse_balance(self, balance_match):
+        """Balance of a metadata match, e.g. '-$1,234.56' to -1234.56"""
+        return float(balance_match.groups()[-1].replace("$", "").replace(",", ""))
+
+    def _freeze(self, value):
+        """Read only copy of a setting, dictionaries to mappings and lists to tuples"""
+        if isinstance(value, dict):
+            return types.MappingProxyType({key: self._freeze(x) for key, x in value.items()})
+        elif isinstance(value, (list, tuple)):
+            return tuple(self._freeze(x) for x in value)
+        return value
+
+    def _thaw(self, value):
+        """Plain dictionary and list copy of a frozen setting, as pdfplumber and JSON expect"""
+        if isinstance(value, types.MappingProxyType):
+            return {key: self._thaw(x) for key, x in value.items()}
+        elif isinstance(value, tuple):
+            return [self._thaw(x) for x in value]
+        return value
+
+    def __init__(self, bank, statement_type, metadata_patterns, column_mapping, columns, page_settings,
+                 extract_transactions, extract_page, standardize_transactions, layout_calibration=None):
+        """
+        :param bank: The Bank the statements come from
+        :param statement_type: The type of statement (Chequing, Visa)
+        :param metadata_patterns: Regexes of the first page text for 'last_transaction_date', 'starting_balance' and
+            'ending_balance', the balance or year is the last group of the match
+        :param column_mapping: Mapping of the raw table columns to the standard columns (Date, Description, Amount)
+        :param columns: Columns of the raw page tables
+        :param page_settings: Named page crop bounds and pdfplumber table settings used by extract_page
+        :param layout_calibration: PageLayoutCalibration of the page tables, None if the layout is fixed
+        """
+        self.bank = bank
+        self.statement_type = statement_type
+        self.metadata_patterns = types.MappingProxyType({name: re.compile(pattern) for name, pattern in metadata_patterns.items()})
+        self.column_mapping = self._freeze(column_mapping)
+        self.columns = self._freeze(columns)
+        self.page_settings = self._freeze(page_settings)
+        self.extract_transactions = extract_transactions
+        self.extract_page = extract_page
+        self.standardize_transactions = standardize_transactions
+        self.layout_calibration = layout_calibration
+
+class StatementTemplateRegistry:
+    """
+    A class holding the StatementTemplate of every supported Bank-Product.
+
+    New Bank-Products are supported by registering their template, without changes to the StatementProcessor. The
+    registry in this module (statement_templates) is built once when the module is imported, so every process
+    (including the extraction workers) builds the templates once. Templates registered at run time are only seen by
+    worker processes forked after the registration.
+    """
+
+    def register(self, statement_template):
+        """Adds (or replaces) the template of a Bank-Product"""
+        self.templates[(statement_template.bank, statement_template.statement_type)] = statement_template
+        self._fingerprint = None
+
+    def unregister(self, bank, statement_type):
+        """Removes the template of a Bank-Product"""
+        del self.templates[(bank, statement_type)]
+        self._fingerprint = None
+
+    def template(self, bank, statement_type):
+        """Template of a Bank-Product
+
+        :return: StatementTemplate
+        """
+        try:
+            return self.templates[(bank, statement_type)]
+        except KeyError:
+            raise ValueError("No statement template registered for {} {} statements".format(bank, statement_type))
+
+    def by_bank(self, attribute_name):
+        """Nested dictionary of a template attribute, e.g. {"RBC": {"Chequing": ..., "Visa": ...}}"""
+        attributes = {}
+        for (bank, statement_type), statement_template in self.templates.items():
+            attributes.setdefault(bank, {})[statement_type] = getattr(statement_template, attribute_name)
+        return attributes
+
+    def fingerprint(self):
+        """Fingerprint of the settings of every registered template, computed once per registration
+
+        :return: Hex digest string
+        """
+        if self._fingerprint is None:
+            template_settings = {"{} {}".format(*key): x.settings() for key, x in self.templates.items()}
+            self._fingerprint = hashlib.sha256(json.dumps(template_settings, sort_keys=True).encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    def __init__(self):
+        self.templates = {}
+        self._fingerprint = None
+
 class StatementProcessor:
     """
     A class used to actually convert Bank pdf statements to text for downstream processing.
@@ -20,28 +442,77 @@ class StatementProcessor:
         This function is applied to one statement and does not aggregate across statements, to be performed by a
         separate function.
 
-        :param pdf_filepath:The path to the file for loading
+        :param pdf_filepath:The path to the file for loading (or an already open StatementDocument)
         :param bank: The Bank the statement comes from
         :param statement_type: The type of statement (Chequing, Visa)
         :return: DataFrame of the transaction listing
         """
 
-        # Extract the metadata
-        (year_of_last_transaction, opening_balance, closing_balance) = self.extract_statement_metadata(pdf_filepath, bank, statement_type)
-
-        # Extract the transactions
-        if bank == "RBC":
-            if statement_type == "Chequing":
-                transactions = self.standardized_rbc_chequing_transactions(self.extract_rbc_chequing_statement(pdf_filepath), year_of_last_transaction)
-            elif statement_type == "Visa":
-                transactions = self.standardized_rbc_visa_transactions(self.extract_rbc_visa_statement(pdf_filepath), year_of_last_transaction)
+        transactions, (year_of_last_transaction, opening_balance, closing_balance) = self.extract_with_metadata(pdf_filepath, bank, statement_type)
 
         # Validate the transactions
-        self.validate_transactions(transactions, opening_balance, closing_balance)
+        with self._time_stage("validation"):
+            if not self.validate_transactions(transactions, opening_balance, closing_balance):
+                logging.warning("Transactions of {} do not reconcile with its opening balance {} and closing balance {}"
+                                .format(pdf_filepath, opening_balance, closing_balance))
 
-        # Return the transactions if validated
         return transactions
 
+    def extract_with_metadata(self, pdf_filepath, bank, statement_type):
+        """Extracts the transactions of a statement along with its metadata, see extract_with_validation
+
+        The transactions are not validated here, FinanceAnalytics reconciles whole batches of statements against the
+        returned balances (see StatementReconciliation).
+
+        :param pdf_filepath:The path to the file for loading (or an already open StatementDocument)
+        :param bank: The Bank the statement comes from
+        :param statement_type: The type of statement (Chequing, Visa)
+        :return: Tuple of (DataFrame of the transaction listing, (year, starting_balance, ending_balance))
+        """
+
+        self.stage_timings = {}
+
+        statement_template = statement_templates.template(bank, statement_type)
+
+        # Open the statement once for both the metadata and the transactions, closed as soon as extraction is done
+        with self._open_document(pdf_filepath) as document:
+
+            # Extract the metadata
+            with self._time_stage("metadata"):
+                (year_of_last_transaction, opening_balance, closing_balance) = self.extract_statement_metadata(document, bank, statement_type)
+
+            # Extract the transactions with the functions of the Bank-Product template
+            with self._time_stage("table_extraction"):
+                raw_transactions = statement_template.extract_transactions(self, document, statement_template)
+            with self._time_stage("standardization"):
+                transactions = statement_template.standardize_transactions(self, raw_transactions, year_of_last_transaction,
+                                                                           statement_template)
+
+        return transactions, (year_of_last_transaction, opening_balance, closing_balance)
+
+    @property
+    def column_mapping_for_standardization(self):
+        """Column mappings of the statement templates (shared, read only), by Bank and statement type
+
+        Looked up from the module templates rather than held, so the processor stays cheap to send to workers
+        """
+        return statement_templates.by_bank("column_mapping")
+
+    def parser_fingerprint(self):
+        """Fingerprint of everything that affects the extracted output (the parser version, the regexes, column
+        mappings, crop bounds and table settings of every statement template, and the table extraction engine of every
+        Bank-Product), used to invalidate cached extractions whenever the parser or its configuration changes
+
+        :return: Hex digest string
+        """
+
+        parser_settings = {
+            "parser_version": parser_version,
+            "statement_templates": statement_templates.fingerprint(),
+            "table_extraction_engines": self.table_extraction_engines,
+        }
+        return hashlib.sha256(json.dumps(parser_settings, sort_keys=True).encode("utf-8")).hexdigest()
+
     def validate_transactions(self, transactions, opening_balance, closing_balance):
         """Validates the transactions found in a Bank statement against the opening and closing balance found in the
         statement. Errors would indicate that the transaction list was not fully pulled (or the opening/closing balance
@@ -50,91 +521,263 @@ class StatementProcessor:
         :param transactions:DataFrame containing transactions for one Bank statement in standardized format
         :param opening_balance: The opening balance of the Bank statement as detected through the metadata function
         :param closing_balance: The closing balance of the Bank statement as detected through the metadata function
-        :return:
+        :return: True if the transactions add up exactly from the opening to the closing balance
         """
 
-        # Use np.around() to compensate for miniscule rounding errors caused by using floats
-        return closing_balance == (opening_balance+np.around(transactions["Amount"].sum(), 2))
+        # Compared in integer cents, as the float dollar sums can be off by a fraction of a cent
+        amounts = transactions["Amount"].to_numpy(dtype=np.float64, na_value=np.nan)
+        if np.isnan(amounts).any() or opening_balance is None or closing_balance is None:
+            return False
 
-    def extract_rbc_chequing_statement(self, pdf_filepath):
-        """Extracts a Pandas DataFrame from RBC chequing statements based on a cropped pattern
+        transaction_cents = int(np.rint(amounts * 100).astype(np.int64).sum())
+        return round(closing_balance * 100) == round(opening_balance * 100) + transaction_cents
 
-        :param pdf_filepath:The path to the statement for extracting to dataframe
-        :return:Pandas DataFrame with no text preprocessing
-        """
+    @contextlib.contextmanager
+    def _time_stage(self, stage_name):
+        """Records the wall and CPU time of an extraction stage of the current statement in stage_timings"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            self.stage_timings[stage_name] = {"wall_seconds": time.perf_counter() - wall_start,
+                                              "cpu_seconds": time.process_time() - cpu_start}
 
-        first_page_crop_bounds = (0, 400, 612, 792)
+    @contextlib.contextmanager
+    def _open_document(self, pdf_source):
+        """Yields an open StatementDocument for a filepath, or the document itself if one is passed in
 
-        pdf = pdfplumber.open(pdf_filepath)
+        Only documents opened here are closed here, so a caller sharing a document across steps keeps it open.
 
-        df_all_pages = []
+        :param pdf_source: Path to the statement or an open StatementDocument
+        :return: StatementDocument
+        """
+        if isinstance(pdf_source, StatementDocument):
+            yield pdf_source
+        else:
+            with StatementDocument(pdf_source) as document:
+                yield document
 
-        # Convert each page separately
-        for idx, page in enumerate(pdf.pages):
-            if idx == 0:
-                # Crop first page
-                extracted_table_for_page = (page
-                                            .crop(first_page_crop_bounds, relative=True)
-                                            .extract_table(self.rbc_chequing_table_settings_odd_pages))
-            elif (idx%2 == 1):
-                # even pages are treated differently than odd pages
-                extracted_table_for_page = (page
-                                            .extract_table(self.rbc_chequing_table_settings_even_pages))
-            else:
-                # odd pages
-                extracted_table_for_page = (page
-                                            .extract_table(self.rbc_chequing_table_settings_odd_pages))
+    def extract_rbc_chequing_statement(self, pdf_filepath, statement_template=None):
+        """Extracts a Pandas DataFrame from RBC chequing statements based on a cropped pattern
+
+        :param pdf_filepath:The path to the statement (or an open StatementDocument) for extracting to dataframe
+        :param statement_template: StatementTemplate of the statement, the RBC chequing template if not given
+        :return:Pandas DataFrame with no text preprocessing
+        """
 
-            # Ignore empty pages
-            if extracted_table_for_page is not None:
-                df_all_pages.append(pd.DataFrame(extracted_table_for_page[1::], columns=self.rbc_chequing_columns))
+        if statement_template is None:
+            statement_template = statement_templates.template("RBC", "Chequing")
+
+        # Convert each page separately, ignoring empty pages
+        df_all_pages = self._extract_statement_pages(pdf_filepath, statement_template.bank, statement_template.statement_type)
 
         # After conversion merge all the df pages into a single table
         return pd.concat(df_all_pages, axis=0).reset_index(drop=True)
 
-    def extract_rbc_visa_statement(self, pdf_filepath):
-        """Extracts a Pandas DataFrame from RBC visa statements based on a cropped pattern
+    def _extract_rbc_chequing_page(self, page, idx, statement_template):
+        """Extracts the transaction table of a single RBC chequing page
 
-        :param pdf_filepath:The path to the statement for extracting to dataframe
-        :return:Pandas DataFrame with no text preprocessing
+        Odd and even pages have their own table settings, calibrated for pages whose table header has moved out of
+        their columns (see PageLayoutCalibration).
+
+        :param page: pdfplumber page
+        :param idx: Zero based index of the page within the statement, selects the crop and the table settings
+        :param statement_template: StatementTemplate of the statement
+        :return: DataFrame of the raw page table, or None if the page has no table
         """
 
-        visa_page_crop_bounds = (55,140,350,598)
+        page_settings = statement_template.page_settings
+
+        if idx == 0:
+            # Crop first page
+            page = page.crop(page_settings["first_page_crop_bounds"], relative=True)
+
+        # even pages are treated differently than odd pages
+        table_settings = page_settings["even_pages"] if idx % 2 == 1 else page_settings["odd_pages"]
+        if statement_template.layout_calibration is not None:
+            table_settings = statement_template.layout_calibration.table_settings(page, table_settings, layout_calibrations)
 
-        pdf = pdfplumber.open(pdf_filepath)
+        extracted_table_for_page = self._extract_table(page, table_settings, statement_template.bank, statement_template.statement_type)
 
-        df_all_pages = []
+        if extracted_table_for_page is None:
+            return None
 
-        for page in pdf.pages:
-            page_raw_extract = page.crop(visa_page_crop_bounds).extract_table(self.rbc_visa_table_settings)
+        return pd.DataFrame(extracted_table_for_page[1::], columns=statement_template.columns)
 
-            # Failure to convert to DF indicates empty page, ignore and move to next page
-            try:
-                page_df = pd.DataFrame(page_raw_extract[1::], columns=self.rbc_visa_columns)
-                if page_df["Amount"].str.contains('\$').sum() == 0:
-                    # If no "$" character in the whole page it is legal text, dump and move on
-                    continue
-            except:
-                logging.info("Blank page, ignoring")
+    def extract_rbc_visa_statement(self, pdf_filepath, statement_template=None):
+        """Extracts a Pandas DataFrame from RBC visa statements based on a cropped pattern
+
+        :param pdf_filepath:The path to the statement (or an open StatementDocument) for extracting to dataframe
+        :param statement_template: StatementTemplate of the statement, the RBC visa template if not given
+        :return:Pandas DataFrame with no text preprocessing
+        """
 
-            if page_df is not None:
-                df_all_pages.append(page_df)
+        if statement_template is None:
+            statement_template = statement_templates.template("RBC", "Visa")
+
+        df_all_pages = self._extract_statement_pages(pdf_filepath, statement_template.bank, statement_template.statement_type)
+        logging.info("Skipped {} blank or legal text pages before table extraction".format(self.page_screening["screened_out"]))
 
         # After conversion merge all the df pages into a single table
         merged_df = pd.concat(df_all_pages, axis=0).reset_index(drop=True)
 
         # Remove all records without a "$" in amount to remove non-transaction lines
         # Also remove 'Amount($)' header records by removing lines with Amount containing ")"
-        return merged_df[merged_df["Amount"].str.contains('\$') & ~merged_df["Amount"].str.contains("\)")]
+        return merged_df[merged_df["Amount"].str.contains(r'\$') & ~merged_df["Amount"].str.contains(r"\)")]
+
+    def _extract_rbc_visa_page(self, page, idx, statement_template):
+        """Extracts the transaction table of a single RBC visa page
+
+        :param page: pdfplumber page
+        :param idx: Zero based index of the page within the statement, every visa page has the same layout
+        :param statement_template: StatementTemplate of the statement
+        :return: DataFrame of the raw page table, or None for blank and legal text pages
+        """
+
+        page_crop = page.crop(statement_template.page_settings["page_crop_bounds"])
+
+        # Every transaction amount has a "$", so a table region without a single "$" glyph is a blank or legal text
+        # page and is skipped before the (much slower) table extraction
+        if not any(char["text"] == "$" for char in page_crop.chars):
+            self.page_screening["screened_out"] += 1
+            return None
+
+        page_raw_extract = self._extract_table(page_crop, statement_template.page_settings["table"], statement_template.bank,
+                                               statement_template.statement_type)
+
+        # Failure to convert to DF indicates empty page (or text without the table columns), ignore and move on
+        try:
+            page_df = pd.DataFrame(page_raw_extract[1::], columns=statement_template.columns)
+        except (TypeError, ValueError):
+            logging.info("Blank page, ignoring")
+            self.page_screening["dropped_after_extraction"] += 1
+            return None
+
+        if page_df["Amount"].str.contains(r'\$').sum() == 0:
+            # If no "$" character in the whole page it is legal text, dump and move on
+            self.page_screening["dropped_after_extraction"] += 1
+            return None
+
+        return page_df
+
+    def _extract_statement_pages(self, pdf_filepath, bank, statement_type):
+        """Extracts the raw table of every page of a statement, skipping pages without transactions
+
+        With more than one page worker, statements long enough are split into contiguous page ranges extracted on a
+        process pool (each worker opening the statement itself). The page frames come back in page order, and every
+        page keeps its own index so the first/odd/even page settings are the same as in a serial extraction.
+
+        :param pdf_filepath: The path to the statement or an open StatementDocument
+        :param bank: The Bank the statement comes from
+        :param statement_type: The type of statement (Chequing, Visa)
+        :return: List of the raw page DataFrames in page order
+        """
+
+        with self._open_document(pdf_filepath) as document:
+            page_ranges = self._page_ranges(len(document.pages))
+
+            if len(page_ranges) < 2:
+                range_results = [self._extract_page_range(document, bank, statement_type, range(len(document.pages)))]
+            else:
+                statement_path = document.pdf_filepath
 
-    def standardized_rbc_chequing_transactions(self, transaction_df, year_of_last_transaction):
+        if len(page_ranges) > 1:
+            with ProcessPoolExecutor(max_workers=len(page_ranges)) as executor:
+                range_results = list(executor.map(self._extract_page_range, itertools.repeat(statement_path), itertools.repeat(bank),
+                                                  itertools.repeat(statement_type), page_ranges))
+
+        # Page screening counts of the statement, summed across the page ranges
+        self.page_screening = {count_name: sum(x[1][count_name] for x in range_results) for count_name in self.page_screening}
+
+        return [page_df for page_dfs, page_screening in range_results for page_df in page_dfs]
+
+    def _extract_page_range(self, pdf_filepath, bank, statement_type, page_indexes):
+        """Extracts the raw tables of a range of pages of a statement
+
+        Runs in the page worker processes when extracting pages in parallel, so it only depends on its arguments
+        :return: Tuple of (list of the raw page DataFrames in page order, pages without transactions left out,
+            dictionary of the page screening counts of the range)
+        """
+
+        df_pages = []
+        self.page_screening = dict.fromkeys(self.page_screening, 0)
+        statement_template = statement_templates.template(bank, statement_type)
+
+        with self._open_document(pdf_filepath) as document:
+            for idx in page_indexes:
+                page_df = statement_template.extract_page(self, document.pages[idx], idx, statement_template)
+
+                # The table of the page has been taken, its parsed layout is no longer needed
+                document.release_page(idx)
+
+                if page_df is not None:
+                    df_pages.append(page_df)
+
+        return df_pages, self.page_screening
+
+    def _extract_table(self, page, table_settings, bank, statement_type):
+        """Extracts the raw table of a page with the table extraction engine selected for the Bank-Product
+
+        "pdfplumber" uses pdfplumber's own table finder, "explicit_columns" the ExplicitColumnTableExtractor, and
+        "compare" runs both, logging a warning whenever they differ and returning the pdfplumber table.
+
+        :param page: pdfplumber page (or cropped page)
+        :param table_settings: pdfplumber table settings
+        :param bank: The Bank the statement comes from
+        :param statement_type: The type of statement (Chequing, Visa)
+        :return: List of rows of cell texts, or None if the page has no table
+        """
+
+        table_engine = self.table_extraction_engines[bank][statement_type]
+
+        # Template settings are read only, pdfplumber only takes a dictionary
+        table_settings = dict(table_settings)
+
+        if table_engine == "pdfplumber":
+            return page.extract_table(table_settings)
+        elif table_engine == "explicit_columns":
+            return self._explicit_column_extractor(table_settings).extract_table(page)
+        elif table_engine == "compare":
+            expected_table = page.extract_table(table_settings)
+            if self._explicit_column_extractor(table_settings).extract_table(page) != expected_table:
+                logging.warning("Explicit column table extraction differs from pdfplumber on page {} of {} {} statement"
+                                .format(page.page_number, bank, statement_type))
+            return expected_table
+        else:
+            raise ValueError("Unknown table extraction engine {}".format(table_engine))
+
+    def _explicit_column_extractor(self, table_settings):
+        """ExplicitColumnTableExtractor of a set of table settings, built the first time the settings are used"""
+        settings_key = json.dumps(table_settings, sort_keys=True)
+        if settings_key not in self.explicit_column_extractors:
+            self.explicit_column_extractors[settings_key] = ExplicitColumnTableExtractor(table_settings)
+        return self.explicit_column_extractors[settings_key]
+
+    def _page_ranges(self, page_count):
+        """Splits the pages of a statement into contiguous ranges, one per page worker, each of at least
+        min_pages_per_worker pages
+
+        :return: List of page index ranges, a single range when the statement is extracted serially
+        """
+
+        range_count = max(1, min(self.page_workers, page_count // self.min_pages_per_worker))
+        range_bounds = np.linspace(0, page_count, range_count + 1).astype(int)
+
+        return [range(start, end) for start, end in zip(range_bounds[:-1], range_bounds[1:])]
+
+    def standardized_rbc_chequing_transactions(self, transaction_df, year_of_last_transaction, statement_template=None):
         """Converts extract of rbc chequing to a standard format for aggregation and analysis
 
         :param transactions: The DataFrame of transactions pulled from an rbc visa statement
         :param year_of_last_transaction: The year that the statement ends for
+        :param statement_template: StatementTemplate of the statement, the RBC chequing template if not given
         :return: DataFrame of transactions in common format
         """
 
+        if statement_template is None:
+            statement_template = statement_templates.template("RBC", "Chequing")
+
         # Used for safety in df manipulation
         transactions = transaction_df.copy(deep=True)
 
@@ -145,60 +788,204 @@ class StatementProcessor:
         # Propagate dates when multiple transactions occur on same day
         transactions["Date"] = transactions["Date"].replace("", np.nan).ffill(axis=0)
 
-        # Merge withdrawls and deposits into one column
-        transactions["Deposits"] = transactions["Deposits"].str.replace(",", "").replace("", np.nan).fillna(0).astype(float)
-        transactions["Withdrawals"] = transactions["Withdrawals"].str.replace(",", "").replace("", np.nan).fillna(0).astype(float)
-        transactions["Amount"] = transactions["Deposits"] - transactions["Withdrawals"]
+        # Merge withdrawls and deposits into one column, in exact cents so the difference is not subject to float error
+        # Only empty cells count as 0, a cell that could not be parsed leaves the amount missing
+        deposit_cents = self._parse_money_column(transactions["Deposits"], "Deposits", as_cents=True, empty_value=0)
+        withdrawal_cents = self._parse_money_column(transactions["Withdrawals"], "Withdrawals", as_cents=True, empty_value=0)
+        transactions["Amount"] = (deposit_cents - withdrawal_cents).astype("float64") / 100
 
         # Extract relevant columns
-        standard_column_df = self._standardize_preprocessed_table(transactions,self.column_mapping_for_standardization['RBC']['Chequing'])
-
-        # Prepare Date to match style of standard input for conversion to datetime object
-        standard_column_df["Date"] = standard_column_df["Date"].apply(lambda x:"".join((x[-3:].upper(), x[:-3].zfill(2))))
+        standard_column_df = self._standardize_preprocessed_table(transactions, statement_template.column_mapping)
 
+        # Dates stay in the '12Aug' statement style, the date conversion reads both day-first and month-first tokens
         # If transactions for the statement include January, then the month period includes rollover and Dec must be adjusted one year back
         return self._standardize_date_columns(standard_column_df, year_of_last_transaction).reset_index(drop=True)
 
     def _standardize_date_columns(self, transactions, year_of_last_transaction):
-        """Converts 'JAN01'-like dates to datetime objects and compensates for statements that roll the year over
+        """Converts 'JAN01'-like (or '12Aug'-like) dates to datetime objects and compensates for statements that roll the year over
 
-        :param transactions: List of transactions with Date field set up like 'JAN01'
+        :param transactions: List of transactions with Date field set up like 'JAN01' or '12Aug'
         :param year_of_last_transaction: The integer year of the last transaction in the statement
         :return: DataFrame with Date column as datetime
         """
 
-        transactions["Date"] = transactions["Date"].apply(lambda x: self._convert_date_to_datestamps(x, year_of_last_transaction))
+        transactions["Date"] = self._convert_dates_to_datestamps(transactions["Date"], year_of_last_transaction)
+
+        return transactions
+
+    def _convert_dates_to_datestamps(self, date_strings, year):
+        """Converts a whole column of statement dates to datetimes in one pass
+
+        Accepts month-first ('JAN01', 'JAN 01') and day-first ('12Aug', '4Sep') tokens in any case. December dates are
+        assigned to the previous year when the column also holds January dates (see _rollover_year_offsets).
+        A statement only holds a few dozen distinct date tokens, so each distinct token is parsed once and the results
+        are broadcast back to the rows.
+
+        :param date_strings: pandas Series of statement date tokens
+        :param year: The year of the last transaction in the statement
+        :return: pandas Series of datetimes with the same index
+        """
+
+        codes, tokens = pd.factorize(date_strings)
+        if (codes < 0).any():
+            raise ValueError("Missing transaction dates")
+
+        token_parts = pd.Series(tokens, dtype=object).astype(str).str.strip().str.upper().str.extract(self.date_token_pattern)
+        token_months = token_parts["month_first"].fillna(token_parts["month_last"]).map(self.month_mapping)
+        token_days = token_parts["day_last"].fillna(token_parts["day_first"])
+
+        unrecognized_tokens = token_months.isna() | token_days.isna()
+        if unrecognized_tokens.any():
+            raise ValueError("Unrecognized transaction dates: {}".format(list(tokens[unrecognized_tokens.to_numpy()])))
 
-        return self._adjust_dates_for_rollover(transactions)
+        token_months = token_months.astype(int)
+
+        token_years = year - self._rollover_year_offsets(token_months.to_numpy())
+
+        token_dates = pd.to_datetime(pd.DataFrame({"year": token_years, "month": token_months, "day": token_days.astype(int)})).to_numpy()
+
+        return pd.Series(token_dates[codes], index=date_strings.index, name=date_strings.name)
+
+    def _rollover_year_offsets(self, months):
+        """Years to take off the dates of a statement: statement periods spanning new year hold December dates of the
+        year before the last transaction
+
+        :param months: NumPy array of the months of the statement dates
+        :return: NumPy array of 1 for the December dates of statements that also hold January dates, 0 otherwise
+        """
+        return np.where((months == 12) & (months == 1).any(), 1, 0)
 
     def _adjust_dates_for_rollover(self, standard_column_df):
-        """Adjust December dates back one year if the statement includes January transactions
+        """Adjust December dates back one year if the statement includes January transactions, for dates already
+        converted without the rollover (see _rollover_year_offsets)
 
         :param dates: The pandas Series list of all dates
         :return: A pandas Series with December dates shifted one year back if last transaction includes January month
         """
-        if any(standard_column_df["Date"].dt.month == 1):
-            standard_column_df.loc[standard_column_df["Date"].dt.month == 12, "Date"] = \
-            standard_column_df[standard_column_df["Date"].dt.month == 12]["Date"] - pd.DateOffset(years=1)
+        rolled_back = self._rollover_year_offsets(standard_column_df["Date"].dt.month.to_numpy()) == 1
+        if rolled_back.any():
+            standard_column_df.loc[rolled_back, "Date"] = standard_column_df.loc[rolled_back, "Date"] - pd.DateOffset(years=1)
 
         return standard_column_df
 
-    def standardized_rbc_visa_transactions(self, transactions, year_of_last_transaction):
+    def standardized_rbc_visa_transactions(self, transactions, year_of_last_transaction, statement_template=None):
         """Converts extract of rbc visa to a standard format for aggregation and analysis
 
         :param transactions: The DataFrame of transactions pulled from an rbc visa statement
         :param year_of_last_transaction: The year that the statement ends for
+        :param statement_template: StatementTemplate of the statement, the RBC visa template if not given
         :return: DataFrame of transactions in common format
         """
 
-        standard_column_df = self._standardize_preprocessed_table(transactions, self.column_mapping_for_standardization['RBC']['Visa'])
+        if statement_template is None:
+            statement_template = statement_templates.template("RBC", "Visa")
+
+        standard_column_df = self._standardize_preprocessed_table(transactions, statement_template.column_mapping)
 
         # Convert amounts to float
-        standard_column_df["Amount"] = standard_column_df["Amount"].apply(lambda x: float(x.replace('$', '').replace(',', '')))
+        standard_column_df["Amount"] = self._parse_money_column(standard_column_df["Amount"], "Amount")
 
         # If transactions for the statement include January, then the month period includes rollover and Dec must be adjusted one year back
         return self._standardize_date_columns(standard_column_df, year_of_last_transaction).reset_index(drop=True)
 
+    def _parse_money_column(self, money_strings, column_name, as_cents=False, empty_value=None):
+        """Parses a statement money column, logging the rows that could not be parsed instead of raising
+
+        :param money_strings: pandas Series of statement money text
+        :param column_name: Name of the column, used when reporting unparseable rows
+        :param as_cents: Return integer cents (nullable Int64) instead of float dollars
+        :param empty_value: Cents of the empty cells, missing if None
+        :return: pandas Series of amounts, missing where the cell could not be parsed (or was empty)
+        """
+
+        cents, failed_rows = self._parse_money_to_cents(money_strings)
+
+        if failed_rows.any():
+            logging.warning("Could not parse {} {} value(s), rows {}: {}".format(
+                failed_rows.sum(), column_name, list(money_strings.index[failed_rows]), list(money_strings[failed_rows])))
+
+        if empty_value is not None:
+            cents = cents.mask(cents.isna() & ~failed_rows, empty_value)
+
+        if as_cents:
+            return cents
+
+        return cents.astype("float64") / 100
+
+    def _parse_money_to_cents(self, money_strings):
+        """Parses a whole column of statement money text to exact integer cents in one vectorized pass
+
+        Handles '$' signs, thousands separators, leading minus signs and parenthesized negatives, e.g. '1,866.67',
+        '-$1,000.00' or '($22.22)'. The text is laid out as a character matrix and parsed with NumPy array arithmetic
+        rather than per cell Python calls. Empty cells are missing but are not failures.
+
+        :param money_strings: pandas Series of statement money text
+        :return: Tuple of (pandas Int64 Series of cents, boolean Series flagging the cells that could not be parsed)
+        """
+
+        values = money_strings.to_numpy(dtype=object)
+        missing = pd.isna(values)
+        text = values.astype(str)
+
+        # Anything longer than a money value is not one, blank it so it does not widen the character matrix
+        too_long = np.zeros(len(text), dtype=bool)
+        if text.dtype.itemsize > 4 * self.max_money_text_length:
+            too_long = np.char.str_len(text) > self.max_money_text_length
+            text = np.where(too_long, "", text).astype("U{}".format(self.max_money_text_length))
+
+        # One row per character position and one column per cell, so every reduction runs over whole columns at once.
+        # Characters outside Latin-1 are never part of a money value, folding them onto 255 keeps the matrix one byte wide
+        characters = np.minimum(text.view(np.uint32).reshape(len(text), text.dtype.itemsize // 4), 255).astype(np.uint8).T.copy()
+
+        is_digit = (characters >= ord("0")) & (characters <= ord("9"))
+        is_point = characters == ord(".")
+        is_comma = characters == ord(",")
+        is_space = (characters == ord(" ")) | (characters == 0)
+        is_dollar = characters == ord("$")
+        is_minus = characters == ord("-")
+        is_open = characters == ord("(")
+        is_close = characters == ord(")")
+        empty = missing | (is_space.all(axis=0) & ~too_long)
+
+        # Number of digits to the right of every character, used to locate every other character relative to the digits
+        digit_count = is_digit.sum(axis=0)
+        digits_to_right = np.cumsum(is_digit[::-1], axis=0, dtype=np.int8)[::-1] - is_digit
+        before_digits = digits_to_right == digit_count
+        after_digits = digits_to_right == 0
+
+        point_count = is_point.sum(axis=0)
+        fraction_digits = np.where(is_point, digits_to_right, 0).max(axis=0)
+        integer_digits_to_right = digits_to_right - fraction_digits
+        close_count = is_close.sum(axis=0)
+
+        recognized = (
+            (is_digit | is_point | is_comma | is_space | is_dollar | is_minus | is_open | is_close).all(axis=0)
+            # At most 16 integer digits, so the value in cents fits in int64
+            & (digit_count > 0) & (digit_count - fraction_digits <= 16)
+            & (point_count <= 1) & (fraction_digits <= 2)
+            # '$', '-' and '(' lead the digits, ')' closes them, spaces only pad
+            & ((is_dollar | is_minus | is_open) <= before_digits).all(axis=0)
+            & (is_close <= after_digits).all(axis=0)
+            & (is_space <= (before_digits | after_digits)).all(axis=0)
+            & (is_dollar.sum(axis=0) <= 1) & (is_minus.sum(axis=0) <= 1)
+            & (is_open.sum(axis=0) == close_count) & (close_count <= 1)
+            # Thousands separators sit between integer digits in groups of three
+            & (is_comma <= ((integer_digits_to_right > 0) & (integer_digits_to_right % 3 == 0) & ~before_digits)).all(axis=0)
+        )
+
+        # Accumulate the digits one character position at a time, skipping over every other character
+        cents = np.zeros(len(text), dtype=np.int64)
+        for position in range(characters.shape[0]):
+            cents = np.where(is_digit[position], cents * 10 + (characters[position].astype(np.int64) - ord("0")), cents)
+        cents *= np.power(10, np.clip(2 - fraction_digits, 0, 2), dtype=np.int64)
+
+        negative = (is_minus | is_close).any(axis=0)
+        cents = np.where(negative, -cents, cents)
+
+        failed = ~empty & ~recognized
+        return (pd.Series(pd.arrays.IntegerArray(cents, empty | failed), index=money_strings.index, name=money_strings.name),
+                pd.Series(failed, index=money_strings.index, name=money_strings.name))
+
     def _standardize_preprocessed_table(self, transactions, column_mapping):
         """Performs all standardization methods from Bank statement DataFrames that have been preprocesses to easily streamline standardization.
 
@@ -234,30 +1021,20 @@ class StatementProcessor:
         return transactions.replace('', np.nan).dropna(subset=["Date"]).reset_index(drop=True)
 
     def _convert_date_to_datestamps(self, date_string, year):
-        """Converts MMMDD statement transaction date format to string
+        """Converts a single statement transaction date token, read with the same token pattern and month names as
+        _convert_dates_to_datestamps (without its rollover, a single date cannot span new year)
 
         :param date_string: String containing transaction date as MMMDD using abbreviated month name
         :param year: The year to tag to the transaction
         :return: Datetime type of the transaction date
         """
 
-        month_mapping = {
-            "JAN": "01",
-            "FEB": "02",
-            "MAR": "03",
-            "APR": "04",
-            "MAY": "05",
-            "JUN": "06",
-            "JUL": "07",
-            "AUG": "08",
-            "SEP": "09",
-            "OCT": "10",
-            "NOV": "11",
-            "DEC": "12",
-        }
+        token_parts = re.match(self.date_token_pattern, str(date_string).strip().upper())
+        if token_parts is None or (token_parts["month_first"] or token_parts["month_last"]) not in self.month_mapping:
+            raise ValueError("Unrecognized transaction date: {}".format(date_string))
 
-        # Split into pieces and join as a single string for conversion
-        return datetime.datetime.strptime('-'.join((str(year), month_mapping[date_string[:3]], date_string[-2:])), '%Y-%m-%d')
+        month = self.month_mapping[token_parts["month_first"] or token_parts["month_last"]]
+        return datetime.datetime(year, int(month), int(token_parts["day_last"] or token_parts["day_first"]))
 
 
     def extract_statement_metadata(self, pdf_filepath, bank, account_type):
@@ -267,80 +1044,153 @@ class StatementProcessor:
         final transaction (used for analytics spanning more than one year), and the starting/ending balances (for
         validation step after pulling all transactions)
 
+        :param pdf_filepath: The path to the statement or an open StatementDocument
+        :param bank: The Bank the statement comes from
+        :param account_type: The type of statement (Chequing, Visa)
         :return:Tuple of (year, starting_balance, ending_balance)
         """
 
-        pdf = pdfplumber.open(pdf_filepath)
-        first_page_text = pdf.pages[0].extract_text()
+        with self._open_document(pdf_filepath) as document:
+            first_page_text = document.first_page_text()
 
-        year_of_last_transaction = int(re.search(self.regex_statements[bank][account_type]['last_transaction_date'], first_page_text).groups()[-1])
+        # Precompiled regexes of the Bank-Product template, see StatementTemplate.extract_metadata
+        return statement_templates.template(bank, account_type).extract_metadata(first_page_text)
 
-        # If starting balance regex doesn't work it is likely the opening of a new account
-        try:
-            starting_balance = float(re.search(self.regex_statements[bank][account_type]['starting_balance'], first_page_text).groups()[-1].replace("$","").replace(",", ""))
-        except:
-            starting_balance = float(0)
+    def __init__(self, page_workers=1, table_extraction_engines=None):
+        """
+        :param page_workers: Processes extracting the pages of a single long statement
+        :param table_extraction_engines: Table extraction engine by Bank and statement type (e.g.
+            {"RBC": {"Visa": "explicit_columns"}}), the Bank-Products not given use "pdfplumber"
+        """
 
-        ending_balance = float(re.search(self.regex_statements[bank][account_type]['ending_balance'], first_page_text).groups()[-1].replace("$","").replace(",", ""))
+        # Processes extracting the pages of a single long statement, 1 keeps the serial page loop
+        self.page_workers = page_workers
 
-        return (year_of_last_transaction, starting_balance, ending_balance)
+        # Fewest pages given to a page worker, shorter statements are not worth the worker start up
+        self.min_pages_per_worker = 8
 
-    def __init__(self):
+        # Wall and CPU time of each extraction stage of the last extracted statement
+        self.stage_timings = {}
 
-        # Store all regex statements for metadata parsing
-        self.regex_statements = {
-            'RBC': {
-                'Chequing': {
-                    'last_transaction_date':  r"From ?\w*,\w*,(\d{4})",
-                    'starting_balance': r"Your ?opening ?balance ?on ?\w*, ?\d* ?(-?\$?.*)",
-                    'ending_balance': r"Your ?closing ?balance ?on ?\w*, ?\d* ?=?(-?\$?.*)",
-                },
-                'Visa': {
-                    'last_transaction_date': r"STATEMENT ?FROM ?\w*,(\d{4})",
-                    'starting_balance': r"PREVIOUS ?STATEMENT ?BALANCE ?(-?\$?[0-9,.]*)",
-                    'ending_balance': r"(CREDIT ?BALANCE ?|NEW ?BALANCE ?)(-?\$?[0-9,.]*)",
-                }
-            }
-        }
+        # Pages of the last extracted statement skipped by the "$" glyph screen before table extraction, and pages
+        # that passed the screen but were dropped after extraction (a high count means the screen is too loose)
+        self.page_screening = {"screened_out": 0, "dropped_after_extraction": 0}
+
+        # Table extraction engine of each Bank-Product: "pdfplumber", "explicit_columns" (same tables from the word
+        # positions, without pdfplumber's general cell search) or "compare" (both, warning on any difference)
+        self.table_extraction_engines = {bank: dict.fromkeys(statement_types, "pdfplumber")
+                                         for bank, statement_types in statement_templates.by_bank("statement_type").items()}
+        for bank, statement_types in (table_extraction_engines or {}).items():
+            for statement_type, table_engine in statement_types.items():
+                if statement_type not in self.table_extraction_engines.get(bank, {}):
+                    raise ValueError("No statement template for {} {} to set the table extraction engine of".format(bank, statement_type))
+                if table_engine not in ("pdfplumber", "explicit_columns", "compare"):
+                    raise ValueError("Unknown table extraction engine {}".format(table_engine))
+                self.table_extraction_engines[bank][statement_type] = table_engine
+
+        # ExplicitColumnTableExtractor of each set of table settings used by the explicit_columns engine
+        self.explicit_column_extractors = {}
+
+        # Longest text considered when parsing money cells ('-$1,000,000,000.00' is 18 characters)
+        self.max_money_text_length = 32
 
-        self.column_mapping_for_standardization = {
-            'RBC': {
-                'Chequing': {
-                    "Date": "Date",
-                    "Description": "Description",
-                    "Amount": "Amount",
-                },
-                'Visa': {
-                    "Transaction Date": "Date",
-                    "Activity Description": "Description",
-                    "Amount": "Amount",
-                }
-            }
+        # Abbreviated month names used in statement transaction dates
+        self.month_mapping = {
+            "JAN": "01",
+            "FEB": "02",
+            "MAR": "03",
+            "APR": "04",
+            "MAY": "05",
+            "JUN": "06",
+            "JUL": "07",
+            "AUG": "08",
+            "SEP": "09",
+            "OCT": "10",
+            "NOV": "11",
+            "DEC": "12",
         }
 
+        # Month-first ('JAN01', visa) or day-first ('12AUG', chequing) transaction date tokens, optionally spaced ('JAN 01')
+        self.date_token_pattern = r"^(?:(?P<month_first>[A-Z]{3})\s*(?P<day_last>\d{1,2})|(?P<day_first>\d{1,2})\s*(?P<month_last>[A-Z]{3}))$"
+
+
+# Version of the parsing code, part of the parser fingerprint so cached extractions are invalidated when it changes.
+# Bumped whenever a code change (rather than a template setting) changes the extracted output:
+# 2: unparseable chequing amounts stay missing instead of being read as $0
+parser_version = 2
+
+# Templates of the supported Bank-Products, built once per process and shared by every StatementProcessor
+statement_templates = StatementTemplateRegistry()
+
+# Calibrated column lines of every page layout seen by this process (see PageLayoutCalibration), by header layout and
+# column lines. Kept per process rather than on the StatementProcessor, as a fresh copy of it is pickled to a worker
+# with every statement, and rather than on the shared read only templates
+layout_calibrations = {}
+
+statement_templates.register(StatementTemplate(
+    "RBC", "Chequing",
+    metadata_patterns={
+        'last_transaction_date':  r"From ?\w*,\w*,(\d{4})",
+        'starting_balance': r"Your ?opening ?balance ?on ?\w*, ?\d* ?(-?\$?.*)",
+        'ending_balance': r"Your ?closing ?balance ?on ?\w*, ?\d* ?=?(-?\$?.*)",
+    },
+    column_mapping={
+        "Date": "Date",
+        "Description": "Description",
+        "Amount": "Amount",
+    },
+    # Fixed column scheme for RBC chequing
+    columns=["Date", "Description", "Withdrawals", "Deposits", "Balance"],
+    page_settings={
+        # Only the bottom half of the first chequing page holds transactions
+        "first_page_crop_bounds": (0, 400, 612, 792),
         # Hard coded based on trial and error for now
-        self.rbc_chequing_table_settings_odd_pages = {
+        "odd_pages": {
             "vertical_strategy": "explicit",
             "horizontal_strategy": "lines",
             "explicit_vertical_lines": [45, 85, 300, 400, 500, 595],
-        }
-
+        },
         # Hard coded based on trial and error for now
-        self.rbc_chequing_table_settings_even_pages = {
+        "even_pages": {
             "vertical_strategy": "explicit",
             "horizontal_strategy": "lines",
             "explicit_vertical_lines": [15, 55, 270, 370, 470, 565],
-        }
-
+        },
+    },
+    extract_transactions=StatementProcessor.extract_rbc_chequing_statement,
+    extract_page=StatementProcessor._extract_rbc_chequing_page,
+    standardize_transactions=StatementProcessor.standardized_rbc_chequing_transactions,
+    # Header words of the columns, checked against the odd and even page column lines
+    layout_calibration=PageLayoutCalibration(
+        header_words=["Date", "Description", "Withdrawals", "Deposits", "Balance"],
+    ),
+))
+
+statement_templates.register(StatementTemplate(
+    "RBC", "Visa",
+    metadata_patterns={
+        'last_transaction_date': r"STATEMENT ?FROM ?\w*,(\d{4})",
+        'starting_balance': r"PREVIOUS ?STATEMENT ?BALANCE ?(-?\$?[0-9,.]*)",
+        'ending_balance': r"(CREDIT ?BALANCE ?|NEW ?BALANCE ?)(-?\$?[0-9,.]*)",
+    },
+    column_mapping={
+        "Transaction Date": "Date",
+        "Activity Description": "Description",
+        "Amount": "Amount",
+    },
+    # Fixed column scheme for RBC visa
+    columns=["Transaction Date", "Posting Date", "Activity Description", "Amount"],
+    page_settings={
+        # Region of the visa pages holding the transaction table
+        "page_crop_bounds": (55, 140, 350, 598),
         # Hard coded based on trial and error for now
-        self.rbc_visa_table_settings = {
+        "table": {
             "vertical_strategy": "explicit",
             "horizontal_strategy": "text",
             "explicit_vertical_lines": [57, 95, 128, 305, 350],
-        }
-
-        # Fixed column scheme for RBC chequing
-        self.rbc_chequing_columns = ["Date", "Description", "Withdrawals", "Deposits", "Balance"]
-
-        # Fixed column scheme for RBC visa
-        self.rbc_visa_columns = ["Transaction Date", "Posting Date", "Activity Description", "Amount"]
\ No newline at end of file
+        },
+    },
+    extract_transactions=StatementProcessor.extract_rbc_visa_statement,
+    extract_page=StatementProcessor._extract_rbc_visa_page,
+    standardize_transactions=StatementProcessor.standardized_rbc_visa_transactions,
+))
\ No newline at end of file
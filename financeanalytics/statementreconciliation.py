@@ -0,0 +1,147 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+class StatementReconciliation:
+    """
+    A class used to reconcile the extracted transactions of every statement against the opening and closing balance
+    printed on the statement, and to act on the statements that do not reconcile.
+
+    Balances and transaction amounts are compared as exact integer cents, for a whole batch of statements at once
+    (transaction totals grouped by statement). Every statement reconciled is kept in a reconciliation table along with
+    its discrepancy. Statements with an amount that could not be parsed or a balance that could not be read never
+    reconcile. Statements that do not reconcile are handled by the policy:
+    - "warn": logged, their transactions are kept
+    - "drop": logged, their transactions are dropped from the output
+    - "abort": the run is stopped with a ValueError
+
+    The Filepaths of the dropped statements are kept, so they are not recorded as written to the output. An
+    incremental run carries over the reconciliation of the statements it does not extract again from the report of
+    the previous run.
+    """
+
+    def reconcile(self, transactions, statement_balances):
+        """Reconciles a batch of statements and applies the policy to their transactions
+
+        :param transactions: DataFrame of the transactions of the statements, with a Filepath column and the Amount
+            in integer cents
+        :param statement_balances: DataFrame with one row per statement: its hierarchy, Filepath, Opening Balance and
+            Closing Balance (dollars, missing if they could not be read)
+        :return: The transactions kept by the policy
+        """
+        reconciliation = self._reconciliation_table(transactions, statement_balances)
+        self.reconciliations.append(reconciliation)
+
+        unreconciled = reconciliation[~reconciliation["Reconciled"]]
+        if unreconciled.empty:
+            return transactions
+
+        for index, statement in unreconciled.iterrows():
+            logging.warning("Transactions of {} do not reconcile with its balances: opening {}, closing {}, transactions "
+                            "total {}, discrepancy {}".format(statement["Filepath"], statement["Opening Balance"],
+                                                              statement["Closing Balance"], statement["Transaction Total"],
+                                                              statement["Discrepancy"]))
+
+        if self.policy == "abort":
+            raise ValueError("{} statement(s) do not reconcile with their balances, first {}".format(
+                unreconciled.shape[0], unreconciled["Filepath"].iloc[0]))
+        elif self.policy == "drop":
+            logging.warning("Dropping the transactions of {} statement(s) that do not reconcile".format(unreconciled.shape[0]))
+            self.dropped_filepaths.update(unreconciled["Filepath"].astype(str))
+            reconciled_rows = self._statement_of_row(transactions, unreconciled["Filepath"]) < 0
+            return transactions[reconciled_rows].reset_index(drop=True)
+
+        return transactions
+
+    def report(self):
+        """Reconciliation table of every statement reconciled so far
+
+        :return: DataFrame with the statement hierarchy, Filepath, balances, transaction count and total, discrepancy
+            and whether the statement reconciled
+        """
+        if not self.reconciliations:
+            return pd.DataFrame(columns=["Filepath", "Opening Balance", "Closing Balance", "Transactions",
+                                         "Transaction Total", "Discrepancy", "Reconciled"])
+        return pd.concat(self.reconciliations, axis=0).reset_index(drop=True)
+
+    def carry_over(self, report_path, filepaths):
+        """Adds the reconciliation of statements from a previously saved report, ahead of the statements reconciled
+        since, so the report still covers the statements an incremental run does not extract again
+
+        :param report_path: Location of the previous report, nothing is carried over if it does not exist
+        :param filepaths: Filepaths of the statements to carry over
+        """
+        report_path = Path(report_path)
+        if not report_path.exists():
+            return
+
+        previous_report = pd.read_csv(report_path, dtype=str, keep_default_na=False)
+        previous_report = previous_report[previous_report["Filepath"].isin(set(pd.Series(filepaths).astype(str)))]
+        for column in ["Opening Balance", "Closing Balance", "Transactions", "Transaction Total", "Discrepancy"]:
+            previous_report[column] = pd.to_numeric(previous_report[column], errors="coerce")
+        previous_report["Reconciled"] = previous_report["Reconciled"] == "True"
+
+        self.reconciliations.insert(0, previous_report.reset_index(drop=True))
+
+    def save(self, report_path):
+        """Writes the reconciliation table as CSV"""
+        self.report().to_csv(Path(report_path), index=False)
+
+    def _reconciliation_table(self, transactions, statement_balances):
+        """Transaction count, total and discrepancy of every statement in exact cents, vectorized across the batch"""
+        statement_count = statement_balances.shape[0]
+        statement_of_row = self._statement_of_row(transactions, statement_balances["Filepath"])
+        if (statement_of_row < 0).any():
+            raise ValueError("Transactions of statements without balances: {}".format(
+                list(transactions["Filepath"][statement_of_row < 0].astype(str).unique())))
+
+        amount = transactions["Amount"]
+        amount_missing = amount.isna().to_numpy()
+        amount_cents = amount.to_numpy(dtype=np.float64, na_value=0).astype(np.int64)
+
+        transaction_counts = np.bincount(statement_of_row, minlength=statement_count)
+        missing_amounts = np.bincount(statement_of_row, weights=amount_missing, minlength=statement_count) > 0
+        transaction_cents = pd.Series(amount_cents).groupby(statement_of_row).sum().reindex(range(statement_count), fill_value=0).to_numpy()
+
+        opening_cents = self._to_cents(statement_balances["Opening Balance"])
+        closing_cents = self._to_cents(statement_balances["Closing Balance"])
+        discrepancy_cents = closing_cents - opening_cents - transaction_cents
+
+        reconciliation = statement_balances.reset_index(drop=True).copy()
+        reconciliation["Transactions"] = transaction_counts
+        reconciliation["Transaction Total"] = transaction_cents / self.cents_per_dollar
+        reconciliation["Discrepancy"] = discrepancy_cents / self.cents_per_dollar
+        reconciliation["Reconciled"] = (discrepancy_cents == 0) & ~missing_amounts
+
+        return reconciliation
+
+    def _statement_of_row(self, transactions, statement_filepaths):
+        """Position in statement_filepaths of the statement of every transaction row, -1 if it is not there"""
+        filepaths = transactions["Filepath"]
+        if not isinstance(filepaths.dtype, pd.CategoricalDtype):
+            filepaths = filepaths.astype(str).astype("category")
+
+        # Only the distinct statement paths are looked up, the rows follow through their category codes
+        category_positions = pd.Index(statement_filepaths.astype(str)).get_indexer(filepaths.cat.categories.astype(str))
+        row_codes = filepaths.cat.codes.to_numpy()
+        return np.where(row_codes >= 0, np.append(category_positions, -1)[row_codes], -1)
+
+    def _to_cents(self, balances):
+        """Dollar balances to exact cents (as floats, so a balance that could not be read stays NaN)"""
+        return np.rint(pd.to_numeric(balances, errors="coerce").to_numpy(dtype=np.float64) * self.cents_per_dollar)
+
+    def __init__(self, policy="warn"):
+        """
+        :param policy: What to do with statements that do not reconcile: "warn", "drop" or "abort"
+        """
+        self.policies = ("warn", "drop", "abort")
+        if policy not in self.policies:
+            raise ValueError("Unknown reconciliation policy {}, choose from {}".format(policy, self.policies))
+
+        self.policy = policy
+        self.reconciliations = []
+        self.dropped_filepaths = set()
+        self.cents_per_dollar = 100
@@ -0,0 +1,373 @@
+import calendar
+import datetime
+import random
+
+from pathlib import Path
+
+from pdfminer.fontmetrics import FONT_METRICS
+
+class SyntheticPDF:
+    """
+    A minimal PDF writer (Helvetica text and horizontal rules only) used to build synthetic Bank statements without
+    depending on a PDF authoring library. Positions are given in pdfplumber coordinates (x from the left, top from the
+    top of the page).
+    """
+
+    def new_page(self):
+        """Starts a new page, all subsequent drawing goes onto it"""
+        self.pages.append([])
+
+    def text_width(self, text, size):
+        """Width of the text in points when rendered in Helvetica at the given size"""
+        widths = FONT_METRICS["Helvetica"][1]
+        return sum(widths.get(char, 556) for char in text) * size / 1000
+
+    def text(self, x, top, text, size=8):
+        """Writes left aligned text whose top edge sits at top"""
+        # pdfminer places the glyph box from (baseline + descent) to (baseline + descent + size)
+        baseline = self.height - top - size * (1 + self.helvetica_descent)
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        self.pages[-1].append("BT /F1 {} Tf {:.2f} {:.2f} Td ({}) Tj ET".format(size, x, baseline, escaped))
+
+    def text_right(self, x_right, top, text, size=8):
+        """Writes right aligned text ending at x_right"""
+        self.text(x_right - self.text_width(text, size), top, text, size)
+
+    def hline(self, x0, x1, top, line_width=0.5):
+        """Draws a horizontal rule from x0 to x1"""
+        y = self.height - top
+        self.pages[-1].append("{} w {:.2f} {:.2f} m {:.2f} {:.2f} l S".format(line_width, x0, y, x1, y))
+
+    def save(self, pdf_filepath):
+        """Serializes all pages to a PDF file"""
+        objects = [
+            "<< /Type /Catalog /Pages 2 0 R >>",
+            None,
+            "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        ]
+        page_references = []
+        for page_operations in self.pages:
+            # Trailing newline so the parser sees the delimiter after the final operator
+            content = ("\n".join(page_operations) + "\n").encode("latin-1")
+            objects.append(b"<< /Length " + str(len(content)).encode() + b" >>\nstream\n" + content + b"\nendstream")
+            objects.append("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {} {}] /Resources << /Font << /F1 3 0 R >> >> "
+                           "/Contents {} 0 R >>".format(self.width, self.height, len(objects)))
+            page_references.append("{} 0 R".format(len(objects)))
+        objects[1] = "<< /Type /Pages /Kids [{}] /Count {} >>".format(" ".join(page_references), len(page_references))
+
+        output = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            body = body if isinstance(body, bytes) else body.encode("latin-1")
+            output += str(number).encode() + b" 0 obj\n" + body + b"\nendobj\n"
+
+        xref_offset = len(output)
+        output += "xref\n0 {}\n0000000000 65535 f \n".format(len(objects) + 1).encode()
+        for offset in offsets:
+            output += "{:010d} 00000 n \n".format(offset).encode()
+        output += "trailer\n<< /Size {} /Root 1 0 R >>\nstartxref\n{}\n%%EOF\n".format(len(objects) + 1, xref_offset).encode()
+
+        Path(pdf_filepath).write_bytes(bytes(output))
+
+    def __init__(self, width=612, height=792):
+        self.width = width
+        self.height = height
+        self.helvetica_descent = -0.207
+        self.pages = []
+
+class SyntheticStatementGenerator:
+    """
+    A class used to write realistic RBC Chequing and Visa statements (and whole Bank/Level folder trees of them) that
+    match the crop bounds and table settings of the StatementProcessor, for scale and throughput benchmarking.
+    """
+
+    def write_rbc_chequing_statement(self, pdf_filepath, statement_end, transactions=30, pages=2, opening_balance=None,
+                                     column_shift=0):
+        """Writes a synthetic RBC chequing statement
+
+        The first page carries the account summary on the top half and the start of the transaction table on the
+        bottom half (the region cropped by the StatementProcessor). Following pages alternate between the odd and even
+        page column layouts.
+
+        :param pdf_filepath: Location to write the statement to
+        :param statement_end: datetime.date of the last day of the statement period
+        :param transactions: Number of transactions in the statement
+        :param pages: Number of pages the transaction table is spread over
+        :param opening_balance: Opening balance in cents, random if not given
+        :param column_shift: Points the table columns of every page are moved right by, as when the Bank moves its layout
+        :return: Dictionary with the opening and closing balances (cents), the transactions and the number of pages
+        """
+        statement_start = self._statement_start(statement_end)
+        opening_balance = self.random.randint(50000, 500000) if opening_balance is None else opening_balance
+        statement_transactions = self._random_transactions(statement_start, statement_end, transactions,
+                                                           self.chequing_descriptions, deposit_probability=0.2)
+        closing_balance = opening_balance + sum(amount for _, _, amount in statement_transactions)
+
+        pdf = SyntheticPDF()
+        pdf.new_page()
+        pdf.text(45, 40, "RBC Royal Bank", size=12)
+        pdf.text(45, 70, "Your RBC personal banking account statement")
+        pdf.text(45, 90, "From {}{},{}to{}{},{}".format(calendar.month_name[statement_start.month], statement_start.day,
+                                                         statement_start.year, calendar.month_name[statement_end.month],
+                                                         statement_end.day, statement_end.year))
+        pdf.text(45, 120, "Your opening balance on {}{}, {} {}".format(
+            calendar.month_name[statement_start.month], statement_start.day, statement_start.year,
+            self._format_money(opening_balance, dollar_sign=True)))
+        pdf.text(45, 140, "Your closing balance on {}{}, {} = {}".format(
+            calendar.month_name[statement_end.month], statement_end.day, statement_end.year,
+            self._format_money(closing_balance, dollar_sign=True)))
+
+        rows = [("", "Opening Balance", None, self._format_money(opening_balance))]
+        balance = opening_balance
+        previous_date = None
+        for position, (date, description, amount) in enumerate(statement_transactions):
+            balance += amount
+            # Only the first transaction of a day carries the date, the balance is printed on the last one
+            date_text = "" if date == previous_date else "{}{}".format(date.day, calendar.month_abbr[date.month])
+            last_of_day = position + 1 == len(statement_transactions) or statement_transactions[position + 1][0] != date
+            rows.append((date_text, description, amount, self._format_money(balance) if last_of_day else ""))
+            previous_date = date
+        rows.append(("", "Closing Balance", None, self._format_money(closing_balance)))
+
+        for page_index, page_rows in enumerate(self._split_rows(rows, pages)):
+            if page_index > 0:
+                pdf.new_page()
+            # Same page selection as the StatementProcessor: index 1, 3, ... use the shifted layout
+            columns = self.chequing_columns_even_pages if page_index % 2 == 1 else self.chequing_columns_odd_pages
+            columns = [x + column_shift for x in columns]
+            table_top = 410 if page_index == 0 else 60
+            self._write_chequing_table(pdf, columns, table_top, page_rows)
+
+        pdf.save(pdf_filepath)
+
+        return {"opening_balance": opening_balance, "closing_balance": closing_balance,
+                "transactions": statement_transactions, "pages": len(pdf.pages)}
+
+    def write_rbc_visa_statement(self, pdf_filepath, statement_end, transactions=30, pages=2, legal_pages=1,
+                                 opening_balance=None):
+        """Writes a synthetic RBC visa statement
+
+        The transaction table sits in the left column region cropped by the StatementProcessor, the account summary
+        sits above it. Legal text pages without any amounts are appended at the end like the real statements.
+
+        :param pdf_filepath: Location to write the statement to
+        :param statement_end: datetime.date of the last day of the statement period
+        :param transactions: Number of transactions in the statement
+        :param pages: Number of pages the transaction table is spread over
+        :param legal_pages: Number of boilerplate pages appended after the transactions
+        :param opening_balance: Opening balance in cents, random if not given
+        :return: Dictionary with the opening and closing balances (cents), the transactions and the number of pages
+        """
+        statement_start = self._statement_start(statement_end)
+        opening_balance = self.random.randint(0, 300000) if opening_balance is None else opening_balance
+        # Purchases increase the card balance, payments reduce it
+        statement_transactions = [(date, description, -amount) for date, description, amount in
+                                  self._random_transactions(statement_start, statement_end, transactions,
+                                                            self.visa_descriptions, deposit_probability=0.1)]
+        closing_balance = opening_balance + sum(amount for _, _, amount in statement_transactions)
+
+        pdf = SyntheticPDF()
+        pdf.new_page()
+        pdf.text(57, 40, "RBC ROYAL BANK VISA", size=12)
+        pdf.text(57, 70, "STATEMENT FROM {}{}TO{}{},{}".format(
+            calendar.month_abbr[statement_start.month].upper(), statement_start.day,
+            calendar.month_abbr[statement_end.month].upper(), statement_end.day, statement_end.year))
+        pdf.text(57, 90, "PREVIOUS STATEMENT BALANCE {}".format(self._format_money(opening_balance, dollar_sign=True)))
+        pdf.text(57, 110, "{} {}".format("CREDIT BALANCE" if closing_balance < 0 else "NEW BALANCE",
+                                         self._format_money(closing_balance, dollar_sign=True)))
+
+        rows = [("", "", "PREVIOUS STATEMENT BALANCE", self._format_money(opening_balance, dollar_sign=True))]
+        for date, description, amount in statement_transactions:
+            posting_date = min(date + datetime.timedelta(days=self.random.randint(0, 2)), statement_end)
+            rows.append((self._visa_date(date), self._visa_date(posting_date), description,
+                         self._format_money(amount, dollar_sign=True)))
+        rows.append(("", "", "NEW BALANCE", self._format_money(closing_balance, dollar_sign=True)))
+
+        for page_index, page_rows in enumerate(self._split_rows(rows, pages)):
+            if page_index > 0:
+                pdf.new_page()
+            self._write_visa_table(pdf, 150, page_rows)
+
+        for _ in range(legal_pages):
+            pdf.new_page()
+            self._write_legal_text(pdf)
+
+        pdf.save(pdf_filepath)
+
+        return {"opening_balance": opening_balance, "closing_balance": closing_balance,
+                "transactions": statement_transactions, "pages": len(pdf.pages)}
+
+    def build_statement_tree(self, root_folder, statements=24, accounts=(("Chequing",), ("Visa",)),
+                             first_statement_end=datetime.date(2019, 1, 11), transactions=30, pages=2, legal_pages=1):
+        """Builds a Bank/Level folder tree of monthly statements in the layout expected by the DataLoader
+
+        Statements are spread round robin across the accounts, each account receiving consecutive monthly statements
+        so the December to January rollover is exercised every year. Balances carry over from one statement to the next.
+
+        :param root_folder: Root folder of the tree (the Bank folders are created directly below it)
+        :param statements: Total number of statements to write
+        :param accounts: Tuple of hierarchy levels below the Bank for each account, the statement type is read from
+            the last level (Chequing or Visa)
+        :param first_statement_end: Statement end date of the first statement of every account
+        :param transactions: Number of transactions per statement
+        :param pages: Number of table pages per statement
+        :param legal_pages: Number of boilerplate pages per Visa statement
+        :return: Dictionary with the number of statements and pages written
+        """
+        summary = {"statements": 0, "pages": 0}
+        closing_balances = {}
+
+        for number in range(statements):
+            account = accounts[number % len(accounts)]
+            month_offset = number // len(accounts)
+            statement_end = self._add_months(first_statement_end, month_offset)
+
+            folder = Path(root_folder, "RBC", *account)
+            folder.mkdir(parents=True, exist_ok=True)
+            statement_type = account[-1]
+            pdf_filepath = folder / "{} Statement-0000 {}.pdf".format(statement_type, statement_end.isoformat())
+
+            if statement_type.lower() == "chequing":
+                statement = self.write_rbc_chequing_statement(pdf_filepath, statement_end, transactions, pages,
+                                                              closing_balances.get(account))
+            else:
+                statement = self.write_rbc_visa_statement(pdf_filepath, statement_end, transactions, pages, legal_pages,
+                                                          closing_balances.get(account))
+
+            closing_balances[account] = statement["closing_balance"]
+            summary["statements"] += 1
+            summary["pages"] += statement["pages"]
+
+        return summary
+
+    def _write_chequing_table(self, pdf, columns, table_top, rows):
+        """Writes a ruled chequing table, one horizontal rule between every row (horizontal 'lines' strategy)"""
+        row_height = 14
+        left, right = columns[0], columns[-1]
+
+        pdf.hline(left, right, table_top)
+        header = ("Date", "Description", "Withdrawals ($)", "Deposits ($)", "Balance ($)")
+        self._write_chequing_row(pdf, columns, table_top + 3, header)
+        row_top = table_top + row_height
+        pdf.hline(left, right, row_top)
+
+        for row in rows:
+            date_text, description, amount, balance = row
+            withdrawal = self._format_money(-amount) if amount is not None and amount < 0 else ""
+            deposit = self._format_money(amount) if amount is not None and amount >= 0 else ""
+            self._write_chequing_row(pdf, columns, row_top + 3, (date_text, description, withdrawal, deposit, balance))
+            row_top += row_height
+            pdf.hline(left, right, row_top)
+
+    def _write_chequing_row(self, pdf, columns, top, values):
+        """Writes the cells of one chequing row, text columns left aligned and amounts right aligned"""
+        date_text, description, withdrawal, deposit, balance = values
+        pdf.text(columns[0] + 2, top, date_text)
+        pdf.text(columns[1] + 2, top, description)
+        pdf.text_right(columns[3] - 3, top, withdrawal)
+        pdf.text_right(columns[4] - 3, top, deposit)
+        pdf.text_right(columns[5] - 3, top, balance)
+
+    def _write_visa_table(self, pdf, table_top, rows):
+        """Writes an unruled visa table (horizontal 'text' strategy), amounts right aligned against the crop edge"""
+        row_height = 12
+        size = 7
+        columns = self.visa_columns
+
+        pdf.text(columns[0] + 1, table_top, "DATE", size)
+        pdf.text(columns[1] + 1, table_top, "DATE", size)
+        pdf.text(columns[2] + 2, table_top, "ACTIVITY DESCRIPTION", size)
+        pdf.text_right(columns[4] - 2, table_top, "AMOUNT ($)", size)
+
+        row_top = table_top + row_height
+        for transaction_date, posting_date, description, amount in rows:
+            pdf.text(columns[0] + 1, row_top, transaction_date, size)
+            pdf.text(columns[1] + 1, row_top, posting_date, size)
+            pdf.text(columns[2] + 2, row_top, description, size)
+            pdf.text_right(columns[4] - 2, row_top, amount, size)
+            row_top += row_height
+
+    def _write_legal_text(self, pdf):
+        """Writes a page of boilerplate text with no amounts, as found at the end of the visa statements"""
+        top = 60
+        for line_number in range(45):
+            pdf.text(57, top, self.legal_text[line_number % len(self.legal_text)], size=7)
+            top += 15
+
+    def _split_rows(self, rows, pages):
+        """Spreads the table rows evenly across the pages, raising if a page would overflow its table region"""
+        pages = max(1, pages)
+        rows_per_page = -(-len(rows) // pages)
+        if rows_per_page > self.max_rows_per_page:
+            raise ValueError("{} rows do not fit on {} pages, increase the page count".format(len(rows), pages))
+        return [rows[start:start + rows_per_page] for start in range(0, len(rows), rows_per_page)] or [[]]
+
+    def _random_transactions(self, statement_start, statement_end, transactions, descriptions, deposit_probability):
+        """Random (date, description, amount in cents) transactions sorted by date within the statement period"""
+        period_days = (statement_end - statement_start).days
+        dates = sorted(statement_start + datetime.timedelta(days=self.random.randint(0, period_days))
+                       for _ in range(transactions))
+        statement_transactions = []
+        for date in dates:
+            if self.random.random() < deposit_probability:
+                amount = self.random.randint(10000, 300000)
+            else:
+                amount = -self.random.randint(100, 40000)
+            statement_transactions.append((date, self.random.choice(descriptions), amount))
+        return statement_transactions
+
+    def _statement_start(self, statement_end):
+        """The statement period starts the day after the same day of the previous month"""
+        return self._add_months(statement_end, -1) + datetime.timedelta(days=1)
+
+    def _add_months(self, date, months):
+        """Moves a date by a number of months, clamping the day to the length of the target month"""
+        month_index = date.year * 12 + date.month - 1 + months
+        year, month = divmod(month_index, 12)
+        day = min(date.day, calendar.monthrange(year, month + 1)[1])
+        return datetime.date(year, month + 1, day)
+
+    def _visa_date(self, date):
+        """Formats a date like the visa statements, e.g. 'JUN13'"""
+        return "{}{:02d}".format(calendar.month_abbr[date.month].upper(), date.day)
+
+    def _format_money(self, cents, dollar_sign=False):
+        """Formats cents as statement money text, e.g. '1,234.56' or '-$1,234.56'"""
+        sign = "-" if cents < 0 else ""
+        dollars, remainder = divmod(abs(cents), 100)
+        return "{}{}{:,}.{:02d}".format(sign, "$" if dollar_sign else "", dollars, remainder)
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+
+        # Column boundaries matching the StatementProcessor explicit_vertical_lines
+        self.chequing_columns_odd_pages = [45, 85, 300, 400, 500, 595]
+        self.chequing_columns_even_pages = [15, 55, 270, 370, 470, 565]
+        self.visa_columns = [57, 95, 128, 305, 350]
+
+        # Rows that fit in the smallest table region (the bottom half of the first chequing page)
+        self.max_rows_per_page = 24
+
+        self.chequing_descriptions = [
+            "Interac purchase - 9999 GROCERY CO",
+            "Contactless Interac purchase - 1234 COFFEE",
+            "Bill Payment HYDRO",
+            "Payroll Deposit ACME INC",
+            "e-Transfer sent FRIEND",
+            "Monthly fee",
+            "ATM withdrawal - 0421",
+        ]
+        self.visa_descriptions = [
+            "AMAZON.CA*AB1CD23E4 AMAZON.CA ON",
+            "TIM HORTONS #9999 TORONTO ON",
+            "UBER CANADA/UBEREATS TORONTO ON",
+            "PETRO-CAN TAUNTON RD TORONTO ON",
+            "PAYMENT - THANK YOU",
+            "MCDONALD'S 12345 TORONTO ON",
+        ]
+        self.legal_text = [
+            "Interest rates and fees are subject to change. Please refer to your cardholder agreement.",
+            "If you pay your balance in full by the payment due date you will not be charged interest.",
+            "Minimum payments only will take longer to pay off the balance and increase interest paid.",
+        ]
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from pandas.api.types import union_categoricals
+
+class TransactionFrame:
+    """
+    A class used to hold the extracted transactions compactly in memory.
+
+    Amounts are held as exact int64 cents (nullable, as amounts that could not be parsed stay missing) and dates as
+    datetime64. The statements are merged untagged and only then tagged with their hierarchy (Bank, Level 1..N) and
+    Filepath, as categorical columns built once from the structured data, so each row holds a small integer code per
+    column instead of a reference to a copy of every hierarchy string. Amounts are only turned back into dollars when
+    the output is written.
+    """
+
+    def compact(self, statement_df):
+        """Compacts the standardized transactions of one statement, amounts to int64 cents and dates to datetime64
+
+        :param statement_df: Standardized transactions of a statement (Date, Description, Amount in dollars)
+        :return: DataFrame of the compact transactions
+        """
+        transactions = statement_df.copy(deep=False)
+
+        # Amounts are parsed from cents in the first place, so rounding back to cents is exact
+        amount_cents = np.rint(transactions[self.amount_column].to_numpy(dtype=np.float64, na_value=np.nan) * self.cents_per_dollar)
+        transactions[self.amount_column] = pd.array(amount_cents, dtype="Int64")
+        transactions[self.date_column] = pd.to_datetime(transactions[self.date_column])
+
+        return transactions
+
+    def tag_statements(self, transaction_dfs, statement_hierarchy):
+        """Merges the compact transactions of statements and tags every row with the hierarchy of its statement
+
+        :param transaction_dfs: List of compact transaction DataFrames, one per statement
+        :param statement_hierarchy: DataFrame of the hierarchy and Filepath columns, one row per statement in the same
+            order as transaction_dfs
+        :return: Single compact DataFrame with one categorical column per hierarchy column
+        """
+        transactions = pd.concat(transaction_dfs, axis=0).reset_index(drop=True)
+
+        # Position of the statement of every row
+        statement_of_row = np.repeat(np.arange(len(transaction_dfs)), [x.shape[0] for x in transaction_dfs])
+
+        for column in statement_hierarchy.columns:
+            statement_values = pd.Categorical(statement_hierarchy[column].astype(str))
+            transactions[column] = pd.Categorical.from_codes(statement_values.codes[statement_of_row], dtype=statement_values.dtype)
+
+        return transactions
+
+    def concat(self, transaction_dfs):
+        """Merges tagged compact transaction frames, keeping the categorical columns categorical
+
+        pd.concat turns categorical columns whose categories differ into object columns, so the categorical columns
+        are merged separately with their categories unioned. A categorical column missing from a frame is missing
+        (NaN) on its rows.
+
+        :param transaction_dfs: List of compact transaction DataFrames
+        :return: Single compact DataFrame with a fresh index
+        """
+        columns = list(dict.fromkeys(column for transaction_df in transaction_dfs for column in transaction_df.columns))
+        categorical_columns = [column for column in columns if any(column in x.columns and isinstance(x[column].dtype, pd.CategoricalDtype)
+                                                                   for x in transaction_dfs)]
+
+        merged_transactions = pd.concat([x.drop(columns=[column for column in categorical_columns if column in x.columns])
+                                         for x in transaction_dfs], axis=0).reset_index(drop=True)
+
+        for column in categorical_columns:
+            merged_transactions[column] = union_categoricals(
+                [self._as_categorical(x[column]) if column in x.columns else pd.Categorical([np.nan] * x.shape[0], categories=[])
+                 for x in transaction_dfs], sort_categories=True)
+
+        return merged_transactions[columns]
+
+    def fill_missing(self, transactions, column_names, fill_value):
+        """Fills the missing values of categorical columns, adding the fill value as a category where it is needed
+
+        :param transactions: Compact transaction DataFrame, changed in place
+        :param column_names: Categorical columns to fill
+        :param fill_value: Value replacing the missing values
+        :return: The transaction DataFrame
+        """
+        for column in column_names:
+            column_values = self._as_categorical(transactions[column])
+            if column_values.isna().any():
+                if fill_value not in column_values.categories:
+                    column_values = column_values.add_categories([fill_value])
+                column_values = column_values.fillna(fill_value)
+            transactions[column] = column_values
+
+        return transactions
+
+    def from_output(self, output_df, column_names):
+        """Compacts transactions read back from a previously written output (amounts in dollars, text hierarchy)
+
+        :param output_df: DataFrame read from the output
+        :param column_names: Hierarchy and Filepath columns, those present in the output are made categorical
+        :return: Compact transaction DataFrame
+        """
+        transactions = self.compact(output_df)
+        for column in column_names:
+            if column in transactions.columns:
+                transactions[column] = self._as_categorical(transactions[column].astype(str))
+
+        return transactions
+
+    def to_output(self, transactions):
+        """Turns compact transactions into the output layout, with the amounts back in dollars
+
+        :param transactions: Compact transaction DataFrame
+        :return: DataFrame for writing, sharing the other columns with the compact frame
+        """
+        output_df = transactions.copy(deep=False)
+        output_df[self.amount_column] = output_df[self.amount_column].to_numpy(dtype=np.float64, na_value=np.nan) / self.cents_per_dollar
+
+        return output_df
+
+    def _as_categorical(self, column_values):
+        """Categorical values of a column, converting it if it is not categorical yet"""
+        if isinstance(column_values.dtype, pd.CategoricalDtype):
+            return column_values.array
+        return pd.Categorical(column_values)
+
+    def __init__(self):
+        self.amount_column = "Amount"
+        self.date_column = "Date"
+        self.cents_per_dollar = 100
@@ -1,3 +1,6 @@
+import os
+import re
+import tempfile
 import unittest
 from financeanalytics import dataloader
 from pathlib import Path
@@ -5,74 +8,6 @@ import pandas as pd
 
 class TestDataLoader(unittest.TestCase):
 
-    def test_detect_relevant_files_default_value(self):
-        input_files = ["root_folder/RBC/Chequing/empty.pdf",
-                       "root_folder/RbC/Chequing/empty.pdf",
-                       "root_folder/rbc/Chequing/empty.pdf",
-                       "root_folder/TD/Chequing/empty.pdf",
-                       "root_folder/td/Chequing/empty.pdf",
-                       "root_folder/nonbank/Chequing/empty.pdf"
-                       ]
-
-        expected_files = ["root_folder/RBC/Chequing/empty.pdf",
-                          "root_folder/RbC/Chequing/empty.pdf",
-                          "root_folder/rbc/Chequing/empty.pdf"
-                       ]
-
-        proper_input = [Path(x) for x in input_files]
-        expected_output = [Path(x) for x in expected_files]
-
-        DataLoader = dataloader.DataLoader()
-
-        actual_output = DataLoader._remove_unsupported_banks(proper_input)
-
-        self.assertEqual(expected_output, actual_output)
-
-    def test_detect_relevant_files_multi_bank(self):
-        input_files = ["root_folder/RBC/Chequing/empty.pdf",
-                       "root_folder/RbC/Chequing/empty.pdf",
-                       "root_folder/rbc/Chequing/empty.pdf",
-                       "root_folder/TD/Chequing/empty.pdf",
-                       "root_folder/td/Chequing/empty.pdf",
-                       "root_folder/nonbank/Chequing/empty.pdf"
-                       ]
-
-        expected_files = ["root_folder/RBC/Chequing/empty.pdf",
-                          "root_folder/RbC/Chequing/empty.pdf",
-                          "root_folder/rbc/Chequing/empty.pdf",
-                          "root_folder/TD/Chequing/empty.pdf",
-                          "root_folder/td/Chequing/empty.pdf",
-                       ]
-
-        proper_input = [Path(x) for x in input_files]
-        expected_output = [Path(x) for x in expected_files]
-
-        DataLoader = dataloader.DataLoader(supported_banks=["rbc", "td"])
-
-        actual_output = DataLoader._remove_unsupported_banks(proper_input)
-
-        self.assertEqual(expected_output, actual_output)
-
-    def test_filter_files_missing_dates(self):
-        input_files = ["root_folder/RBC/Chequing/Chequing Statement-9999 2000-01-01.pdf",
-                       "root_folder/RBC/Chequing/Chequing Statement-9999.pdf",
-                       "root_folder/RBC/Visa/Visa Statement-0000 2000-01-01.pdf",
-                       "root_folder/RBC/Visa/Visa Statement-0000.pdf",
-                       ]
-
-        expected_files = ["root_folder/RBC/Chequing/Chequing Statement-9999 2000-01-01.pdf",
-                          "root_folder/RBC/Visa/Visa Statement-0000 2000-01-01.pdf"
-                       ]
-
-        proper_input = [Path(x) for x in input_files]
-        expected_output = [Path(x) for x in expected_files]
-
-        DataLoader = dataloader.DataLoader()
-
-        actual_output = DataLoader._remove_files_missing_dates(proper_input)
-
-        self.assertEqual(expected_output, actual_output)
-
     def test_structure_data_1(self):
         # Testing for mixed scenario
         input_files = ["C:/root_folder/RBC/GroupA/GroupA-1/Statement 2000-01-01.pdf",
@@ -202,5 +137,106 @@ class TestDataLoader(unittest.TestCase):
 
         pd.testing.assert_frame_equal(expected_output, actual_output)
 
+    def test_scan_statement_files(self):
+        with tempfile.TemporaryDirectory() as root_folder:
+            input_files = ["RBC/Chequing/Chequing Statement-0000 2000-01-11.pdf",
+                           "RBC/Chequing/Chequing Statement-0000.pdf",
+                           "RBC/Visa/Visa Statement-0000.pdf",
+                           "RBC/Chequing/notes 2000-01-11.txt",
+                           "RBC/Visa/2000-02-11/Visa Statement.pdf",
+                           "RBC/Statement 2000-03-01.pdf",
+                           "TD/Chequing/Chequing Statement-0000 2000-01-11.pdf",
+                           "NonBank/RBC/Chequing Statement-0000 2000-01-11.pdf",
+                           "Statement 2000-01-01.pdf"]
+            for input_file in input_files:
+                Path(root_folder, input_file).parent.mkdir(parents=True, exist_ok=True)
+                Path(root_folder, input_file).write_bytes(b"")
+
+            expected_files = ["RBC/Chequing/Chequing Statement-0000 2000-01-11.pdf",
+                              "RBC/Visa/2000-02-11/Visa Statement.pdf",
+                              "RBC/Statement 2000-03-01.pdf"]
+
+            DataLoader = dataloader.DataLoader()
+
+            bank_directories = DataLoader._detect_bank_directories(root_folder)
+            actual_output = DataLoader._scan_statement_files(root_folder, bank_directories)
+
+            self.assertEqual(sorted(Path(root_folder, x) for x in expected_files), sorted(actual_output))
+
+            # Same order as globbing and filtering, whether or not the sub folders are walked in parallel
+            glob_output = [x for x in Path(root_folder, "RBC").glob("**/*.pdf") if re.search(DataLoader.datestamp_pattern, str(x))]
+            self.assertEqual(glob_output, actual_output)
+            self.assertEqual(actual_output, DataLoader._scan_statement_files(root_folder, bank_directories, scan_workers=4))
+
+    def test_scan_statement_files_of_supported_banks(self):
+        with tempfile.TemporaryDirectory() as root_folder:
+            input_files = ["RBC/Chequing/Chequing Statement-0000 2000-01-11.pdf",
+                           "td/Chequing/Chequing Statement-0000 2000-01-11.pdf",
+                           "nonbank/Chequing/Chequing Statement-0000 2000-01-11.pdf",
+                           "Chequing/RBC/Chequing Statement-0000 2000-01-11.pdf"]
+            for input_file in input_files:
+                Path(root_folder, input_file).parent.mkdir(parents=True, exist_ok=True)
+                Path(root_folder, input_file).write_bytes(b"")
+
+            # Only the Bank folders directly below the root count, in any case
+            for supported_banks, expected_files in [(["rbc"], input_files[:1]), (["rbc", "td"], input_files[:2])]:
+                DataLoader = dataloader.DataLoader(supported_banks=supported_banks)
+
+                bank_directories = DataLoader._detect_bank_directories(root_folder)
+                actual_output = DataLoader._scan_statement_files(root_folder, bank_directories)
+
+                self.assertEqual(sorted(Path(root_folder, x) for x in expected_files), sorted(actual_output))
+
+    def test_detect_bank_directories_case_insensitive(self):
+        with tempfile.TemporaryDirectory() as root_folder:
+            for folder in ["rBc", "td", "NonBank"]:
+                Path(root_folder, folder).mkdir()
+            Path(root_folder, "rbc.pdf").write_bytes(b"")
+
+            DataLoader = dataloader.DataLoader(supported_banks=["rbc", "TD"])
+
+            actual_output = DataLoader._detect_bank_directories(root_folder)
+
+            self.assertEqual(sorted([Path(root_folder, "rBc"), Path(root_folder, "td")]), sorted(actual_output))
+
+    def test_statement_catalog_rescan(self):
+        with tempfile.TemporaryDirectory() as root_folder:
+            catalog_path = Path(root_folder, "catalog.sqlite")
+            statement_root = Path(root_folder, "statements")
+            input_files = ["RBC/Chequing/Chequing Statement-0000 2000-01-11.pdf",
+                           "RBC/Chequing/Chequing Statement-0000 2000-02-11.pdf",
+                           "RBC/Visa/Visa Statement-0000 2000-01-11.pdf",
+                           "RBC/Visa/Old/Visa Statement-0000 1999-12-11.pdf"]
+            for input_file in input_files:
+                Path(statement_root, input_file).parent.mkdir(parents=True, exist_ok=True)
+                Path(statement_root, input_file).write_bytes(b"")
+
+            # Pretend the folders were last modified long before the scan
+            for folder in ["RBC", "RBC/Chequing", "RBC/Visa", "RBC/Visa/Old"]:
+                os.utime(Path(statement_root, folder), ns=(0, 0))
+
+            DataLoader = dataloader.DataLoader()
+            first_scan = DataLoader.load_data(str(statement_root), catalog_path=catalog_path)
+
+            pd.testing.assert_frame_equal(dataloader.DataLoader().load_data(str(statement_root)), first_scan)
+
+            # A folder whose modification time did not change is taken from the catalog without being listed
+            Path(statement_root, "RBC/Chequing/Chequing Statement-0000 2000-03-11.pdf").write_bytes(b"")
+            os.utime(Path(statement_root, "RBC/Chequing"), ns=(0, 0))
+
+            pd.testing.assert_frame_equal(first_scan, dataloader.DataLoader().load_data(str(statement_root), catalog_path=catalog_path))
+
+            # Changed folders are listed again and removed folders dropped
+            os.utime(Path(statement_root, "RBC/Chequing"), ns=(10 ** 9, 10 ** 9))
+            for input_file in ["RBC/Visa/Old/Visa Statement-0000 1999-12-11.pdf"]:
+                Path(statement_root, input_file).unlink()
+            Path(statement_root, "RBC/Visa/Old").rmdir()
+
+            expected_output = dataloader.DataLoader().load_data(str(statement_root))
+            actual_output = dataloader.DataLoader().load_data(str(statement_root), catalog_path=catalog_path)
+
+            pd.testing.assert_frame_equal(expected_output, actual_output)
+            self.assertEqual(3, len(actual_output[actual_output["Level 1"] == "CHEQUING"]))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,6 +1,7 @@
 import unittest
 from financeanalytics import dataquality
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 class TestDataQuality(unittest.TestCase):
@@ -331,5 +332,65 @@ class TestDataQuality(unittest.TestCase):
 
         pd.testing.assert_frame_equal(expected_output, actual_output)
 
+    def test_gap_detection_matches_daily_range(self):
+
+        def find_missing_dates(start_date, end_date, all_dates):
+            missing_daily_dates = list(pd.date_range(start_date, end_date).difference(pd.to_datetime(all_dates)).strftime('%Y-%m-%d'))
+            return [x for x in missing_daily_dates if x[-2:] == "01"]
+
+        months = pd.date_range("1995-01-01", "2004-12-01", freq="MS").strftime('%Y-%m-%d')
+        input_rows = []
+        for hierarchy in range(40):
+            all_dates = list(months[hierarchy % 7::(hierarchy % 5) + 1][:hierarchy + 1])
+            input_rows.append(["RBC", "Account {}".format(hierarchy), all_dates[0], all_dates[-1], all_dates])
+
+        input_data = pd.DataFrame(input_rows, columns=["Bank", "Level 1", "min_date", "max_date", "all_dates"], index=range(100, 140))
+
+        expected_gaps = [find_missing_dates(x[2], x[3], x[4]) for x in input_rows]
+
+        DataQuality = dataquality.DataQuality()
+
+        actual_output = DataQuality._identify_data_gaps(input_data)
+
+        self.assertEqual(expected_gaps, actual_output["all_gaps"].tolist())
+
+    def test_balance_continuity_breaks(self):
+
+        input_data = pd.DataFrame([["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-02-09.pdf", 2000, 150.25, 80.0],
+                                   ["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-01-06.pdf", 2000, 100.0, 150.25],
+                                   ["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-04-06.pdf", 2000, 60.0, 10.0],
+                                   ["RBC", "Visa", "C:/root_folder/RBC/Visa/Statement 2000-01-11.pdf", 2000, 0.0, 20.5],
+                                   ["RBC", "Visa", "C:/root_folder/RBC/Visa/Statement 2000-02-11.pdf", 2000, 20.5, 35.1]],
+                                  columns=["Bank", "Level 1", "Filepath", "Year", "Opening Balance", "Closing Balance"])
+
+        expected_output = pd.DataFrame([["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-04-06.pdf", 80.0, 60.0, -20.0]],
+                                       columns=["Bank", "Level 1", "Filepath", "Previous Closing Balance", "Opening Balance", "Difference"])
+
+        DataQuality = dataquality.DataQuality()
+
+        actual_output = DataQuality.analyze_balance_continuity(input_data)
+
+        pd.testing.assert_frame_equal(expected_output, actual_output)
+        self.assertNotIn("MonthStamp", input_data.columns)
+
+    def test_balance_continuity_unknown(self):
+
+        input_data = pd.DataFrame([["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-01-06.pdf", 2000, None, 150.25],
+                                   ["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-02-09.pdf", 2000, 150.25, None],
+                                   ["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-03-06.pdf", 2000, 80.0, 60.0],
+                                   ["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-04-06.pdf", 2000, None, 10.0]],
+                                  columns=["Bank", "Level 1", "Filepath", "Year", "Opening Balance", "Closing Balance"])
+
+        expected_output = pd.DataFrame([["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-03-06.pdf", np.nan, 80.0, np.nan],
+                                        ["RBC", "Chequing", "C:/root_folder/RBC/Chequing/Statement 2000-04-06.pdf", 60.0, np.nan, np.nan]],
+                                       columns=["Bank", "Level 1", "Filepath", "Previous Closing Balance", "Opening Balance", "Difference"])
+
+        DataQuality = dataquality.DataQuality()
+
+        actual_output = DataQuality.analyze_balance_continuity(input_data)
+
+        # The first statement has nothing to continue from, the unread balances leave the others unknown
+        pd.testing.assert_frame_equal(expected_output, actual_output)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,95 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+from financeanalytics import extractioncache
+from pathlib import Path
+import pandas as pd
+
+class TestExtractionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.temporary_directory.name)
+
+        self.statement = self.root / "Chequing Statement-0000 2020-01-11.pdf"
+        self.statement.write_bytes(b"%PDF-1.4 statement content")
+
+        self.transactions = pd.DataFrame(
+            [[datetime.datetime.strptime("2020-01-04", '%Y-%m-%d'), "Interacpurchase-7777 BIGBOXSTORE#", -22.22],
+             [datetime.datetime.strptime("2020-01-11", '%Y-%m-%d'), "BIGMONEY-NOWHAMMIES", 1000.00]],
+            columns=["Date", "Description", "Amount"])
+        self.metadata = (2020, 500.00, 1477.78)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_store_and_load_round_trip(self):
+        ExtractionCache = extractioncache.ExtractionCache(self.root / "cache")
+
+        cache_key = ExtractionCache.cache_key(self.statement, "RBC", "Chequing", "fingerprint")
+        self.assertIsNone(ExtractionCache.load(cache_key))
+
+        ExtractionCache.store(cache_key, self.transactions, self.metadata)
+        (actual_transactions, actual_metadata) = ExtractionCache.load(cache_key)
+
+        pd.testing.assert_frame_equal(self.transactions, actual_transactions)
+        self.assertEqual(self.metadata, actual_metadata)
+
+    def test_cache_key_changes_with_content_and_parser(self):
+        ExtractionCache = extractioncache.ExtractionCache(self.root / "cache")
+
+        original_key = ExtractionCache.cache_key(self.statement, "RBC", "Chequing", "fingerprint")
+
+        self.assertNotEqual(original_key, ExtractionCache.cache_key(self.statement, "RBC", "Visa", "fingerprint"))
+        self.assertNotEqual(original_key, ExtractionCache.cache_key(self.statement, "RBC", "Chequing", "other"))
+
+        self.statement.write_bytes(b"%PDF-1.4 re-downloaded statement content")
+        self.assertNotEqual(original_key, ExtractionCache.cache_key(self.statement, "RBC", "Chequing", "fingerprint"))
+
+    def test_least_recently_used_entries_evicted(self):
+        ExtractionCache = extractioncache.ExtractionCache(self.root / "cache")
+
+        ExtractionCache.store("first", self.transactions, self.metadata)
+        entry_size = os.path.getsize(self.root / "cache" / "first.pkl")
+        ExtractionCache.max_size_bytes = 2 * entry_size
+
+        ExtractionCache.store("second", self.transactions, self.metadata)
+        os.utime(self.root / "cache" / "first.pkl", (0, 0))
+        os.utime(self.root / "cache" / "second.pkl", (1, 1))
+
+        # Reading the first entry marks it as recently used, so the second entry is evicted next
+        ExtractionCache.load("first")
+        ExtractionCache.store("third", self.transactions, self.metadata)
+
+        self.assertIsNotNone(ExtractionCache.load("first"))
+        self.assertIsNone(ExtractionCache.load("second"))
+        self.assertIsNotNone(ExtractionCache.load("third"))
+
+    def test_cache_folder_only_scanned_past_the_limit(self):
+        ExtractionCache = extractioncache.ExtractionCache(self.root / "cache")
+
+        with mock.patch.object(ExtractionCache, "_evict", wraps=ExtractionCache._evict) as evict:
+            ExtractionCache.store("first", self.transactions, self.metadata)
+            entry_size = os.path.getsize(self.root / "cache" / "first.pkl")
+            ExtractionCache.max_size_bytes = 3 * entry_size
+
+            ExtractionCache.store("second", self.transactions, self.metadata)
+            ExtractionCache.store("third", self.transactions, self.metadata)
+            self.assertEqual(1, evict.call_count)
+
+            ExtractionCache.store("fourth", self.transactions, self.metadata)
+            self.assertEqual(2, evict.call_count)
+
+        self.assertEqual(3, len(list((self.root / "cache").glob("*.pkl"))))
+
+    def test_rebuild_ignores_existing_entries(self):
+        extractioncache.ExtractionCache(self.root / "cache").store("key", self.transactions, self.metadata)
+
+        ExtractionCache = extractioncache.ExtractionCache(self.root / "cache", rebuild=True)
+
+        self.assertIsNone(ExtractionCache.load("key"))
+
+if __name__ == '__main__':
+    unittest.main()
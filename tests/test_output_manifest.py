@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+from financeanalytics import outputmanifest
+from pathlib import Path
+
+class TestOutputManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.temporary_directory.name)
+
+        self.statements = [self.root / "Chequing Statement-0000 2020-01-11.pdf",
+                           self.root / "Chequing Statement-0000 2020-02-11.pdf",
+                           self.root / "Chequing Statement-0000 2020-03-11.pdf"]
+        for statement in self.statements:
+            statement.write_bytes(b"%PDF-1.4")
+
+        self.manifest_path = self.root / "output_table.xlsx.manifest.json"
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_empty_manifest_reports_all_statements_new(self):
+        OutputManifest = outputmanifest.OutputManifest(self.manifest_path)
+
+        expected_output = ([str(x) for x in self.statements], [])
+
+        self.assertEqual(expected_output, OutputManifest.compare(self.statements))
+
+    def test_detect_new_changed_and_removed_statements(self):
+        OutputManifest = outputmanifest.OutputManifest(self.manifest_path)
+        OutputManifest.record(self.statements[:2], "xlsx")
+        OutputManifest.save()
+
+        # Change the first statement and add a third one, then drop the second statement from the tree
+        self.statements[0].write_bytes(b"%PDF-1.4 re-downloaded")
+        current_statements = [self.statements[0], self.statements[2]]
+
+        expected_output = ([str(self.statements[0]), str(self.statements[2])], [str(self.statements[1])])
+
+        actual_output = outputmanifest.OutputManifest(self.manifest_path).compare(current_statements)
+
+        self.assertEqual(expected_output, actual_output)
+
+    def test_unchanged_statements_after_reload(self):
+        OutputManifest = outputmanifest.OutputManifest(self.manifest_path)
+        OutputManifest.record(self.statements, "xlsx")
+        OutputManifest.save()
+
+        self.assertEqual(([], []), outputmanifest.OutputManifest(self.manifest_path).compare(self.statements))
+
+    def test_matches_output_format(self):
+        output_path = self.root / "output_table.xlsx"
+        OutputManifest = outputmanifest.OutputManifest(self.manifest_path)
+        OutputManifest.record(self.statements, "xlsx")
+
+        self.assertFalse(OutputManifest.matches(output_path, "xlsx"))
+
+        output_path.write_bytes(b"")
+
+        self.assertTrue(OutputManifest.matches(output_path, "xlsx"))
+        self.assertFalse(OutputManifest.matches(output_path, "csv"))
+
+if __name__ == '__main__':
+    unittest.main()
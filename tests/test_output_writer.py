@@ -0,0 +1,92 @@
+import datetime
+import json
+import tempfile
+import unittest
+from financeanalytics import outputwriter
+from pathlib import Path
+import pandas as pd
+
+class TestOutputWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.temporary_directory.name)
+
+        self.statements = [
+            pd.DataFrame([[datetime.datetime.strptime("2020-06-13", '%Y-%m-%d'), "AMAZON.CA*AB1CD23E4AMAZON.CAON", 11.11, "RBC", "VISA", "root/RBC/Visa/Visa Statement-0000 2020-07-11.pdf"],
+                          [datetime.datetime.strptime("2020-06-24", '%Y-%m-%d'), "PAYMENT-THANKYOU/PAIEMENT-MERCI", -1000.00, "RBC", "VISA", "root/RBC/Visa/Visa Statement-0000 2020-07-11.pdf"]],
+                         columns=["Date", "Description", "Amount", "Bank", "Level 1", "Filepath"]),
+            pd.DataFrame([[datetime.datetime.strptime("2020-08-12", '%Y-%m-%d'), "Interacpurchase-9999 TEST-CO", -222.22, "RBC", "CHEQUING", "root/RBC/Chequing/Chequing Statement-0000 2020-09-11.pdf"]],
+                         columns=["Date", "Description", "Amount", "Bank", "Level 1", "Filepath"]),
+        ]
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_streamed_csv_matches_single_write(self):
+        expected_path = self.root / "expected.csv"
+        pd.concat(self.statements, axis=0).reset_index(drop=True).to_csv(expected_path, index=False)
+
+        actual_path = self.root / "actual.csv"
+        with outputwriter.CsvStatementSink(actual_path) as CsvStatementSink:
+            for statement in self.statements:
+                CsvStatementSink.write(statement)
+
+        self.assertEqual(expected_path.read_bytes(), actual_path.read_bytes())
+        self.assertEqual(3, CsvStatementSink.rows_written)
+
+    def test_failed_stream_keeps_previous_output(self):
+        output_path = self.root / "output.csv"
+        output_path.write_text("previous output")
+
+        with self.assertRaises(ValueError):
+            with outputwriter.CsvStatementSink(output_path) as CsvStatementSink:
+                CsvStatementSink.write(self.statements[0])
+                CsvStatementSink.write(self.statements[1].drop(columns=["Level 1"]))
+
+        self.assertEqual("previous output", output_path.read_text())
+        self.assertFalse(CsvStatementSink.partial_path.exists())
+
+    def test_xlsx_rolls_over_to_new_sheets(self):
+        expected_output = pd.concat(self.statements, axis=0).reset_index(drop=True)
+
+        output_path = self.root / "output.xlsx"
+        with outputwriter.XlsxStatementSink(output_path, max_rows_per_sheet=3, chunk_rows=1) as XlsxStatementSink:
+            for statement in self.statements:
+                XlsxStatementSink.write(statement)
+
+        # The header row counts towards the row limit of every sheet
+        sheets = pd.read_excel(output_path, sheet_name=None)
+        self.assertEqual(["Sheet1", "Sheet1 (2)"], list(sheets.keys()))
+        pd.testing.assert_frame_equal(expected_output, pd.concat(sheets.values(), axis=0).reset_index(drop=True))
+        self.assertEqual(3, XlsxStatementSink.rows_written)
+
+    def test_xlsx_sheet_per_hierarchy_value(self):
+        output_path = self.root / "output.xlsx"
+        with outputwriter.XlsxStatementSink(output_path, sheet_by=["Bank", "Level 1"]) as XlsxStatementSink:
+            XlsxStatementSink.write(pd.concat(self.statements, axis=0).reset_index(drop=True))
+
+        sheets = pd.read_excel(output_path, sheet_name=None)
+        self.assertEqual(["RBC - VISA", "RBC - CHEQUING"], list(sheets.keys()))
+        self.assertEqual([2, 1], [x.shape[0] for x in sheets.values()])
+
+    def test_sharded_output_with_index(self):
+        all_statements = pd.concat(self.statements, axis=0).reset_index(drop=True)
+
+        output_path = self.root / "output.csv"
+        output_path.write_text("previous output")
+        ShardedOutputWriter = outputwriter.ShardedOutputWriter(output_path, "csv", ["Bank", "Level 1"], writers=2)
+        ShardedOutputWriter.write(all_statements)
+
+        index = json.loads((output_path / "index.json").read_text())
+        self.assertEqual([{"path": "RBC/VISA/output.csv", "values": {"Bank": "RBC", "Level 1": "VISA"}, "rows": 2,
+                           "first_date": "2020-06-13", "last_date": "2020-06-24"},
+                          {"path": "RBC/CHEQUING/output.csv", "values": {"Bank": "RBC", "Level 1": "CHEQUING"}, "rows": 1,
+                           "first_date": "2020-08-12", "last_date": "2020-08-12"}], index["shards"])
+
+        sharded_statements = pd.concat([pd.read_csv(x, parse_dates=["Date"]) for x in ShardedOutputWriter.shard_paths()], axis=0)
+        pd.testing.assert_frame_equal(all_statements, sharded_statements.reset_index(drop=True))
+        self.assertFalse(ShardedOutputWriter.partial_path.exists())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import unittest
+from financeanalytics import runprofiler
+from pathlib import Path
+
+class TestRunProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.temporary_directory.name)
+
+        self.statements = [
+            {"Filepath": "root/RBC/Chequing/Chequing Statement-0000 2020-01-11.pdf", "wall_seconds": 0.5, "cpu_seconds": 0.5,
+             "transactions": 11, "cached": False,
+             "stages": {"metadata": {"wall_seconds": 0.1, "cpu_seconds": 0.1},
+                        "table_extraction": {"wall_seconds": 0.3, "cpu_seconds": 0.25}}},
+            {"Filepath": "root/RBC/Visa/Visa Statement-0000 2020-01-11.pdf", "wall_seconds": 1.5, "cpu_seconds": 1.0,
+             "transactions": 8, "cached": False, "page_screening": {"screened_out": 2, "dropped_after_extraction": 1},
+             "stages": {"metadata": {"wall_seconds": 0.2, "cpu_seconds": 0.2},
+                        "table_extraction": {"wall_seconds": 1.2, "cpu_seconds": 0.75}}},
+        ]
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_stage_recorded(self):
+        RunProfiler = runprofiler.RunProfiler()
+
+        with RunProfiler.stage("load_data"):
+            sum(range(1000))
+
+        self.assertEqual(["load_data"], [x["stage"] for x in RunProfiler.stages])
+        self.assertGreaterEqual(RunProfiler.stages[0]["wall_seconds"], 0)
+        self.assertGreaterEqual(RunProfiler.stages[0]["cpu_seconds"], 0)
+
+    def test_stage_recorded_when_failed(self):
+        RunProfiler = runprofiler.RunProfiler()
+
+        with self.assertRaises(ValueError):
+            with RunProfiler.stage("extract_statements"):
+                raise ValueError("Statement failed")
+
+        self.assertEqual(["extract_statements"], [x["stage"] for x in RunProfiler.stages])
+
+    def test_stage_peak_memory_includes_statements_of_the_process(self):
+        RunProfiler = runprofiler.RunProfiler()
+
+        with RunProfiler.stage("extract_statements"):
+            RunProfiler.record_statement(dict(self.statements[0], peak_memory_bytes=2**50, process_id=os.getpid()))
+            RunProfiler.record_statement(dict(self.statements[1], peak_memory_bytes=2**51, process_id=-1))
+
+        self.assertEqual(2**50, RunProfiler.stages[0]["peak_memory_bytes"])
+        self.assertEqual([x["Filepath"] for x in reversed(self.statements)], RunProfiler.report()["highest_peak_memory_statements"])
+
+    def test_report_totals_and_slowest_statements(self):
+        RunProfiler = runprofiler.RunProfiler()
+        RunProfiler.start()
+        for statement_profile in self.statements:
+            RunProfiler.record_statement(statement_profile)
+        RunProfiler.stop()
+
+        expected_totals = {"metadata": {"wall_seconds": 0.3, "cpu_seconds": 0.3},
+                           "table_extraction": {"wall_seconds": 1.5, "cpu_seconds": 1.0}}
+
+        report = RunProfiler.report()
+
+        for stage_name, totals in expected_totals.items():
+            for measure, value in totals.items():
+                self.assertAlmostEqual(value, report["statement_stage_totals"][stage_name][measure])
+        self.assertEqual([self.statements[1]["Filepath"], self.statements[0]["Filepath"]], report["slowest_statements"])
+        self.assertEqual({"screened_out": 2, "dropped_after_extraction": 1}, report["page_screening_totals"])
+
+    def test_save_report_and_stats(self):
+        RunProfiler = runprofiler.RunProfiler(function_profile=True)
+        RunProfiler.start()
+        with RunProfiler.stage("write_output"):
+            sum(range(1000))
+        RunProfiler.stop()
+
+        RunProfiler.save(self.root / "profile.json", self.root / "profile.pstats")
+
+        self.assertEqual("write_output", json.loads((self.root / "profile.json").read_text())["stages"][0]["stage"])
+        self.assertTrue((self.root / "profile.pstats").exists())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import tempfile
+import threading
+import time
+import unittest
+from financeanalytics import statementpipeline
+from pathlib import Path
+
+def parse_statement(record, pdf_contents):
+    # Later statements finish first, so the writer has to put them back in order
+    time.sleep(0.01 * (5 - record["Position"] % 5))
+    return record["Position"], pdf_contents.decode("utf-8")
+
+def failing_parse_statement(record, pdf_contents):
+    if record["Position"] == 3:
+        raise ValueError("Statement could not be parsed")
+    return record["Position"], pdf_contents.decode("utf-8")
+
+class TestStatementPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.temporary_directory.name)
+
+        self.records = []
+        for position in range(12):
+            pdf_filepath = self.root / "Statement {}.pdf".format(position)
+            pdf_filepath.write_text("statement {}".format(position))
+            self.records.append({"Position": position, "Filepath": str(pdf_filepath)})
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_results_written_in_order(self):
+        for workers in [1, 3]:
+            written = []
+            written_threads = []
+            StatementPipeline = statementpipeline.StatementPipeline(workers=workers, queue_depth=2)
+
+            StatementPipeline.run(self.records, parse_statement, lambda position, result: written.append((position, result)),
+                                  lambda: written_threads.append((len(written), threading.current_thread())))
+
+            self.assertEqual([(x, (x, "statement {}".format(x))) for x in range(12)], written)
+            # Told about every statement once written, on the thread running the pipeline (e.g. to update a GUI)
+            self.assertEqual([(x + 1, threading.current_thread()) for x in range(12)], written_threads)
+
+    def test_statements_in_flight_bounded(self):
+        read_positions = []
+        in_flight = []
+
+        def write_statement(position, result):
+            in_flight.append(len(read_positions) - position)
+
+        StatementPipeline = statementpipeline.StatementPipeline(workers=1, queue_depth=2)
+        original_put = StatementPipeline._put
+
+        async def tracked_put(queue, item):
+            if queue is StatementPipeline.read_queue and item is not None:
+                read_positions.append(item[0])
+            await original_put(queue, item)
+
+        StatementPipeline._put = tracked_put
+        StatementPipeline.run(self.records, parse_statement, write_statement)
+
+        self.assertLessEqual(max(in_flight), 2 * 2 + 1)
+
+    def test_report_queues_and_stages(self):
+        StatementPipeline = statementpipeline.StatementPipeline(workers=1, queue_depth=4)
+
+        report = StatementPipeline.run(self.records, parse_statement, lambda position, result: None)
+
+        self.assertEqual({"read", "parsed"}, set(report["queues"]))
+        self.assertEqual({"read", "parse", "write"}, set(report["stages"]))
+        self.assertLessEqual(report["queues"]["read"]["max_occupancy"], 4)
+        self.assertGreater(report["stages"]["parse"]["utilization"], 0)
+
+    def test_failed_statement_stops_pipeline(self):
+        StatementPipeline = statementpipeline.StatementPipeline(workers=1, queue_depth=2)
+
+        with self.assertRaises(ValueError):
+            StatementPipeline.run(self.records, failing_parse_statement, lambda position, result: None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import datetime
 import unittest
+from unittest import mock
 from financeanalytics import statementprocessor
 import pandas as pd
 
@@ -318,6 +319,113 @@ class TestStatementProcessor(unittest.TestCase):
 
         self.assertTrue('day is out of range for month' in str(context.exception))
 
+    def test_convert_dates_to_datestamps_vectorized(self):
+        # Month-first and day-first tokens, December rolls back a year because the statement holds January dates
+        # Spaced tokens ('JAN 05', '6 Jan') as accepted by the earlier per token parsing
+        input_data = pd.Series(["DEC28", "dec31", "1Jan", "04JAN", "JAN 05", "6 Jan", "12Jan"], name="Date")
+        input_year = 2021
+
+        expected_output = pd.Series([datetime.datetime.strptime("2020-12-28", '%Y-%m-%d'),
+                                     datetime.datetime.strptime("2020-12-31", '%Y-%m-%d'),
+                                     datetime.datetime.strptime("2021-01-01", '%Y-%m-%d'),
+                                     datetime.datetime.strptime("2021-01-04", '%Y-%m-%d'),
+                                     datetime.datetime.strptime("2021-01-05", '%Y-%m-%d'),
+                                     datetime.datetime.strptime("2021-01-06", '%Y-%m-%d'),
+                                     datetime.datetime.strptime("2021-01-12", '%Y-%m-%d')], name="Date")
+
+        StatementProcessor = statementprocessor.StatementProcessor()
+
+        actual_output = StatementProcessor._convert_dates_to_datestamps(input_data, input_year)
+
+        pd.testing.assert_series_equal(expected_output, actual_output)
+
+    def test_invalid_vectorized_date_conversion(self):
+        StatementProcessor = statementprocessor.StatementProcessor()
+
+        # Feb 29 for non-leap year
+        with self.assertRaises(ValueError) as context:
+            StatementProcessor._convert_dates_to_datestamps(pd.Series(["FEB28", "FEB29"]), 2021)
+
+        self.assertTrue('day is out of range for month' in str(context.exception))
+
+        with self.assertRaises(ValueError) as context:
+            StatementProcessor._convert_dates_to_datestamps(pd.Series(["FEB28", "Total"]), 2021)
+
+        self.assertTrue('Total' in str(context.exception))
+
+    def test_parse_money_to_cents(self):
+        input_data = pd.Series(["$1,866.67", "-$1,000.00", "($22.22)", "1,000", "0.5", " $3.10 ", "", None])
+
+        expected_cents = pd.Series([186667, -100000, -2222, 100000, 50, 310, None, None], dtype="Int64")
+        expected_failed = pd.Series([False] * 8)
+
+        StatementProcessor = statementprocessor.StatementProcessor()
+
+        (actual_cents, actual_failed) = StatementProcessor._parse_money_to_cents(input_data)
+
+        pd.testing.assert_series_equal(expected_cents, actual_cents)
+        pd.testing.assert_series_equal(expected_failed, actual_failed)
+
+    def test_parse_money_reports_failed_rows(self):
+        # 17 integer digits do not fit in int64 once scaled to cents
+        input_data = pd.Series(["$11.11", "Total", "1,23.45", "2.222", "$2.22", "99999999999999999", "9999999999999999.99"], name="Amount")
+
+        expected_output = pd.Series([11.11, None, None, None, 2.22, None, 9999999999999999.99], dtype="float64", name="Amount")
+
+        StatementProcessor = statementprocessor.StatementProcessor()
+
+        with self.assertLogs(level="WARNING") as logs:
+            actual_output = StatementProcessor._parse_money_column(input_data, "Amount")
+
+        pd.testing.assert_series_equal(expected_output, actual_output)
+        self.assertTrue("rows [1, 2, 3, 5]" in logs.output[0])
+
+    def test_unparseable_chequing_amount_stays_missing(self):
+        input_data = pd.DataFrame([["12Aug", "Interacpurchase-9999 TEST-CO", "222.22", "", "888.89"],
+                                   ["13Aug", "BIGMONEY-NOWHAMMIES", "", "1,0OO.00", "1888.89"],
+                                   ["", "BillPayment BIGBILLS", "11.11", "  ", "1877.78"]],
+                                  columns=["Date", "Description", "Withdrawals", "Deposits", "Balance"])
+
+        StatementProcessor = statementprocessor.StatementProcessor()
+
+        with self.assertLogs(level="WARNING"):
+            actual_output = StatementProcessor.standardized_rbc_chequing_transactions(input_data, 2020)
+
+        # Empty cells count as 0, the deposit that could not be parsed is not turned into $0
+        self.assertEqual([-222.22, -11.11], list(actual_output["Amount"].dropna()))
+        self.assertTrue(pd.isna(actual_output["Amount"][1]))
+
+    def test_explicit_column_extractor_needs_explicit_columns(self):
+
+        with self.assertRaises(ValueError):
+            statementprocessor.ExplicitColumnTableExtractor({"vertical_strategy": "lines", "horizontal_strategy": "lines"})
+
+        with self.assertRaises(ValueError):
+            statementprocessor.ExplicitColumnTableExtractor({"vertical_strategy": "explicit", "horizontal_strategy": "explicit",
+                                                             "explicit_vertical_lines": [10, 20],
+                                                             "explicit_horizontal_lines": [10, 20]})
+
+    def test_table_extraction_engines_selected_per_bank_product(self):
+        StatementProcessor = statementprocessor.StatementProcessor(table_extraction_engines={"RBC": {"Visa": "explicit_columns"}})
+
+        self.assertEqual({"Chequing": "pdfplumber", "Visa": "explicit_columns"}, StatementProcessor.table_extraction_engines["RBC"])
+
+        with self.assertRaises(ValueError):
+            statementprocessor.StatementProcessor(table_extraction_engines={"RBC": {"Visa": "fastest"}})
+
+        with self.assertRaises(ValueError):
+            statementprocessor.StatementProcessor(table_extraction_engines={"CREDIT UNION": {"Visa": "compare"}})
+
+    def test_parser_fingerprint_covers_version_and_engines(self):
+        rbc_fingerprint = statementprocessor.StatementProcessor().parser_fingerprint()
+
+        self.assertEqual(rbc_fingerprint, statementprocessor.StatementProcessor().parser_fingerprint())
+        self.assertNotEqual(rbc_fingerprint, statementprocessor.StatementProcessor(
+            table_extraction_engines={"RBC": {"Visa": "explicit_columns"}}).parser_fingerprint())
+
+        with mock.patch.object(statementprocessor, "parser_version", statementprocessor.parser_version + 1):
+            self.assertNotEqual(rbc_fingerprint, statementprocessor.StatementProcessor().parser_fingerprint())
+
     def test_adjust_dates_for_rollover_example_1(self):
         input_data = pd.DataFrame(
             [[datetime.datetime.strptime("2020-08-12", '%Y-%m-%d'), "Interacpurchase-9999 TEST-CO", -222.22],
@@ -0,0 +1,80 @@
+import tempfile
+import unittest
+from financeanalytics import statementreconciliation
+from pathlib import Path
+import pandas as pd
+
+class TestStatementReconciliation(unittest.TestCase):
+
+    def setUp(self):
+        # Amounts in cents, 0.10 + 0.20 does not add up to 0.30 exactly as floats
+        self.transactions = pd.DataFrame({
+            "Description": ["COFFEE", "BAGEL", "PAYMENT", "GROCERIES", "UNREADABLE"],
+            "Amount": pd.array([10, 20, -5000, 1234, None], dtype="Int64"),
+            "Filepath": pd.Categorical([str(Path("root/RBC/Visa/Visa 2020-01.pdf"))] * 2
+                                       + [str(Path("root/RBC/Visa/Visa 2020-02.pdf"))] * 2
+                                       + [str(Path("root/RBC/Visa/Visa 2020-04.pdf"))]),
+        })
+
+        self.statement_balances = pd.DataFrame({
+            "Bank": ["RBC", "RBC", "RBC", "RBC"],
+            "Filepath": [Path("root/RBC/Visa/Visa 2020-01.pdf"), Path("root/RBC/Visa/Visa 2020-02.pdf"),
+                         Path("root/RBC/Visa/Visa 2020-03.pdf"), Path("root/RBC/Visa/Visa 2020-04.pdf")],
+            "Opening Balance": [0.0, 0.30, -37.36, -37.36],
+            "Closing Balance": [0.30, -37.36, -37.36, -37.36],
+        })
+
+    def test_reconciliation_table_in_exact_cents(self):
+        StatementReconciliation = statementreconciliation.StatementReconciliation()
+
+        with self.assertLogs(level="WARNING"):
+            kept_transactions = StatementReconciliation.reconcile(self.transactions, self.statement_balances)
+        report = StatementReconciliation.report()
+
+        self.assertEqual(self.transactions.shape[0], kept_transactions.shape[0])
+        self.assertEqual([2, 2, 0, 1], list(report["Transactions"]))
+        self.assertEqual([0.30, -37.66, 0.0, 0.0], list(report["Transaction Total"]))
+        self.assertEqual([0.0, 0.0, 0.0, 0.0], list(report["Discrepancy"]))
+        # The last statement adds up, but one of its amounts could not be parsed
+        self.assertEqual([True, True, True, False], list(report["Reconciled"]))
+
+    def test_policies_for_statements_that_do_not_reconcile(self):
+        statement_balances = self.statement_balances.assign(**{"Closing Balance": [0.31, -37.36, -37.36, -37.36]})
+
+        StatementReconciliation = statementreconciliation.StatementReconciliation("drop")
+        with self.assertLogs(level="WARNING"):
+            kept_transactions = StatementReconciliation.reconcile(self.transactions, statement_balances)
+
+        self.assertEqual(["PAYMENT", "GROCERIES"], list(kept_transactions["Description"]))
+        self.assertEqual({str(Path("root/RBC/Visa/Visa 2020-01.pdf")), str(Path("root/RBC/Visa/Visa 2020-04.pdf"))},
+                         StatementReconciliation.dropped_filepaths)
+        self.assertEqual([0.01, 0.0, 0.0, 0.0], list(StatementReconciliation.report()["Discrepancy"]))
+
+        StatementReconciliation = statementreconciliation.StatementReconciliation("abort")
+        with self.assertLogs(level="WARNING"), self.assertRaises(ValueError):
+            StatementReconciliation.reconcile(self.transactions, statement_balances)
+        self.assertEqual(4, StatementReconciliation.report().shape[0])
+
+    def test_carry_over_previous_report(self):
+        with tempfile.TemporaryDirectory() as report_folder:
+            report_path = Path(report_folder, "output.reconciliation.csv")
+
+            StatementReconciliation = statementreconciliation.StatementReconciliation()
+            with self.assertLogs(level="WARNING"):
+                StatementReconciliation.reconcile(self.transactions, self.statement_balances)
+            StatementReconciliation.save(report_path)
+            previous_report = StatementReconciliation.report()
+
+            # The second statement changed and is reconciled again, the last one was removed
+            StatementReconciliation = statementreconciliation.StatementReconciliation()
+            StatementReconciliation.carry_over(report_path, [Path("root/RBC/Visa/Visa 2020-01.pdf"), Path("root/RBC/Visa/Visa 2020-03.pdf")])
+            StatementReconciliation.reconcile(self.transactions.iloc[2:4], self.statement_balances.iloc[[1]])
+
+            report = StatementReconciliation.report()
+            self.assertEqual([str(x) for x in self.statement_balances["Filepath"].iloc[[0, 2, 1]]], [str(x) for x in report["Filepath"]])
+            self.assertEqual([2, 0, 2], list(report["Transactions"]))
+            self.assertEqual(list(previous_report["Transaction Total"].iloc[[0, 2, 1]]), list(report["Transaction Total"]))
+            self.assertEqual([True, True, True], list(report["Reconciled"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+import datetime
+import logging
+import tempfile
+import unittest
+from financeanalytics import statementprocessor
+from financeanalytics import syntheticstatements
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+
+class TestSyntheticStatements(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.temporary_directory.name)
+
+        # Page layouts calibrated by earlier tests would not be checked again
+        statementprocessor.layout_calibrations.clear()
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def assert_statement_extracts(self, pdf_filepath, statement_type, statement, StatementProcessor=None):
+        if StatementProcessor is None:
+            StatementProcessor = statementprocessor.StatementProcessor()
+
+        (transactions, (year, opening_balance, closing_balance)) = StatementProcessor.extract_with_metadata(pdf_filepath, "RBC", statement_type)
+
+        expected_transactions = pd.DataFrame(
+            [[pd.Timestamp(date), amount / 100] for date, _, amount in statement["transactions"]], columns=["Date", "Amount"])
+
+        pd.testing.assert_frame_equal(expected_transactions, transactions[["Date", "Amount"]].reset_index(drop=True))
+        self.assertEqual(statement["opening_balance"] / 100, opening_balance)
+        self.assertEqual(statement["closing_balance"] / 100, closing_balance)
+        self.assertTrue(StatementProcessor.validate_transactions(transactions, opening_balance, closing_balance))
+
+    def test_chequing_statement_round_trip_across_year_rollover(self):
+        pdf_filepath = self.root / "Chequing Statement-0000 2020-01-11.pdf"
+
+        statement = syntheticstatements.SyntheticStatementGenerator().write_rbc_chequing_statement(
+            pdf_filepath, datetime.date(2020, 1, 11), transactions=40, pages=3)
+
+        self.assertEqual(3, statement["pages"])
+        self.assert_statement_extracts(pdf_filepath, "Chequing", statement)
+
+    def test_chequing_layout_kept_while_header_bracketed(self):
+        pdf_filepath = self.root / "Chequing Statement-0000 2020-01-11.pdf"
+
+        statement = syntheticstatements.SyntheticStatementGenerator().write_rbc_chequing_statement(
+            pdf_filepath, datetime.date(2020, 1, 11), transactions=60, pages=4)
+
+        with self.assertNoLogs(level="WARNING"):
+            self.assert_statement_extracts(pdf_filepath, "Chequing", statement)
+
+        # The odd and even page layouts were both checked, and both kept their column lines
+        self.assertEqual([None, None], list(statementprocessor.layout_calibrations.values()))
+
+    def test_shifted_chequing_layout_calibrated_once(self):
+        pdf_filepath = self.root / "Chequing Statement-0000 2020-01-11.pdf"
+
+        statement = syntheticstatements.SyntheticStatementGenerator().write_rbc_chequing_statement(
+            pdf_filepath, datetime.date(2020, 1, 11), transactions=60, pages=4, column_shift=12)
+
+        with self.assertLogs(level="WARNING") as logs:
+            self.assert_statement_extracts(pdf_filepath, "Chequing", statement)
+
+        # The amount headers of the odd and even page layouts crossed their column lines, each calibrated once
+        self.assertEqual(2, len(logs.output))
+        self.assertEqual(2, len(statementprocessor.layout_calibrations))
+        self.assertNotIn(None, statementprocessor.layout_calibrations.values())
+
+        # Later statements of the process reuse the calibrations, whichever StatementProcessor extracts them
+        with self.assertNoLogs(level="INFO"):
+            self.assert_statement_extracts(pdf_filepath, "Chequing", statement)
+
+        # The template table settings are left as they are
+        self.assertEqual((45, 85, 300, 400, 500, 595),
+                         statementprocessor.statement_templates.template("RBC", "Chequing").page_settings["odd_pages"]["explicit_vertical_lines"])
+
+    def test_shifted_chequing_layout_calibrated_once_per_worker(self):
+        SyntheticStatementGenerator = syntheticstatements.SyntheticStatementGenerator()
+        pdf_filepaths = []
+        for month in range(1, 7):
+            pdf_filepath = self.root / "Chequing Statement-0000 2020-{:02d}-11.pdf".format(month)
+            SyntheticStatementGenerator.write_rbc_chequing_statement(
+                pdf_filepath, datetime.date(2020, month, 11), transactions=20, pages=2, column_shift=12)
+            pdf_filepaths.append(pdf_filepath)
+
+        # The forked workers log to the same file
+        log_filepath = self.root / "extraction.log"
+        log_handler = logging.FileHandler(log_filepath)
+        logging.getLogger().addHandler(log_handler)
+        self.addCleanup(logging.getLogger().removeHandler, log_handler)
+        self.addCleanup(log_handler.close)
+
+        # A fresh copy of the processor is sent with every statement, as FinanceAnalytics does
+        StatementProcessor = statementprocessor.StatementProcessor()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(StatementProcessor.extract_with_metadata, x, "RBC", "Chequing") for x in pdf_filepaths]
+            self.assertEqual([20] * 6, [len(x.result()[0]) for x in futures])
+
+        # The odd and even page layouts are calibrated at most once by each worker, not once per statement
+        calibration_count = log_filepath.read_text().count("calibrated to")
+        self.assertGreaterEqual(calibration_count, 2)
+        self.assertLessEqual(calibration_count, 4)
+
+    def test_visa_statement_round_trip_across_year_rollover(self):
+        pdf_filepath = self.root / "Visa Statement-0000 2020-01-11.pdf"
+
+        statement = syntheticstatements.SyntheticStatementGenerator().write_rbc_visa_statement(
+            pdf_filepath, datetime.date(2020, 1, 11), transactions=40, pages=2, legal_pages=2)
+
+        self.assertEqual(4, statement["pages"])
+        self.assert_statement_extracts(pdf_filepath, "Visa", statement)
+
+    def test_visa_legal_pages_screened_before_table_extraction(self):
+        pdf_filepath = self.root / "Visa Statement-0000 2020-01-11.pdf"
+
+        syntheticstatements.SyntheticStatementGenerator().write_rbc_visa_statement(
+            pdf_filepath, datetime.date(2020, 1, 11), transactions=20, pages=1, legal_pages=3)
+
+        StatementProcessor = statementprocessor.StatementProcessor()
+        StatementProcessor.extract_rbc_visa_statement(pdf_filepath)
+
+        self.assertEqual({"screened_out": 3, "dropped_after_extraction": 0}, StatementProcessor.page_screening)
+
+    def test_statement_pages_extracted_in_parallel(self):
+        chequing_filepath = self.root / "Chequing Statement-0000 2020-01-11.pdf"
+        visa_filepath = self.root / "Visa Statement-0000 2020-01-11.pdf"
+
+        SyntheticStatementGenerator = syntheticstatements.SyntheticStatementGenerator()
+        SyntheticStatementGenerator.write_rbc_chequing_statement(
+            chequing_filepath, datetime.date(2020, 1, 11), transactions=60, pages=5)
+        SyntheticStatementGenerator.write_rbc_visa_statement(
+            visa_filepath, datetime.date(2020, 1, 11), transactions=60, pages=4, legal_pages=1)
+
+        for pdf_filepath, statement_type, page_workers in [(chequing_filepath, "Chequing", 3), (visa_filepath, "Visa", 2)]:
+            ParallelStatementProcessor = statementprocessor.StatementProcessor(page_workers)
+            ParallelStatementProcessor.min_pages_per_worker = 1
+
+            expected_output = statementprocessor.StatementProcessor().extract_with_metadata(pdf_filepath, "RBC", statement_type)
+            actual_output = ParallelStatementProcessor.extract_with_metadata(pdf_filepath, "RBC", statement_type)
+
+            pd.testing.assert_frame_equal(expected_output[0], actual_output[0])
+            self.assertEqual(expected_output[1], actual_output[1])
+
+    def test_pages_released_after_table_extraction(self):
+        pdf_filepath = self.root / "Chequing Statement-0000 2020-01-11.pdf"
+        syntheticstatements.SyntheticStatementGenerator().write_rbc_chequing_statement(
+            pdf_filepath, datetime.date(2020, 1, 11), transactions=40, pages=3)
+
+        with statementprocessor.StatementDocument(pdf_filepath) as document:
+            statementprocessor.StatementProcessor().extract_with_metadata(document, "RBC", "Chequing")
+
+            self.assertEqual(3, len(document.pages))
+            for page in document.pages:
+                self.assertFalse(hasattr(page, "_objects"))
+                self.assertFalse(hasattr(page, "_layout"))
+
+    def test_explicit_column_engine_matches_pdfplumber(self):
+        chequing_filepath = self.root / "Chequing Statement-0000 2020-01-11.pdf"
+        visa_filepath = self.root / "Visa Statement-0000 2020-01-11.pdf"
+
+        SyntheticStatementGenerator = syntheticstatements.SyntheticStatementGenerator()
+        SyntheticStatementGenerator.write_rbc_chequing_statement(
+            chequing_filepath, datetime.date(2020, 1, 11), transactions=60, pages=4)
+        SyntheticStatementGenerator.write_rbc_visa_statement(
+            visa_filepath, datetime.date(2020, 1, 11), transactions=60, pages=3, legal_pages=1)
+
+        for pdf_filepath, statement_type in [(chequing_filepath, "Chequing"), (visa_filepath, "Visa")]:
+            ExplicitColumnStatementProcessor = statementprocessor.StatementProcessor()
+            ExplicitColumnStatementProcessor.table_extraction_engines["RBC"][statement_type] = "explicit_columns"
+
+            expected_output = statementprocessor.StatementProcessor().extract_with_metadata(pdf_filepath, "RBC", statement_type)
+            actual_output = ExplicitColumnStatementProcessor.extract_with_metadata(pdf_filepath, "RBC", statement_type)
+
+            pd.testing.assert_frame_equal(expected_output[0], actual_output[0])
+
+            # One extractor per page layout (odd and even chequing pages, every visa page), reused across pages
+            self.assertEqual(2 if statement_type == "Chequing" else 1,
+                             len(ExplicitColumnStatementProcessor.explicit_column_extractors))
+
+    def test_registered_template_extracts_new_bank(self):
+        pdf_filepath = self.root / "Visa Statement-0000 2020-01-11.pdf"
+
+        statement = syntheticstatements.SyntheticStatementGenerator().write_rbc_visa_statement(
+            pdf_filepath, datetime.date(2020, 1, 11), transactions=20, pages=1, legal_pages=1)
+
+        statement_templates = statementprocessor.statement_templates
+        rbc_fingerprint = statementprocessor.StatementProcessor().parser_fingerprint()
+
+        # A Bank sharing the RBC visa layout, registered without any change to the StatementProcessor
+        rbc_visa = statement_templates.template("RBC", "Visa")
+        rbc_visa_settings = rbc_visa.settings()
+        statement_templates.register(statementprocessor.StatementTemplate(
+            "CREDIT UNION", "Visa", rbc_visa_settings["metadata_patterns"], rbc_visa_settings["column_mapping"],
+            rbc_visa_settings["columns"], rbc_visa_settings["page_settings"], rbc_visa.extract_transactions,
+            rbc_visa.extract_page, rbc_visa.standardize_transactions))
+        self.addCleanup(statement_templates.unregister, "CREDIT UNION", "Visa")
+
+        StatementProcessor = statementprocessor.StatementProcessor()
+        expected_output = StatementProcessor.extract_with_metadata(pdf_filepath, "RBC", "Visa")
+        actual_output = StatementProcessor.extract_with_metadata(pdf_filepath, "CREDIT UNION", "Visa")
+
+        pd.testing.assert_frame_equal(expected_output[0], actual_output[0])
+        self.assertEqual(expected_output[1], actual_output[1])
+        self.assertEqual(statement["closing_balance"] / 100, actual_output[1][2])
+        self.assertNotEqual(rbc_fingerprint, StatementProcessor.parser_fingerprint())
+
+        with self.assertRaises(ValueError):
+            StatementProcessor.extract_with_metadata(pdf_filepath, "CREDIT UNION", "Chequing")
+
+    def test_registered_template_uses_its_own_settings(self):
+        pdf_filepath = self.root / "Visa Statement-0000 2020-01-11.pdf"
+
+        syntheticstatements.SyntheticStatementGenerator().write_rbc_visa_statement(
+            pdf_filepath, datetime.date(2020, 1, 11), transactions=20, pages=1, legal_pages=1)
+
+        statement_templates = statementprocessor.statement_templates
+
+        # The RBC visa functions, with a crop ending halfway down the table and the posting date as the date
+        rbc_visa = statement_templates.template("RBC", "Visa")
+        rbc_visa_settings = rbc_visa.settings()
+        page_settings = dict(rbc_visa_settings["page_settings"], page_crop_bounds=[55, 140, 350, 300])
+        column_mapping = {"Posting Date": "Date", "Activity Description": "Description", "Amount": "Amount"}
+        statement_templates.register(statementprocessor.StatementTemplate(
+            "CREDIT UNION", "Visa", rbc_visa_settings["metadata_patterns"], column_mapping, rbc_visa_settings["columns"],
+            page_settings, rbc_visa.extract_transactions, rbc_visa.extract_page, rbc_visa.standardize_transactions))
+        self.addCleanup(statement_templates.unregister, "CREDIT UNION", "Visa")
+
+        StatementProcessor = statementprocessor.StatementProcessor()
+        rbc_transactions = StatementProcessor.extract_with_metadata(pdf_filepath, "RBC", "Visa")[0]
+        transactions = StatementProcessor.extract_with_metadata(pdf_filepath, "CREDIT UNION", "Visa")[0]
+
+        self.assertEqual(20, len(rbc_transactions))
+        self.assertEqual(11, len(transactions))
+        pd.testing.assert_frame_equal(rbc_transactions[["Description", "Amount"]].head(11).reset_index(drop=True),
+                                      transactions[["Description", "Amount"]].reset_index(drop=True))
+        self.assertFalse(rbc_transactions["Date"].head(11).reset_index(drop=True).equals(transactions["Date"].reset_index(drop=True)))
+
+    def test_build_statement_tree(self):
+        summary = syntheticstatements.SyntheticStatementGenerator().build_statement_tree(
+            self.root, statements=5, accounts=(("Personal", "Chequing"), ("Visa",)), transactions=5, pages=1, legal_pages=1)
+
+        expected_statements = ["RBC/Personal/Chequing/Chequing Statement-0000 2019-01-11.pdf",
+                               "RBC/Personal/Chequing/Chequing Statement-0000 2019-02-11.pdf",
+                               "RBC/Personal/Chequing/Chequing Statement-0000 2019-03-11.pdf",
+                               "RBC/Visa/Visa Statement-0000 2019-01-11.pdf",
+                               "RBC/Visa/Visa Statement-0000 2019-02-11.pdf"]
+
+        actual_statements = sorted(x.relative_to(self.root).as_posix() for x in self.root.glob("**/*.pdf"))
+
+        self.assertEqual(expected_statements, actual_statements)
+        self.assertEqual({"statements": 5, "pages": 7}, summary)
+
+if __name__ == '__main__':
+    unittest.main()
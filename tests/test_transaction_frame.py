@@ -0,0 +1,67 @@
+import datetime
+import unittest
+from financeanalytics import transactionframe
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+class TestTransactionFrame(unittest.TestCase):
+
+    def setUp(self):
+        self.statements = [
+            pd.DataFrame([[datetime.datetime.strptime("2020-06-13", '%Y-%m-%d'), "AMAZON.CA*AB1CD23E4AMAZON.CAON", 11.11],
+                          [datetime.datetime.strptime("2020-06-24", '%Y-%m-%d'), "PAYMENT-THANKYOU/PAIEMENT-MERCI", -1000.00]],
+                         columns=["Date", "Description", "Amount"]),
+            pd.DataFrame([[datetime.datetime.strptime("2020-08-12", '%Y-%m-%d'), "Interacpurchase-9999 TEST-CO", -222.22],
+                          [datetime.datetime.strptime("2020-08-14", '%Y-%m-%d'), "Unreadable amount", np.nan]],
+                         columns=["Date", "Description", "Amount"]),
+        ]
+
+        self.structured_data = pd.DataFrame([["RBC", "VISA", Path("root/RBC/Visa/Visa Statement-0000 2020-07-11.pdf")],
+                                             ["RBC", "CHEQUING", Path("root/RBC/Chequing/Chequing Statement-0000 2020-09-11.pdf")]],
+                                            columns=["Bank", "Level 1", "Filepath"])
+
+    def test_tagged_statements_match_broadcast_hierarchy(self):
+        TransactionFrame = transactionframe.TransactionFrame()
+
+        expected_output = []
+        for statement, (index, record) in zip(self.statements, self.structured_data.iterrows()):
+            statement = statement.copy()
+            statement[list(self.structured_data.columns)] = [str(x) for x in record.values]
+            expected_output.append(statement)
+        expected_output = pd.concat(expected_output, axis=0).reset_index(drop=True)
+
+        compact_output = TransactionFrame.tag_statements([TransactionFrame.compact(x) for x in self.statements], self.structured_data)
+
+        self.assertEqual("Int64", compact_output["Amount"].dtype)
+        self.assertEqual([1111, -100000, -22222], list(compact_output["Amount"].dropna()))
+        for column in self.structured_data.columns:
+            self.assertIsInstance(compact_output[column].dtype, pd.CategoricalDtype)
+
+        actual_output = TransactionFrame.to_output(compact_output)
+        actual_output[list(self.structured_data.columns)] = actual_output[list(self.structured_data.columns)].astype(object)
+
+        pd.testing.assert_frame_equal(expected_output, actual_output)
+
+    def test_concat_fills_hierarchy_levels_added_later(self):
+        TransactionFrame = transactionframe.TransactionFrame()
+
+        existing_output = TransactionFrame.to_output(TransactionFrame.tag_statements([TransactionFrame.compact(self.statements[0])],
+                                                                                     self.structured_data.iloc[[0]]))
+        existing_output[["Bank", "Filepath"]] = existing_output[["Bank", "Filepath"]].astype(str)
+        existing_output = existing_output.drop(columns=["Level 1"])
+
+        deeper_hierarchy = self.structured_data.iloc[[1]].assign(**{"Level 2": "JOINT"})
+        new_statements = TransactionFrame.tag_statements([TransactionFrame.compact(self.statements[1])], deeper_hierarchy)
+
+        merged_statements = TransactionFrame.concat([TransactionFrame.from_output(existing_output, list(deeper_hierarchy.columns)),
+                                                     new_statements])
+        merged_statements = TransactionFrame.fill_missing(merged_statements, list(deeper_hierarchy.columns), "NONE")
+
+        self.assertEqual(["NONE", "NONE", "CHEQUING", "CHEQUING"], list(merged_statements["Level 1"]))
+        self.assertEqual(["NONE", "NONE", "JOINT", "JOINT"], list(merged_statements["Level 2"]))
+        self.assertEqual(["RBC"], list(merged_statements["Bank"].cat.categories))
+        self.assertEqual([1111, -100000, -22222], list(merged_statements["Amount"].dropna()))
+
+if __name__ == '__main__':
+    unittest.main()